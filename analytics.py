@@ -0,0 +1,380 @@
+"""Rating and streak statistics kept as running aggregates.
+
+For every day, ISO week and month with entries the module keeps the entry
+count, the rating sum and a histogram of ratings. Days with at least one
+entry form streaks; the streaks are kept as runs of consecutive days, so
+the current and the longest streak are looked up instead of recomputed.
+
+The aggregates follow every create, edit and delete made through
+storage.py. They are saved next to the storage file as a snapshot
+(``reflections.json.stats``) of the storage version it describes, plus a
+log of the changes made since (``reflections.json.stats.log``): each write
+appends one short line, and a background thread writes a new snapshot once
+the log grows as long as the journal. A process that can follow the
+snapshot and the log up to the current storage version loads them instead
+of scanning the journal; otherwise, like the search index, the aggregates
+are rebuilt from storage once. The saved files only spare that scan, so a
+lost or torn log line just means a rebuild.
+"""
+import bisect
+import json
+import threading
+from collections import Counter
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from storage import (
+    EPOCH, StorageEngine, add_change_listener, add_close_listener, as_entry, atomic_write, get_engine
+)
+
+SECONDS_PER_DAY = 24 * 60 * 60
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+PERIODS = ('day', 'week', 'month')
+
+# A new snapshot is written once this many changes, or one per entry, have been logged since the last
+SNAPSHOT_MIN_CHANGES = 1000
+
+
+def json_version(version: Any) -> Any:
+    """A storage version as it reads back from JSON (tuples become lists)."""
+    return json.loads(json.dumps(version))
+
+
+def entry_day(entry: Dict[str, Any]) -> int:
+    """The day an entry was written, as a date ordinal."""
+    return EPOCH_ORDINAL + as_entry(entry).epoch // SECONDS_PER_DAY
+
+
+def period_key(period: str, day: int) -> str:
+    """The bucket of a day: '2024-05-31', ISO week '2024-W22' or month '2024-05'."""
+    day_date = date.fromordinal(day)
+    if period == 'day':
+        return day_date.isoformat()
+    if period == 'week':
+        year, week, _ = day_date.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day_date.strftime('%Y-%m')
+
+
+class Aggregate:
+    """Entry count, rating sum and rating histogram of one period."""
+    __slots__ = ('count', 'rating_sum', 'ratings')
+
+    def __init__(self, count: int = 0, rating_sum: int = 0, ratings: Optional[Dict[int, int]] = None):
+        self.count = count
+        self.rating_sum = rating_sum
+        self.ratings = Counter(ratings or {})
+
+    def add(self, rating: int, sign: int = 1) -> None:
+        self.count += sign
+        self.rating_sum += sign * rating
+        self.ratings[rating] += sign
+        if not self.ratings[rating]:
+            del self.ratings[rating]
+
+    def average(self) -> Optional[float]:
+        """Average rating of the rated entries; a rating of 0 means unrated."""
+        rated = self.count - self.ratings.get(0, 0)
+        return round(self.rating_sum / rated, 2) if rated else None
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'rating_sum': self.rating_sum,
+            'average': self.average(),
+            'ratings': {str(rating): count for rating, count in sorted(self.ratings.items())},
+        }
+
+    def to_state(self) -> List[Any]:
+        """The compact form kept in the saved statistics file."""
+        return [self.count, self.rating_sum, list(self.ratings.items())]
+
+    @classmethod
+    def from_state(cls, state: List[Any]) -> 'Aggregate':
+        count, rating_sum, ratings = state
+        return cls(count, rating_sum, dict(ratings))
+
+
+class Streaks:
+    """Runs of consecutive days with entries."""
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.end_of: Dict[int, int] = {}
+        self.start_of: Dict[int, int] = {}
+        # run length -> number of runs with that length
+        self.lengths: Counter = Counter()
+
+    def add_day(self, day: int) -> None:
+        start = self.start_of.get(day - 1, day)
+        end = self.end_of.get(day + 1, day)
+        if start != day:
+            self._remove_run(start, day - 1)
+        if end != day:
+            self._remove_run(day + 1, end)
+        self._add_run(start, end)
+
+    def remove_day(self, day: int) -> None:
+        start = self.starts[bisect.bisect_right(self.starts, day) - 1]
+        end = self.end_of[start]
+        self._remove_run(start, end)
+        if start < day:
+            self._add_run(start, day - 1)
+        if day < end:
+            self._add_run(day + 1, end)
+
+    def current(self, today: int) -> int:
+        """Length of the streak that ends today, or yesterday if nothing is written yet today."""
+        for end in (today, today - 1):
+            if end in self.start_of:
+                return end - self.start_of[end] + 1
+        return 0
+
+    def longest(self) -> int:
+        return max(self.lengths, default=0)
+
+    def _add_run(self, start: int, end: int) -> None:
+        bisect.insort(self.starts, start)
+        self.end_of[start] = end
+        self.start_of[end] = start
+        self.lengths[end - start + 1] += 1
+
+    def _remove_run(self, start: int, end: int) -> None:
+        del self.starts[bisect.bisect_left(self.starts, start)]
+        del self.end_of[start]
+        del self.start_of[end]
+        self.lengths[end - start + 1] -= 1
+        if not self.lengths[end - start + 1]:
+            del self.lengths[end - start + 1]
+
+
+class Statistics:
+    """Running aggregates of one storage engine's entries."""
+
+    def __init__(self, engine: StorageEngine):
+        self.engine = engine
+        self.path = Path(engine.path).with_name(Path(engine.path).name + '.stats')
+        self.log_path = self.path.with_name(self.path.name + '.log')
+        self.lock = threading.Lock()
+        self.version = None
+        self.stale = True
+        # Changes logged since the last snapshot, and whether a snapshot is being written
+        self.logged = 0
+        self.flushing = False
+        self._reset()
+
+    def _reset(self) -> None:
+        # entry id -> (day, rating) it was counted under, so edits and deletes can be undone
+        self.entries: Dict[str, Tuple[int, int]] = {}
+        self.total = Aggregate()
+        self.periods: Dict[str, Dict[str, Aggregate]] = {period: {} for period in PERIODS}
+        # Bucket keys of each period in order, so the latest buckets are sliced off without sorting
+        self.keys: Dict[str, List[str]] = {period: [] for period in PERIODS}
+        self.streaks = Streaks()
+
+    def apply(self, previous_version: Any, op: str, entry_id: str, entry: Optional[Dict[str, Any]]) -> None:
+        """Apply one storage change, or mark the aggregates stale if they cannot follow."""
+        with self.lock:
+            if self.stale or previous_version != self.version:
+                self.stale = True
+                return
+            day, rating = (entry_day(entry), as_entry(entry).rating) if op != 'delete' else (None, 0)
+            self._change(entry_id, day, rating)
+            version = self.engine.version()
+            self._log([self.version, version, entry_id, day, rating])
+            self.version = version
+            if self.logged > max(SNAPSHOT_MIN_CHANGES, len(self.entries)):
+                self._schedule_snapshot()
+
+    def _change(self, entry_id: str, day: Optional[int], rating: int) -> None:
+        """Count an entry under its new day and rating (day None: deleted) instead of its old ones."""
+        if entry_id in self.entries:
+            self._count(entry_id, *self.entries.pop(entry_id), sign=-1)
+        if day is not None:
+            self._count(entry_id, day, rating)
+
+    def summary(self, period: str = 'month', limit: int = 12, today: Optional[date] = None) -> Dict[str, Any]:
+        """Totals, streaks and the latest ``limit`` buckets of the period."""
+        today = (today or date.today()).toordinal()
+        with self.lock:
+            self._sync()
+            buckets = self.periods[period]
+            keys = self.keys[period][-limit:] if limit > 0 else []
+            return {
+                'total': self.total.to_json(),
+                'current_streak': self.streaks.current(today),
+                'longest_streak': self.streaks.longest(),
+                'period': period,
+                'buckets': [dict(buckets[key].to_json(), period=key) for key in keys],
+            }
+
+    def _sync(self) -> None:
+        version = self.engine.version()
+        if not self.stale and version == self.version:
+            return
+        if not self._load(version):
+            self._rebuild(version)
+        self.stale = False
+
+    def _count(self, entry_id: str, day: int, rating: int, sign: int = 1) -> None:
+        if sign > 0:
+            self.entries[entry_id] = (day, rating)
+        self.total.add(rating, sign)
+        for period, buckets in self.periods.items():
+            key = period_key(period, day)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = Aggregate()
+                bisect.insort(self.keys[period], key)
+            bucket.add(rating, sign)
+            if not bucket.count:
+                del buckets[key]
+                keys = self.keys[period]
+                del keys[bisect.bisect_left(keys, key)]
+            if period == 'day':
+                # A day joins or leaves the streaks with its first or last entry
+                if sign > 0 and bucket.count == 1:
+                    self.streaks.add_day(day)
+                elif sign < 0 and not bucket.count:
+                    self.streaks.remove_day(day)
+
+    def _rebuild(self, version: Any) -> None:
+        self._reset()
+        for entry in self.engine.load():
+            entry = as_entry(entry)
+            self._count(entry.id, entry_day(entry), entry.rating)
+        self.version = version
+        self._schedule_snapshot()
+
+    def _load(self, version: Any) -> bool:
+        """Load the snapshot and replay the logged changes if they lead to this storage version."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        current, target = data.get('version'), json_version(version)
+        changes = []
+        if current != target:
+            # Follow the logged changes from the snapshot's version; lines of older snapshots are skipped
+            try:
+                with open(self.log_path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            previous, new, entry_id, day, rating = json.loads(line)
+                        except (ValueError, TypeError):
+                            continue
+                        if previous == current:
+                            changes.append((entry_id, day, rating))
+                            current = new
+            except OSError:
+                return False
+            if current != target:
+                return False
+        self._reset()
+        self.entries = {entry_id: (day, rating) for entry_id, (day, rating) in data['entries'].items()}
+        self.total = Aggregate.from_state(data['total'])
+        self.periods = {period: {key: Aggregate.from_state(bucket) for key, bucket in data['periods'][period].items()}
+                        for period in PERIODS}
+        self.keys = {period: sorted(buckets) for period, buckets in self.periods.items()}
+        for key in self.keys['day']:
+            self.streaks.add_day(date.fromisoformat(key).toordinal())
+        for change in changes:
+            self._change(*change)
+        self.version = version
+        self.logged = len(changes)
+        return True
+
+    def _log(self, change: List[Any]) -> None:
+        """Append one change to the log; needs the lock."""
+        try:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(change, separators=(',', ':')) + '\n')
+        except OSError:
+            # The saved aggregates only spare other processes a rebuild; storage itself is unaffected
+            return
+        self.logged += 1
+
+    def _schedule_snapshot(self) -> None:
+        """Write a snapshot on a background thread, off the request path; needs the lock."""
+        if not self.flushing:
+            self.flushing = True
+            threading.Thread(target=self._snapshot, name='stats-snapshot', daemon=True).start()
+
+    def _snapshot(self) -> None:
+        with self.lock:
+            self.flushing = False
+            if self.stale:
+                return
+            # Copied under the lock; the slow part, encoding the entry map, runs without it
+            data = {
+                'version': self.version,
+                'entries': dict(self.entries),
+                'total': self.total.to_state(),
+                'periods': {period: {key: bucket.to_state() for key, bucket in buckets.items()}
+                            for period, buckets in self.periods.items()},
+            }
+            self.logged = 0
+        content = json.dumps(data, separators=(',', ':'))
+        try:
+            atomic_write(self.path, lambda f: f.write(content))
+        except OSError:
+            return
+        with self.lock:
+            # Changes logged meanwhile start from the snapshot's version; older lines can go
+            try:
+                with open(self.log_path, 'r', encoding='utf-8') as f:
+                    lines = f.readlines()
+            except OSError:
+                return
+            version = json_version(data['version'])
+            for start, line in enumerate(lines):
+                try:
+                    if json.loads(line)[0] == version:
+                        break
+                except (ValueError, TypeError, IndexError, KeyError):
+                    continue
+            else:
+                start = len(lines)
+            atomic_write(self.log_path, lambda f: f.writelines(lines[start:]))
+
+
+_statistics: Dict[int, Statistics] = {}
+_statistics_lock = threading.Lock()
+
+
+def get_statistics(engine: Optional[StorageEngine] = None) -> Statistics:
+    """The statistics of the given (default: current) storage engine."""
+    engine = engine or get_engine()
+    with _statistics_lock:
+        if engine.closed:
+            # Closed while this request used it: not registered again, as nothing would drop it
+            return _statistics.get(id(engine)) or Statistics(engine)
+        if id(engine) not in _statistics:
+            _statistics[id(engine)] = Statistics(engine)
+        return _statistics[id(engine)]
+
+
+def get_stats(period: str = 'month', limit: int = 12) -> Dict[str, Any]:
+    """Rating and streak statistics of the current journal."""
+    return get_statistics().summary(period, limit)
+
+
+def _on_storage_change(engine: StorageEngine, previous_version: Any, op: str, entry_id: str,
+                       entry: Optional[Dict[str, Any]]) -> None:
+    statistics = _statistics.get(id(engine))
+    if statistics is not None:
+        statistics.apply(previous_version, op, entry_id, entry)
+
+
+add_change_listener(_on_storage_change)
+
+
+def _on_engine_close(engine: StorageEngine) -> None:
+    with _statistics_lock:
+        _statistics.pop(id(engine), None)
+
+
+add_close_listener(_on_engine_close)
@@ -0,0 +1,198 @@
+"""Versioned JSON API for mobile clients, mounted at /api/v1.
+
+List and entry responses carry ETags derived from the storage version (or
+the entry's content) plus a Last-Modified time, and conditional requests
+are answered with 304 before any entry is read. Compressed responses carry
+the ETag as a weak one, so validators are compared on their value alone. A
+client that keeps the ``sync_token`` of its last sync asks for
+``/api/v1/entries?since=<token>`` and only downloads what changed.
+"""
+import hashlib
+import math
+import os
+from datetime import datetime, timezone
+
+from flask import Blueprint, current_app, jsonify, request, url_for
+
+from changes import SyncTokenExpired, get_change_log
+from storage import (
+    ENTRY_FIELDS, ConflictError, create_entry_from_form, entry_etag, get_engine, get_entry, get_page,
+    insert_entry, remove_entry, replace_entry
+)
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def api_error(status, message):
+    response = jsonify({'error': message})
+    response.status_code = status
+    return response
+
+
+@api.errorhandler(ConflictError)
+def entry_conflict(error):
+    # The entry no longer matches the If-Match version the client sent
+    return api_error(412, str(error))
+
+
+def http_time(seconds):
+    """A Last-Modified time. HTTP dates only have whole seconds; the ETag is exact."""
+    return datetime.fromtimestamp(int(seconds), timezone.utc)
+
+
+def last_modified(engine, entry_id=None):
+    """Time of the latest recorded change, falling back to the storage file's mtime."""
+    changed = get_change_log(engine).last_change(entry_id)
+    if changed is None:
+        try:
+            changed = os.path.getmtime(engine.path)
+        except OSError:
+            return None
+    return http_time(changed)
+
+
+def is_not_modified(etag, modified):
+    """Whether the client's If-None-Match (or, without it, If-Modified-Since) still holds."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and modified is not None:
+        return modified <= request.if_modified_since
+    return False
+
+
+def conditional(body, etag, modified, status=200):
+    """A JSON response with validators, or 304 if the client's copy is current."""
+    if body is None:
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(body)
+        response.status_code = status
+    response.set_etag(etag)
+    if modified is not None:
+        response.last_modified = modified
+    # Clients must revalidate, which is cheap thanks to the validators
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def expected_etag():
+    """The entry version an If-Match header requires, if any."""
+    etags = request.if_match
+    if not etags or etags.star_tag:
+        return None
+    # A W/ tag from a compressed response names the same entry version
+    return next(iter(etags.as_set(include_weak=True)), None)
+
+
+def entry_from_body(entry=None):
+    """Apply the JSON body's reflection fields and rating to an entry (default: a new one)."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None
+    if entry is None:
+        entry = create_entry_from_form({})
+    for field in ENTRY_FIELDS:
+        if field in data:
+            if not isinstance(data[field], str):
+                return None
+            entry[field] = data[field]
+    if 'rating' in data:
+        rating = data['rating']
+        if not isinstance(rating, int) or isinstance(rating, bool) or not 0 <= rating <= 5:
+            return None
+        entry['rating'] = rating
+    return entry
+
+
+def entry_response(entry, status=200):
+    return conditional(entry.to_json(), entry_etag(entry), None, status)
+
+
+@api.route('/entries')
+def list_entries():
+    engine = get_engine()
+    # The version is read before the entries, so a write racing this request only causes a refetch
+    etag = hashlib.sha1(f"{engine.version()}|{request.query_string.decode('latin-1')}".encode('utf-8')).hexdigest()
+    modified = last_modified(engine)
+    if is_not_modified(etag, modified):
+        return conditional(None, etag, modified)
+    log = get_change_log(engine)
+    since = request.args.get('since')
+    if since is not None:
+        try:
+            since = float(since)
+            if not math.isfinite(since):
+                raise ValueError(since)
+            changes = log.changes_since(since)
+        except ValueError:
+            return api_error(400, 'Invalid sync token')
+        except SyncTokenExpired:
+            return api_error(410, 'Sync token expired; fetch all entries again')
+        entries = [entry for entry in map(engine.get, changes.changed) if entry is not None]
+        body = {
+            'entries': [entry.to_json() for entry in entries],
+            'deleted': changes.deleted,
+            'sync_token': changes.token,
+        }
+        return conditional(body, etag, modified)
+    # Taken before the page is read; changes made meanwhile are sent again on the next sync
+    sync_token = log.last_change() or 0
+    sort_order = request.args.get('sort', 'desc')
+    limit = request.args.get('limit', current_app.config['PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['MAX_PAGE_SIZE']))
+    page = get_page(sort_order, limit, request.args.get('after'), request.args.get('before'))
+    body = {'entries': [entry.to_json() for _, entry in page.entries], 'sync_token': sync_token}
+    if page.next_cursor:
+        body['next_url'] = url_for('api.list_entries', sort=sort_order, limit=limit, after=page.next_cursor)
+    if page.prev_cursor:
+        body['prev_url'] = url_for('api.list_entries', sort=sort_order, limit=limit, before=page.prev_cursor)
+    return conditional(body, etag, modified)
+
+
+@api.route('/entries', methods=['POST'])
+def create_entry():
+    entry = entry_from_body()
+    if entry is None:
+        return api_error(400, 'Expected a JSON object with text fields and a rating from 0 to 5')
+    entry_id = insert_entry(entry)
+    response = entry_response(entry, 201)
+    response.headers['Location'] = url_for('api.get_entry_json', entry_id=entry_id)
+    return response
+
+
+@api.route('/entries/<entry_id>')
+def get_entry_json(entry_id):
+    entry = get_entry(entry_id)
+    if entry is None:
+        return api_error(404, 'No such entry')
+    etag = entry_etag(entry)
+    modified = last_modified(get_engine(), entry_id)
+    if is_not_modified(etag, modified):
+        return conditional(None, etag, modified)
+    return conditional(entry.to_json(), etag, modified)
+
+
+@api.route('/entries/<entry_id>', methods=['PUT', 'PATCH'])
+def update_entry(entry_id):
+    current = get_entry(entry_id)
+    if current is None:
+        return api_error(404, 'No such entry')
+    # Fields missing from the body keep their stored values
+    entry = entry_from_body(current.copy())
+    if entry is None:
+        return api_error(400, 'Expected a JSON object with text fields and a rating from 0 to 5')
+    try:
+        replace_entry(entry_id, entry, expected_etag())
+    except KeyError:
+        # Deleted in the meantime
+        return api_error(404, 'No such entry')
+    return entry_response(entry)
+
+
+@api.route('/entries/<entry_id>', methods=['DELETE'])
+def delete_entry(entry_id):
+    try:
+        remove_entry(entry_id, expected_etag())
+    except KeyError:
+        return api_error(404, 'No such entry')
+    return '', 204
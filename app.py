@@ -1,13 +1,24 @@
-from flask import Flask, render_template, request, redirect, url_for, Response
-import csv
-from io import StringIO
-from fpdf import FPDF
+from flask import (
+    Flask, render_template, request, redirect, url_for, Response, stream_with_context,
+    abort, jsonify, send_file, make_response, stream_template
+)
+import os
 from app_config import config
 from storage import (
-    load_entries, save_entries, sort_entries_with_index,
-    create_entry_from_form, update_entry_from_form, validate_index,
-    generate_csv_export, generate_pdf_export
+    load_entries, get_entry, get_page, iter_entries, insert_entry, replace_entry, remove_entry,
+    create_entry_from_form, update_entry_from_form, validate_index, entry_etag,
+    iter_csv_export, get_engine, ConflictError
+)
+from search import search_entries, snippet
+from export_jobs import (
+    submit_pdf_export, get_pdf_export_status, get_pdf_export_error, is_valid_job_id, pdf_path
 )
+from api import api
+from analytics import PERIODS, get_stats
+import assets
+import metrics
+import render_cache
+import users
 
 
 def create_app(config_name='default'):
@@ -18,71 +29,255 @@ def create_app(config_name='default'):
     app.config.from_object(config[config_name])
     config[config_name].init_app(app)
 
+    app.register_blueprint(api)
+    metrics.init_app(app)
+    # After metrics, so its response sizes are the compressed ones
+    assets.init_app(app)
+    users.init_app(app)
+    render_cache.init_app(app)
+
     return app
 
 
-app = create_app()
+# FLASK_CONFIG picks 'development', 'production' or 'testing' (default: development)
+app = create_app(os.environ.get('FLASK_CONFIG') or 'default')
+
+
+def get_page_from_request(sort_order):
+    """Fetch the page of entries selected by the ?limit=, ?after= and ?before= arguments."""
+    limit = request.args.get('limit', app.config['PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, app.config['MAX_PAGE_SIZE']))
+    page = get_page(sort_order, limit, request.args.get('after'), request.args.get('before'))
+    next_url = url_for(request.endpoint, sort=sort_order, limit=limit, after=page.next_cursor) if page.next_cursor else None
+    prev_url = url_for(request.endpoint, sort=sort_order, limit=limit, before=page.prev_cursor) if page.prev_cursor else None
+    return page, next_url, prev_url
+
+
+class EntryRows:
+    """The (id, entry) rows of a page, handed to a streamed template.
+
+    Supports len() and truthiness like the list it wraps, and notes when the
+    template starts iterating, which marks the end of the page header.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.started = False
+
+    def __iter__(self):
+        self.started = True
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def stream_entry_list(template_name, context, chunk_size):
+    """Render a list template as a stream of HTML chunks.
+
+    Everything before the first entry (the page header) is sent as soon as
+    it is rendered; the entries follow in chunks of about chunk_size
+    characters, so the page never has to be held in memory as a whole.
+    """
+    rows = context['entries'] = EntryRows(context['entries'])
+    # stream_template() keeps the request context while the template is rendered
+    pieces = stream_template(template_name, **context)
+
+    def chunks():
+        buffer, size, header_sent = [], 0, False
+        for piece in pieces:
+            if rows.started and not header_sent:
+                header_sent = True
+                if buffer:
+                    yield ''.join(buffer)
+                    buffer, size = [], 0
+            buffer.append(piece)
+            size += len(piece)
+            if size >= chunk_size:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield ''.join(buffer)
+
+    return chunks()
+
+
+def render_entry_list(template_name):
+    """Render (or stream, with STREAM_TEMPLATES) one page of an entry list, through the render cache."""
+    sort_order = request.args.get('sort', 'desc')
+
+    def page_context():
+        page, next_url, prev_url = get_page_from_request(sort_order)
+        no_entries = len(page.entries) == 0 and prev_url is None
+        return dict(entries=page.entries, sort_order=sort_order, no_entries=no_entries,
+                    next_url=next_url, prev_url=prev_url)
+
+    if not app.config['STREAM_TEMPLATES']:
+        return render_cache.cached_page(lambda: render_template(template_name, **page_context()))
+    html = render_cache.cached_page_stream(
+        lambda: stream_entry_list(template_name, page_context(), app.config['STREAM_CHUNK_SIZE']))
+    return html if isinstance(html, str) else Response(html, mimetype='text/html')
+
+
+def expected_etag_from_request():
+    """The entry version the client last saw: an 'etag' form/query field or an If-Match header."""
+    etag = request.values.get('etag') or request.headers.get('If-Match', '')
+    # The edit page's ETag is weak when it was sent compressed
+    return etag.strip().removeprefix('W/').strip('"') or None
+
+
+@app.errorhandler(ConflictError)
+def entry_conflict(error):
+    return f"{error}. Reload the entry and apply your changes again.", 409
 
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
-    sort_order = request.args.get('sort', 'desc')
-    entries = load_entries()
     if request.method == 'POST':
-        entry = create_entry_from_form(request.form)
-        entries.insert(0, entry)
-        save_entries(entries)
+        insert_entry(create_entry_from_form(request.form))
         return redirect(url_for('reflections'))
-    sorted_entries = sort_entries_with_index(entries, sort_order)
-    return render_template('index.html', entries=sorted_entries, sort_order=sort_order)
+    return render_entry_list('index.html')
 
 
-@app.route('/edit/<int:index>', methods=['GET', 'POST'])
-def edit_entry(index):
-    entries = load_entries()
-    if not validate_index(index, entries):
+@app.route('/entries/<entry_id>/edit', methods=['GET', 'POST'])
+def edit_entry(entry_id):
+    entry = get_entry(entry_id)
+    if entry is None:
         return redirect(url_for('reflections'))
     if request.method == 'POST':
-        update_entry_from_form(entries[index], request.form)
-        save_entries(entries)
+        try:
+            replace_entry(entry_id, update_entry_from_form(dict(entry), request.form), expected_etag_from_request())
+        except KeyError:
+            # Deleted in the meantime
+            pass
         return redirect(url_for('reflections'))
-    return render_template('edit.html', entry=entries[index], index=index)
+    # The form posts the etag back, so an edit made meanwhile by someone else is detected
+    etag = entry_etag(entry)
+    response = make_response(render_template('edit.html', entry=entry, entry_id=entry_id, etag=etag))
+    response.set_etag(etag)
+    return response
 
 
-@app.route('/delete/<int:index>')
-def delete_entry(index):
+@app.route('/entries/<entry_id>/delete')
+def delete_entry(entry_id):
+    try:
+        remove_entry(entry_id, expected_etag_from_request())
+    except KeyError:
+        pass
+    return redirect(url_for('reflections'))
+
+
+def entry_id_at(index):
+    """ID of the entry at a list position, for links made before stable IDs."""
     entries = load_entries()
-    if not validate_index(index, entries):
+    return entries[index]['id'] if validate_index(index, entries) else None
+
+
+@app.route('/edit/<int:index>', methods=['GET', 'POST'])
+def legacy_edit_entry(index):
+    entry_id = entry_id_at(index)
+    if entry_id is None:
         return redirect(url_for('reflections'))
-    entries.pop(index)
-    save_entries(entries)
-    return redirect(url_for('reflections'))
+    # 308 keeps the method and body of a form submitted from an old page
+    return redirect(url_for('edit_entry', entry_id=entry_id), code=308)
+
+
+@app.route('/delete/<int:index>')
+def legacy_delete_entry(index):
+    entry_id = entry_id_at(index)
+    if entry_id is None:
+        return redirect(url_for('reflections'))
+    return redirect(url_for('delete_entry', entry_id=entry_id))
 
 
 @app.route('/export/csv')
 def export_csv():
-    entries = load_entries()
-    output = generate_csv_export(entries)
+    # ?from= and ?to= take inclusive date prefixes such as 2024-05 or 2024-05-31
+    try:
+        entries = iter_entries('desc', request.args.get('from'), request.args.get('to'))
+    except ValueError:
+        abort(400)
+    output = stream_with_context(iter_csv_export(entries))
     return Response(output, mimetype="text/csv", headers={"Content-Disposition": "attachment;filename=reflections.csv"})
 
 
 @app.route('/export/pdf')
 def export_pdf():
-    entries = load_entries()
-    pdf_content = generate_pdf_export(entries)
-    response = Response(pdf_content)
-    response.headers['Content-Disposition'] = 'attachment; filename=reflections.pdf'
-    response.headers['Content-Type'] = 'application/pdf'
+    # Rendering happens on the export worker pool; unchanged data is served from the cache
+    job_id = submit_pdf_export(get_engine())
+    if get_pdf_export_status(job_id) == 'done':
+        return redirect(url_for('download_pdf_export', job_id=job_id))
+    return redirect(url_for('pdf_export_status', job_id=job_id), code=303)
+
+
+@app.route('/export/pdf/jobs/<job_id>')
+def pdf_export_status(job_id):
+    if not is_valid_job_id(job_id):
+        abort(404)
+    status = get_pdf_export_status(job_id)
+    if status is None:
+        abort(404)
+    body = {'id': job_id, 'status': status}
+    if status == 'done':
+        body['download_url'] = url_for('download_pdf_export', job_id=job_id)
+        response = jsonify(body)
+        # Browsers following the export link continue to the download
+        response.headers['Refresh'] = f"0; url={body['download_url']}"
+        return response
+    if status == 'failed':
+        body['error'] = get_pdf_export_error(job_id)
+        return jsonify(body), 500
+    response = jsonify(body)
+    response.status_code = 202
+    response.headers['Refresh'] = '2'
+    return response
+
+
+@app.route('/export/pdf/jobs/<job_id>/download')
+def download_pdf_export(job_id):
+    if not is_valid_job_id(job_id) or get_pdf_export_status(job_id) != 'done':
+        abort(404)
+    response = send_file(pdf_path(job_id), mimetype='application/pdf', as_attachment=True,
+                         download_name='reflections.pdf', max_age=31536000)
+    # The journal is private: only the browser may keep it, not shared caches or proxies
+    response.cache_control.public = False
+    response.cache_control.private = True
     return response
 
 
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', app.config['PAGE_SIZE'], type=int), app.config['MAX_PAGE_SIZE']))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    total, hits = search_entries(query, limit, offset) if query else (0, [])
+    results = [{
+        'id': hit.entry_id,
+        'score': round(hit.score, 4),
+        'timestamp': hit.entry['timestamp'],
+        'rating': hit.entry['rating'],
+        'snippet': snippet(hit.entry, query),
+        'edit_url': url_for('edit_entry', entry_id=hit.entry_id),
+    } for hit in hits]
+    body = {'query': query, 'total': total, 'limit': limit, 'offset': offset, 'results': results}
+    if offset + limit < total:
+        body['next_url'] = url_for('search', q=query, limit=limit, offset=offset + limit)
+    return jsonify(body)
+
+
+@app.route('/stats')
+def stats():
+    # ?period= picks day, week or month buckets; ?limit= how many of the latest to return
+    period = request.args.get('period', 'month')
+    if period not in PERIODS:
+        abort(400)
+    limit = max(0, min(request.args.get('limit', 12, type=int), app.config['MAX_PAGE_SIZE']))
+    return jsonify(get_stats(period, limit))
+
+
 @app.route('/reflections')
 def reflections():
-    sort_order = request.args.get('sort', 'desc')
-    entries = load_entries()
-    sorted_entries = sort_entries_with_index(entries, sort_order)
-    no_entries = len(sorted_entries) == 0
-    return render_template('reflections.html', entries=sorted_entries, sort_order=sort_order, no_entries=no_entries)
+    return render_entry_list('reflections.html')
 
 
 if __name__ == '__main__':
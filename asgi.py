@@ -0,0 +1,26 @@
+"""ASGI entry point, for serving the app from an async server.
+
+    uvicorn asgi:application --workers 2
+
+The server's event loop holds the connections, reads request bodies and
+writes responses; only the Flask views run on thread pools. Requests under
+/export/ get their own smaller pool (ASGI_EXPORT_THREADS), so slow exports
+cannot take every thread from page views (ASGI_THREADS). Response bodies
+are handed to the event loop chunk by chunk, so streamed CSV exports stay
+streamed.
+"""
+from a2wsgi import WSGIMiddleware
+
+from app import app
+
+EXPORT_PATH_PREFIX = '/export/'
+
+pages = WSGIMiddleware(app, workers=app.config['ASGI_THREADS'])
+exports = WSGIMiddleware(app, workers=app.config['ASGI_EXPORT_THREADS'])
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'].startswith(EXPORT_PATH_PREFIX):
+        await exports(scope, receive, send)
+    else:
+        await pages(scope, receive, send)
@@ -0,0 +1,214 @@
+"""Fingerprinted static assets and compressed responses.
+
+``flask --app app build-assets`` copies every file under ``static/`` to
+``ASSETS_BUILD_DIR`` with a content hash in its name (``css/main.css`` ->
+``css/main.3f2a9c1be04d.css``), next to precompressed ``.gz`` and (with the
+``brotli`` package) ``.br`` variants of text files, and writes a
+manifest of the hashed names. Templates keep calling
+``url_for('static', filename='css/main.css')``; once the assets are built
+that returns the hashed ``/assets/...`` URL instead. Those URLs change
+whenever the file does, so they are served as immutable for a year, in the
+best encoding the browser accepts.
+
+Dynamic HTML, CSV and JSON responses are compressed on the fly by
+negotiating ``Accept-Encoding``: whole bodies at once, streamed bodies
+chunk by chunk so they keep streaming. Their ETags are made weak, since the
+same validator then stands for different bytes; conditional requests
+compare them weakly.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from storage import atomic_write, file_signature, get_config_value
+
+try:
+    import brotli
+except ImportError:  # listed in requirements.txt; without it only gzip is offered
+    brotli = None
+
+DEFAULT_ASSETS_BUILD_DIR = Path(__file__).parent / 'build' / 'assets'
+MANIFEST_NAME = 'manifest.json'
+# Hashed URLs change with the content, so browsers may keep them for a year
+ASSET_MAX_AGE = 365 * 24 * 3600
+# Text assets worth precompressing; images and fonts in compressed formats are not
+COMPRESSIBLE_SUFFIXES = {'.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ttf', '.otf'}
+# Dynamic responses compressed on the fly
+COMPRESSIBLE_MIMETYPES = {'text/html', 'text/csv', 'text/plain', 'application/json'}
+# Bodies smaller than this gain less than the compression headers and time cost
+DEFAULT_COMPRESS_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 5
+
+# Content encodings in order of preference, with their file suffix
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')] if brotli is not None else [('gzip', '.gz')]
+
+# build dir -> (manifest signature, original name -> hashed name)
+_manifests: Dict[Path, Tuple[Any, Dict[str, str]]] = {}
+
+
+def fingerprinted_name(name: str, data: bytes) -> str:
+    """'css/main.css' -> 'css/main.<12 hex digits of the content hash>.css'."""
+    path = Path(name)
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    return (path.parent / f"{path.stem}.{digest}{path.suffix}").as_posix()
+
+
+def build_assets(static_dir: Path, build_dir: Path) -> Dict[str, str]:
+    """Fingerprint and precompress every file under static_dir into build_dir; returns the manifest.
+
+    Files of earlier builds are kept: pages rendered (and cached) before a
+    rebuild still link to them.
+    """
+    static_dir, build_dir = Path(static_dir), Path(build_dir)
+    manifest: Dict[str, str] = {}
+    for path in sorted(static_dir.rglob('*')):
+        if not path.is_file() or build_dir in path.parents:
+            continue
+        name = path.relative_to(static_dir).as_posix()
+        data = path.read_bytes()
+        hashed = manifest[name] = fingerprinted_name(name, data)
+        variants = [('', data)]
+        if path.suffix.lower() in COMPRESSIBLE_SUFFIXES:
+            # Built once, so the slowest, smallest settings pay off
+            variants.append(('.gz', gzip.compress(data, 9, mtime=0)))
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=11)))
+        for suffix, content in variants:
+            if suffix and len(content) >= len(data):
+                continue
+            target = build_dir / f"{hashed}{suffix}"
+            if not target.exists():
+                atomic_write(target, lambda f, content=content: f.write(content), binary=True)
+    atomic_write(build_dir / MANIFEST_NAME, lambda f: json.dump(manifest, f, indent=2, sort_keys=True))
+    return manifest
+
+
+def get_build_dir() -> Path:
+    return Path(get_config_value('ASSETS_BUILD_DIR', DEFAULT_ASSETS_BUILD_DIR))
+
+
+def load_manifest(build_dir: Optional[Path] = None) -> Dict[str, str]:
+    """Original name -> hashed name of the built assets; empty if they were never built."""
+    build_dir = build_dir or get_build_dir()
+    path = build_dir / MANIFEST_NAME
+    signature = file_signature(path)
+    cached = _manifests.get(build_dir)
+    if cached is None or cached[0] != signature:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        cached = _manifests[build_dir] = (signature, manifest)
+    return cached[1]
+
+
+def negotiate(accept_encodings, encodings: Iterable[str]) -> Optional[str]:
+    """The accepted content encoding with the highest quality, preferring earlier ones on a tie."""
+    best, best_quality = None, 0
+    for encoding in encodings:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    return gzip.compress(data, level, mtime=0)
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str, level: int) -> Iterator[bytes]:
+    """Compress a streamed body, flushing after every chunk so the client gets each one right away."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def init_app(app) -> None:
+    """Serve built assets, point url_for('static', ...) at them and compress dynamic responses.
+
+    Call after metrics.init_app(), so request metrics count the compressed size.
+    """
+    from flask import abort, request, send_from_directory, url_for
+
+    def asset_url_for(endpoint: str, **values: Any) -> str:
+        if endpoint == 'static' and 'filename' in values:
+            hashed = load_manifest().get(values['filename'])
+            if hashed is not None:
+                values['filename'] = hashed
+                endpoint = 'asset'
+        return url_for(endpoint, **values)
+
+    app.jinja_env.globals['url_for'] = asset_url_for
+
+    @app.route('/assets/<path:filename>', endpoint='asset')
+    def asset(filename):
+        build_dir = get_build_dir()
+        # Variants are picked below; the manifest is not an asset
+        if filename == MANIFEST_NAME or filename.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+            abort(404)
+        available = [name for name, suffix in ENCODINGS if (build_dir / f"{filename}{suffix}").exists()]
+        encoding = negotiate(request.accept_encodings, available)
+        suffix = dict(ENCODINGS).get(encoding, '')
+        response = send_from_directory(build_dir, filename + suffix, mimetype=mimetypes.guess_type(filename)[0],
+                                       max_age=ASSET_MAX_AGE)
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    @app.after_request
+    def compress_response(response):
+        if (not app.config.get('COMPRESS_RESPONSES') or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers or response.direct_passthrough):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.accept_encodings, [name for name, _ in ENCODINGS])
+        if encoding is None:
+            return response
+        # The validator names the content version, not these bytes; 304s get the same weak ETag
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            response.set_etag(etag, weak=True)
+        if response.status_code < 200 or response.status_code in (204, 304) or request.method == 'HEAD':
+            return response
+        level = (get_config_value('BROTLI_QUALITY', DEFAULT_BROTLI_QUALITY) if encoding == 'br'
+                 else get_config_value('GZIP_LEVEL', DEFAULT_GZIP_LEVEL))
+        if response.is_streamed:
+            response.response = compress_stream(response.iter_encoded(), encoding, level)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < get_config_value('COMPRESS_MIN_SIZE', DEFAULT_COMPRESS_MIN_SIZE):
+                return response
+            response.set_data(compress(data, encoding, level))
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Fingerprint and precompress the files under static/."""
+        import click
+        manifest = build_assets(Path(app.static_folder), get_build_dir())
+        for name, hashed in sorted(manifest.items()):
+            click.echo(f"{name} -> {hashed}")
@@ -0,0 +1,77 @@
+"""Compare loading the JSON journal with the binary format.
+
+Usage: python benchmarks/bench_binary_format.py [sizes...]
+
+For each journal size the script measures, with the in-memory cache
+cleared, how long a full load takes and how much memory the loaded
+entries hold (tracemalloc), then the time of a first list page, which
+only needs timestamps and ratings.
+"""
+import gc
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from flask import Flask
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000]
+ENGINES = ['json', 'binary']
+PAGE_SIZE = 50
+TEXT = 'I dag øvede jeg mig i tålmodighed og i at skelne mellem det, jeg kan styre, og det, jeg ikke kan. '
+
+
+def make_entries(count):
+    start = datetime(2000, 1, 1)
+    return [{'id': storage.new_entry_id(), 'rating': i % 5 + 1,
+             'timestamp': (start + timedelta(hours=count - i)).strftime('%Y-%m-%d %H:%M:%S'),
+             **{field: TEXT * 3 for field in storage.ENTRY_FIELDS}}
+            for i in range(count)]
+
+
+def run(engine_name, entries):
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config.update(REFLECTIONS_FILE=Path(tmp) / 'reflections.json', STORAGE_ENGINE=engine_name,
+                          ENTRY_CACHE_MAX_BYTES=1 << 40)
+        with app.app_context():
+            storage.save_entries(entries)
+            engine = storage.get_engine()
+            engine.cache.clear()
+            gc.collect()
+            started = time.perf_counter()
+            storage.load_entries()
+            load = (time.perf_counter() - started) * 1000
+            # Memory is measured on a second load, as tracing slows loading down
+            engine.cache.clear()
+            gc.collect()
+            tracemalloc.start()
+            storage.load_entries()
+            memory = tracemalloc.get_traced_memory()[0] / 2 ** 20
+            tracemalloc.stop()
+            started = time.perf_counter()
+            page = storage.get_page('desc', PAGE_SIZE)
+            [(entry['timestamp'], entry['rating']) for _, entry in page.entries]
+            first_page = (time.perf_counter() - started) * 1000
+            engine.cache.clear()
+            storage._engines.clear()
+    return load, memory, first_page
+
+
+def main(sizes):
+    print(f"{'entries':>10} {'engine':>8} {'load':>11} {'memory':>10} {'first page':>12}")
+    for size in sizes:
+        entries = make_entries(size)
+        for engine in ENGINES:
+            load, memory, first_page = run(engine, entries)
+            print(f"{size:>10} {engine:>8} {load:>8.1f} ms {memory:>6.1f} MiB {first_page:>9.2f} ms")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
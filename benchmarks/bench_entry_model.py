@@ -0,0 +1,96 @@
+"""Compare the slotted Entry model with plain entry dicts.
+
+Usage: python benchmarks/bench_entry_model.py [sizes...]
+
+For each journal size the script measures the memory held by the loaded
+entries (tracemalloc, text fields shared so only per-entry overhead is
+counted), sorting them by timestamp, and filtering by rating and a date
+range, once for the dicts stored in JSON and once for Entry objects. The
+dict side uses the string comparisons storage.py used before Entry.
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+REPEAT = 3
+
+
+def make_json(count):
+    """A JSON journal of count entries, one per hour, in random-ish order."""
+    start = datetime(2000, 1, 1)
+    entries = [{'id': f'{i:014x}', 'rating': i % 5 + 1,
+                'timestamp': (start + timedelta(hours=(i * 7919) % count)).strftime('%Y-%m-%d %H:%M:%S'),
+                **{field: 'tekst' for field in storage.ENTRY_FIELDS}}
+               for i in range(count)]
+    return json.dumps(entries)
+
+
+def best_of(func, repeat=REPEAT):
+    """Best wall-clock time of several runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def measure(load):
+    """Memory held by the loaded entries in MiB, and the entries."""
+    gc.collect()
+    tracemalloc.start()
+    entries = load()
+    memory = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+    return memory, entries
+
+
+def dict_sort_key(entry):
+    return entry['timestamp'], entry['id']
+
+
+def dict_matches(entry, min_rating, date_from, date_to):
+    if min_rating is not None and entry['rating'] < min_rating:
+        return False
+    if date_from is not None and entry['timestamp'] < date_from:
+        return False
+    if date_to is not None and entry['timestamp'] > f"{date_to}~":
+        return False
+    return True
+
+
+def run(size):
+    data = make_json(size)
+    dict_memory, dicts = measure(lambda: json.loads(data))
+    entry_memory, entries = measure(lambda: [storage.Entry.from_json(entry) for entry in json.loads(data)])
+    low, high = storage.date_bounds('2001', '2003-06')
+    results = {
+        'dict': (dict_memory,
+                 best_of(lambda: sorted(dicts, key=dict_sort_key)),
+                 best_of(lambda: [entry for entry in dicts if dict_matches(entry, 4, '2001', '2003-06')])),
+        'Entry': (entry_memory,
+                  best_of(lambda: sorted(entries, key=storage.sort_key)),
+                  best_of(lambda: [entry for entry in entries if storage.entry_matches(entry, 4, low, high)])),
+    }
+    return results
+
+
+def main(sizes):
+    print(f"{'entries':>10} {'model':>6} {'memory':>10} {'per entry':>10} {'sort':>11} {'filter':>11}")
+    for size in sizes:
+        for model, (memory, sort, filtering) in run(size).items():
+            print(f"{size:>10} {model:>6} {memory:>6.1f} MiB {memory * 2 ** 20 / size:>7.0f} B "
+                  f"{sort:>8.1f} ms {filtering:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
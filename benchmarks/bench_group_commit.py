@@ -0,0 +1,67 @@
+"""Compare write throughput with and without the group-commit writer.
+
+Usage: python benchmarks/bench_group_commit.py [threads] [writes per thread]
+
+Concurrent threads insert entries the way simultaneous form submissions
+do, once committing every write on its own (GROUP_COMMIT_WINDOW = 0) and
+once coalescing them in a 5 ms window. Every write is durable (fsynced)
+before it returns in both modes.
+"""
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from flask import Flask
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage  # noqa: E402
+
+ENGINES = ['json', 'log', 'sqlite']
+WINDOWS = [0, 0.005]
+# Entries already in the journal, so a full rewrite has a realistic cost
+EXISTING_ENTRIES = 2000
+
+
+def make_entry(i):
+    return {'timestamp': f'2024-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}', 'rating': 3,
+            **{field: 'Jeg øvede tålmodighed i dag. ' * 4 for field in storage.ENTRY_FIELDS}}
+
+
+def run(engine, window, threads, writes):
+    """Writes per second for one engine and commit window."""
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config.update(REFLECTIONS_FILE=Path(tmp) / 'reflections.json', STORAGE_ENGINE=engine,
+                          GROUP_COMMIT_WINDOW=window)
+        with app.app_context():
+            storage.save_entries([make_entry(i) for i in range(EXISTING_ENTRIES)])
+
+        def worker():
+            with app.app_context():
+                for i in range(writes):
+                    storage.insert_entry(make_entry(i))
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        with app.app_context():
+            assert len(storage.load_entries()) == EXISTING_ENTRIES + threads * writes
+    return threads * writes / elapsed
+
+
+def main(threads=16, writes=20):
+    print(f"{'engine':>8} {'window':>8} {'writes/s':>10}")
+    for engine in ENGINES:
+        for window in WINDOWS:
+            print(f"{engine:>8} {window * 1000:>5.0f} ms {run(engine, window, threads, writes):>10.0f}")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,78 @@
+"""Track the cold-start import time of the app against a budget.
+
+Usage: python benchmarks/bench_importtime.py [budget]
+
+Imports ``app`` in fresh interpreters under ``python -X importtime`` (with
+FLASK_CONFIG=production and bytecode caching on, as deployed, whatever the
+caller's environment says) and reports the median time spent outside Flask
+itself: our modules, create_app() and any other library they pull in.
+The budget is a fraction of Flask's own import time, so it holds on fast
+and slow machines alike. The script exits with status 1 if the app's time
+exceeds the budget, or if a module that should only load on first use
+(PDF rendering) is imported at startup, so import-time regressions fail
+CI.
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Import time the app may add on top of Flask, as a fraction of Flask's; measured ~0.11 when set
+BUDGET = 0.25
+# Modules that must be imported on first use, not at startup
+LAZY_MODULES = ('fpdf', 'pdf_export')
+FRAMEWORK = 'flask'
+RUNS = 7
+
+LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def interpreter_env():
+    """The caller's environment, with bytecode caching on as in a deployment."""
+    env = dict(os.environ, FLASK_CONFIG='production')
+    # Without .pyc files every run would compile from source and measure the compiler
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    return env
+
+
+def import_times():
+    """(self, cumulative) microseconds per module for one cold import of app."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=interpreter_env(),
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            times[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return times
+
+
+def main(budget):
+    # Warm-up: the first run writes the bytecode caches and fills the OS file cache
+    import_times()
+    runs = [import_times() for _ in range(RUNS)]
+    total = statistics.median(run['app'][1] for run in runs) / 1000
+    framework = statistics.median(run[FRAMEWORK][1] for run in runs) / 1000
+    own = statistics.median((run['app'][1] - run[FRAMEWORK][1]) for run in runs) / 1000
+    print(f"import app: {total:.1f} ms, of which {FRAMEWORK}: {framework:.1f} ms, app on top: {own:.1f} ms "
+          f"= {own / framework:.2f} of {FRAMEWORK} (budget {budget:.2f})")
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1][0], reverse=True)[:10]
+    for name, (self_time, _) in slowest:
+        print(f"  {self_time / 1000:>7.1f} ms  {name}")
+    failures = []
+    if own > budget * framework:
+        failures.append(f"app import adds {own / framework:.2f} of {FRAMEWORK}'s import time, over the {budget:.2f} budget")
+    eager = [name for name in LAZY_MODULES if name in runs[-1]]
+    if eager:
+        failures.append(f"imported at startup but should load on first use: {', '.join(eager)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET))
@@ -0,0 +1,84 @@
+"""Compare one JSON file with monthly partitions ('json' vs 'monthly' engine).
+
+Usage: python benchmarks/bench_partitions.py [sizes...]
+
+For each synthetic journal size (see synthetic.py) the script times, on
+an engine opened fresh as in a new worker process: the first page of the
+newest entries, a CSV-style read of one month (iterate over a date range),
+and adding one entry. Adding an entry to a warm engine is timed as well,
+which is where the single file has to be rewritten in full.
+"""
+import shutil
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS.parent))
+sys.path.insert(0, str(BENCHMARKS))
+
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000]
+ENGINES = [storage.JsonFileEngine, storage.MonthlyPartitionEngine]
+REPEAT = 5
+
+
+def best_of(func, setup=None, repeat=REPEAT):
+    """Best wall-clock time of several runs, in milliseconds; setup() runs untimed before each."""
+    timings = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        started = time.perf_counter()
+        func(argument)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def new_entry():
+    return storage.create_entry_from_form({'morning_control': 'Jeg øvede tålmodighed i dag.', 'rating': '4'})
+
+
+def run(engine_class, path):
+    """Timings in milliseconds for one engine on the journal at path."""
+    # Split the journal once, outside the timings
+    engine_class(path).load()
+    # The newest month of the synthetic journal
+    month = (synthetic.END - timedelta(days=1)).strftime('%Y-%m')
+    return {
+        'first page (cold)': best_of(lambda engine: engine.page(limit=20), lambda: engine_class(path)),
+        'one month (cold)': best_of(lambda engine: list(engine.iterate('desc', month, month)),
+                                    lambda: engine_class(path)),
+        'add entry (cold)': best_of(lambda engine: engine.insert(new_entry()), lambda: engine_class(path)),
+        'add entry (warm)': best_of(lambda engine: engine.insert(new_entry()), lambda: warm(engine_class(path))),
+    }
+
+
+def warm(engine):
+    engine.load()
+    return engine
+
+
+def main(sizes):
+    for size in sizes:
+        print(f"{size} entries")
+        directory = Path(tempfile.mkdtemp())
+        try:
+            results = {}
+            for engine_class in ENGINES:
+                path = directory / engine_class.name / 'reflections.json'
+                path.parent.mkdir()
+                synthetic.write_journal(path, size)
+                results[engine_class.name] = run(engine_class, path)
+            print(f"  {'':<20}" + ''.join(f"{engine_class.name:>12}" for engine_class in ENGINES))
+            for case in results[ENGINES[0].name]:
+                print(f"  {case:<20}" + ''.join(f"{results[engine_class.name][case]:>9.1f} ms" for engine_class in ENGINES))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
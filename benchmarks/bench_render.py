@@ -0,0 +1,91 @@
+"""Time the entry list page with and without the render cache.
+
+Usage: python benchmarks/bench_render.py [entries] [page size]
+
+Serves ``/reflections`` through the Flask test client from a synthetic
+journal, with a stand-in ``reflections.html`` that lays out every field of
+each entry the way the real template does (the templates are not needed
+to run this). Reports the median time of a view with the render cache
+cleared each time, a view after an edit (page re-rendered from cached
+entry fragments), and a repeat view of an unchanged journal. Uncached
+views are timed rendered in one piece and streamed (STREAM_TEMPLATES),
+where the time to the first chunk is what the browser waits for.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import jinja2
+
+BENCHMARKS = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS.parent))
+sys.path.insert(0, str(BENCHMARKS))
+os.environ.setdefault('FLASK_CONFIG', 'testing')
+
+import render_cache  # noqa: E402
+import synthetic  # noqa: E402
+from app import app  # noqa: E402
+
+REPEAT = 50
+TEMPLATE = '''<!DOCTYPE html><html lang="da"><head><title>Refleksioner</title></head><body>
+<h1>Refleksioner</h1><ul>{% for entry_id, entry in entries %}{% call entry_fragment(entry) %}
+<li class="entry"><h3>{{ entry.timestamp }} <span class="rating">{{ '★' * entry.rating }}</span></h3>
+{% for field in ['morning_control', 'morning_challenges', 'morning_virtue',
+                 'evening_good', 'evening_better', 'evening_learning'] %}
+{% if entry[field] %}<p class="{{ field }}">{{ entry[field] | replace('\\n', ' ') | truncate(400) }}</p>{% endif %}
+{% endfor %}<a href="{{ url_for('edit_entry', entry_id=entry_id) }}">Rediger</a>
+<a href="{{ url_for('delete_entry', entry_id=entry_id) }}">Slet</a></li>
+{% endcall %}{% endfor %}</ul>{% if next_url %}<a href="{{ next_url }}">Ældre</a>{% endif %}
+</body></html>'''
+
+
+def median_ms(func, before=None):
+    timings = []
+    for _ in range(REPEAT):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main(entries=10_000, page_size=50):
+    directory = Path(tempfile.mkdtemp())
+    app.config.update(REFLECTIONS_FILE=synthetic.write_journal(directory / 'reflections.json', entries),
+                      EXPORT_CACHE_DIR=directory / 'exports')
+    app.jinja_loader = jinja2.DictLoader({'reflections.html': TEMPLATE})
+    client = app.test_client()
+    url = f'/reflections?limit={page_size}'
+
+    def view():
+        response = client.get(url)
+        # Reading the body runs a streamed template to the end
+        response.get_data()
+        assert response.status_code == 200
+
+    def edit():
+        entry = client.get('/api/v1/entries?limit=1').get_json()['entries'][0]
+        client.patch(f"/api/v1/entries/{entry['id']}", json={'rating': entry['rating'] % 5 + 1})
+
+    def first_chunk():
+        response = client.get(url, buffered=False)
+        next(iter(response.response))
+        response.close()
+
+    view()
+    print(f"/reflections, {page_size} of {entries} entries")
+    app.config['STREAM_TEMPLATES'] = False
+    print(f"  no cache:           {median_ms(view, before=render_cache.clear):7.2f} ms")
+    app.config['STREAM_TEMPLATES'] = True
+    print(f"  no cache, streamed: {median_ms(view, before=render_cache.clear):7.2f} ms, "
+          f"first chunk after {median_ms(first_chunk, before=render_cache.clear):.2f} ms")
+    print(f"  after an edit:      {median_ms(view, before=edit):7.2f} ms")
+    print(f"  unchanged journal:  {median_ms(view):7.2f} ms")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,147 @@
+"""Load-test the app served as WSGI (Werkzeug, as `python app.py` runs it) and as ASGI (uvicorn asgi:application).
+
+Usage: python benchmarks/bench_serving.py [entries] [clients] [exporters] [seconds]
+
+Each server runs in a subprocess on a temporary journal of ``entries``
+entries. ``clients`` concurrent clients request JSON pages of entries
+(``/api/v1/entries?limit=20``) as fast as they can, while ``exporters``
+clients keep downloading the full CSV export and reading it slowly, the
+way a phone on a poor connection would. The script reports page views
+per second and their median and 99th percentile latency.
+"""
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import storage  # noqa: E402
+
+DEFAULT_ENTRIES = 5_000
+DEFAULT_CLIENTS = 50
+DEFAULT_EXPORTERS = 8
+DEFAULT_SECONDS = 10
+# Exporters read this many bytes of the CSV every 10 ms
+EXPORT_READ_SIZE = 16 * 1024
+
+SERVERS = {
+    'wsgi': "from app import app\n"
+            "app.config['REFLECTIONS_FILE'] = {path!r}\n"
+            "app.run(port={port}, threaded=True, use_reloader=False)\n",
+    'asgi': "import uvicorn, asgi\n"
+            "asgi.app.config['REFLECTIONS_FILE'] = {path!r}\n"
+            "uvicorn.run(asgi.application, port={port}, log_level='warning')\n",
+}
+
+
+def make_journal(path, count):
+    start = datetime(2020, 1, 1)
+    entries = [{'id': f'{i:014x}', 'rating': i % 5 + 1,
+                'timestamp': (start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S'),
+                **{field: 'Dagens refleksion om tålmodighed og dyd. ' * 4 for field in storage.ENTRY_FIELDS}}
+               for i in range(count)]
+    path.write_text(json.dumps(entries), encoding='utf-8')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+async def request(port, path, slow=False):
+    """One GET over a fresh connection; returns the status code."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode('ascii'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    while await reader.read(EXPORT_READ_SIZE if slow else 65536):
+        if slow:
+            await asyncio.sleep(0.01)
+    writer.close()
+    return status
+
+
+async def wait_until_up(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await request(port, '/api/v1/entries?limit=1')
+            return
+        except (OSError, IndexError, ValueError):
+            await asyncio.sleep(0.1)
+    raise RuntimeError('Server did not start')
+
+
+async def load(port, clients, exporters, seconds):
+    deadline = time.monotonic() + seconds
+    latencies, errors = [], 0
+
+    async def page_client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await request(port, '/api/v1/entries?limit=20')
+            except OSError:
+                status = None
+            if status == 200:
+                latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                errors += 1
+
+    async def export_client():
+        while time.monotonic() < deadline:
+            try:
+                await request(port, '/export/csv', slow=True)
+            except OSError:
+                pass
+
+    tasks = [page_client() for _ in range(clients)] + [export_client() for _ in range(exporters)]
+    # Exporters still downloading at the deadline are abandoned
+    await asyncio.wait([asyncio.ensure_future(task) for task in tasks], timeout=seconds + 5)
+    return latencies, errors
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+
+def run(mode, entries, clients, exporters, seconds):
+    directory = Path(tempfile.mkdtemp())
+    path = directory / 'reflections.json'
+    make_journal(path, entries)
+    port = free_port()
+    code = SERVERS[mode].format(path=str(path), port=port)
+    server = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, stderr=subprocess.DEVNULL,
+                              stdout=subprocess.DEVNULL, env=dict(os.environ, PYTHONPATH=str(ROOT)))
+    try:
+        asyncio.run(wait_until_up(port))
+        latencies, errors = asyncio.run(load(port, clients, exporters, seconds))
+    finally:
+        server.terminate()
+        server.wait()
+    return len(latencies) / seconds, percentile(latencies, 0.5), percentile(latencies, 0.99), errors
+
+
+def main(entries, clients, exporters, seconds):
+    print(f"{entries} entries, {clients} page clients, {exporters} slow exporters, {seconds} s")
+    print(f"{'mode':>6} {'pages/s':>9} {'p50':>10} {'p99':>10} {'errors':>7}")
+    for mode in SERVERS:
+        rate, p50, p99, errors = run(mode, entries, clients, exporters, seconds)
+        print(f"{mode:>6} {rate:>9.0f} {p50:>7.1f} ms {p99:>7.1f} ms {errors:>7}")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    defaults = [DEFAULT_ENTRIES, DEFAULT_CLIENTS, DEFAULT_EXPORTERS, DEFAULT_SECONDS]
+    main(*(args + defaults[len(args):]))
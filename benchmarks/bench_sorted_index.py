@@ -0,0 +1,69 @@
+"""Compare re-sorting on every request with the maintained sorted index.
+
+Usage: python benchmarks/bench_sorted_index.py [sizes...]
+
+For each journal size the script times one page view (50 entries) the old
+way, ``sort_entries_with_index`` over every entry, and through the engine's
+incrementally maintained index. It also times an insert, which updates the
+index in place.
+"""
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from flask import Flask
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage  # noqa: E402
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+PAGE_SIZE = 50
+REPEAT = 5
+
+
+def make_entries(count):
+    """Newest-first entries, one per hour, with just the fields the index needs."""
+    start = datetime(2000, 1, 1)
+    return [{'timestamp': (start + timedelta(hours=count - i)).strftime('%Y-%m-%d %H:%M:%S'), 'rating': 3}
+            for i in range(count)]
+
+
+def best_of(func, repeat=REPEAT):
+    """Best wall-clock time of several runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def run(size):
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'reflections.json'
+        path.write_text(json.dumps(make_entries(size)), encoding='utf-8')
+        app.config.update(REFLECTIONS_FILE=path, STORAGE_ENGINE='log', ENTRY_CACHE_MAX_BYTES=1 << 40)
+        with app.app_context():
+            engine = storage.get_engine()
+            entries = storage.load_entries()
+            resort = best_of(lambda: storage.sort_entries_with_index(entries, 'desc')[:PAGE_SIZE])
+            build = best_of(lambda: (setattr(engine.cache, 'keys', None), engine.cache.sorted_keys()), repeat=1)
+            page = best_of(lambda: storage.get_page('desc', PAGE_SIZE))
+            insert = best_of(lambda: storage.insert_entry({'timestamp': '2100-01-01 00:00:00', 'rating': 3}))
+    return resort, build, page, insert
+
+
+def main(sizes):
+    print(f"{'entries':>10} {'re-sort/page':>14} {'index build':>13} {'index/page':>12} {'insert':>10} {'speedup':>9}")
+    for size in sizes:
+        resort, build, page, insert = run(size)
+        print(f"{size:>10} {resort:>11.2f} ms {build:>10.2f} ms {page:>9.3f} ms {insert:>7.3f} ms {resort / page:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,91 @@
+"""Compare the running statistics aggregates with recomputing them per view.
+
+Usage: python benchmarks/bench_stats.py [sizes...]
+
+For each journal size the script times one dashboard view computed from
+scratch (load every entry, bucket by month, rating histogram and streaks),
+one view served from the maintained aggregates, and applying one edit
+to the aggregates.
+"""
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import analytics  # noqa: E402
+import storage  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+REPEAT = 5
+
+
+def make_entries(count):
+    """count entries, three per day on average, with a few gaps in the streaks."""
+    start = datetime(2000, 1, 1)
+    return [storage.Entry(f'{i:014x}', (start + timedelta(hours=8 * i + i % 7)).strftime('%Y-%m-%d %H:%M:%S'),
+                          rating=i % 6)
+            for i in range(count) if i % 97]
+
+
+def best_of(func, repeat=REPEAT):
+    """Best wall-clock time of several runs, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def naive_stats(engine):
+    """What a dashboard view costs without aggregates."""
+    entries = engine.load()
+    months = {}
+    for entry in entries:
+        month = months.setdefault(entry['timestamp'][:7], Counter())
+        month[entry['rating']] += 1
+    days = sorted({analytics.entry_day(entry) for entry in entries})
+    longest = run = 0
+    for previous, day in zip([None] + days, days):
+        run = run + 1 if previous == day - 1 else 1
+        longest = max(longest, run)
+    return months, longest
+
+
+def run(size):
+    directory = Path(tempfile.mkdtemp())
+    engine = storage.JsonFileEngine(directory / 'reflections.json')
+    engine.save(make_entries(size))
+    statistics = analytics.Statistics(engine)
+    statistics.summary()
+    entry = engine.load()[size // 2].copy()
+
+    def edit():
+        """Time to apply one stored edit to the aggregates (the storage write itself is not timed)."""
+        previous = engine.version()
+        entry['rating'] = (entry['rating'] + 1) % 6
+        engine.update(entry['id'], entry)
+        started = time.perf_counter()
+        statistics.apply(previous, 'update', entry['id'], entry)
+        return (time.perf_counter() - started) * 1000
+
+    edits = min(edit() for _ in range(REPEAT))
+    statistics.summary()
+    return (best_of(lambda: naive_stats(engine)),
+            best_of(lambda: statistics.summary('month', 12)),
+            edits)
+
+
+def main(sizes):
+    print(f"{'entries':>10} {'recompute':>12} {'aggregates':>12} {'apply edit':>12}")
+    for size in sizes:
+        naive, aggregated, edit = run(size)
+        print(f"{size:>10} {naive:>9.2f} ms {aggregated:>9.3f} ms {edit:>9.2f} ms")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
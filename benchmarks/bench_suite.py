@@ -0,0 +1,233 @@
+"""Benchmark suite for the storage and export hot paths, with saved baselines.
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 1000,10000,100000] [--engine json]
+                                     [--save NAME] [--compare NAME] [--threshold 0.2]
+
+For each synthetic journal size (see synthetic.py) every case runs in a
+fresh process on its own copy of the journal, so the reported peak RSS
+(resident memory) belongs to that case alone:
+
+- storage.load_entries (entry cache cleared, so the storage file is parsed),
+  storage.save_entries, storage.sort_entries_with_index,
+  storage.generate_csv_export and storage.generate_pdf_export
+  (fragment cache cleared; only up to PDF_MAX_SIZE entries)
+- full requests through the Flask test client: a page of the JSON API,
+  one entry, a search, /stats and the streamed CSV export
+
+Each case reports p50 and p99 latency over its repetitions and its
+throughput (entries per second for whole-journal operations, requests
+per second for routes). ``--save`` writes the results with the current
+git commit to benchmarks/baselines/NAME.json; ``--compare`` prints the
+change against a saved baseline and exits with status 1 if any p50 got
+slower by more than the threshold.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).resolve().parent
+ROOT = BENCHMARKS.parent
+BASELINE_DIR = BENCHMARKS / 'baselines'
+JOURNAL_DIR = Path(tempfile.gettempdir()) / 'stoic-bench-journals'
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_THRESHOLD = 0.2
+# Repetitions of whole-journal operations, and requests per route
+REPEAT = 7
+ROUTE_REQUESTS = 200
+# FPDF lays out every line in Python; larger journals take minutes per run
+PDF_MAX_SIZE = 10_000
+
+STORAGE_CASES = ['load_entries', 'save_entries', 'sort_entries_with_index', 'generate_csv_export',
+                 'generate_pdf_export']
+ROUTE_CASES = {
+    'GET /api/v1/entries': '/api/v1/entries?limit=50',
+    'GET /api/v1/entries/<id>': '/api/v1/entries/{entry_id}',
+    'GET /search': '/search?q=t%C3%A5lmodighed',
+    'GET /stats': '/stats',
+    'GET /export/csv': '/export/csv',
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def time_calls(func, repeat, before=None):
+    """Wall-clock milliseconds of each call; before() runs untimed ahead of every call."""
+    timings = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def run_case(case, size, engine_name, journal):
+    """Run one case in this process; returns its measurements."""
+    os.environ['FLASK_CONFIG'] = 'testing'
+    sys.path.insert(0, str(ROOT))
+    import storage
+    from app import app
+
+    workdir = Path(tempfile.mkdtemp(prefix='stoic-bench-'))
+    try:
+        path = workdir / 'reflections.json'
+        shutil.copyfile(journal, path)
+        app.config.update(REFLECTIONS_FILE=path, STORAGE_ENGINE=engine_name, ENTRY_CACHE_MAX_BYTES=1 << 40,
+                          EXPORT_CACHE_DIR=workdir / 'exports')
+        with app.app_context():
+            # Imports the JSON journal into other engines, outside the timings
+            entries = storage.load_entries()
+            engine = storage.get_engine()
+            repeat, per_item = REPEAT, True
+            if case == 'load_entries':
+                timings = time_calls(storage.load_entries, repeat, before=engine.cache.clear)
+            elif case == 'save_entries':
+                timings = time_calls(lambda: storage.save_entries(entries), repeat)
+            elif case == 'sort_entries_with_index':
+                timings = time_calls(lambda: storage.sort_entries_with_index(entries), repeat)
+            elif case == 'generate_csv_export':
+                timings = time_calls(lambda: storage.generate_csv_export(entries), repeat)
+            elif case == 'generate_pdf_export':
+                import pdf_export
+                repeat = 3
+                timings = time_calls(lambda: storage.generate_pdf_export(entries), repeat,
+                                     before=pdf_export._fragments.clear)
+            else:
+                client = app.test_client()
+                url = ROUTE_CASES[case].format(entry_id=entries[len(entries) // 2]['id'])
+                per_item = False
+                repeat = REPEAT if case == 'GET /export/csv' else ROUTE_REQUESTS
+
+                def request():
+                    response = client.get(url)
+                    response.get_data()
+                    assert response.status_code == 200, response.status_code
+
+                # The first request builds the search index and statistics
+                request()
+                timings = time_calls(request, repeat)
+        p50 = percentile(timings, 0.5)
+        return {
+            'p50_ms': round(p50, 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'throughput': round((size if per_item else 1) / (p50 / 1000), 1) if p50 else None,
+            'unit': 'entries/s' if per_item else 'requests/s',
+            'peak_rss_mib': round(peak_rss_mib(), 1),
+            'runs': repeat,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def peak_rss_mib():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def run_isolated(case, size, engine_name, journal):
+    result = subprocess.run([sys.executable, __file__, '--worker', case, str(size), engine_name, str(journal)],
+                            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed'}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=ROOT, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print the change of each case against the baseline; returns the number of regressions."""
+    regressions = 0
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('engine')} engine):")
+    for key, result in results.items():
+        before = baseline['results'].get(key)
+        if not before or 'error' in before or 'error' in result:
+            continue
+        change = result['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+        rss_change = result['peak_rss_mib'] - before['peak_rss_mib']
+        flag = ''
+        if change > threshold:
+            flag = '  SLOWER'
+            regressions += 1
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"  {key:<48} p50 {change:+7.1%}  peak RSS {rss_change:+7.1f} MiB{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated journal sizes')
+    parser.add_argument('--engine', default='json', help='storage engine to benchmark')
+    parser.add_argument('--cases', help='comma-separated subset of cases to run')
+    parser.add_argument('--save', metavar='NAME', help='save the results as baseline NAME')
+    parser.add_argument('--compare', metavar='NAME', help='compare with baseline NAME')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative p50 slowdown that counts as a regression')
+    parser.add_argument('--worker', nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        case, size, engine_name, journal = args.worker
+        print(json.dumps(run_case(case, int(size), engine_name, journal)))
+        return 0
+
+    sys.path.insert(0, str(BENCHMARKS))
+    import synthetic
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    cases = args.cases.split(',') if args.cases else STORAGE_CASES + list(ROUTE_CASES)
+    JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+    results = {}
+    print(f"{'case':<34} {'entries':>9} {'p50':>11} {'p99':>11} {'throughput':>22} {'peak RSS':>11}")
+    for size in sizes:
+        journal = synthetic.cached_journal(JOURNAL_DIR, size)
+        for case in cases:
+            if case == 'generate_pdf_export' and size > PDF_MAX_SIZE:
+                continue
+            result = results[f"{case} @ {size}"] = run_isolated(case, size, args.engine, journal)
+            if 'error' in result:
+                print(f"{case:<34} {size:>9}  error: {result['error']}")
+                continue
+            print(f"{case:<34} {size:>9} {result['p50_ms']:>8.2f} ms {result['p99_ms']:>8.2f} ms "
+                  f"{result['throughput']:>11.0f} {result['unit']:<10} {result['peak_rss_mib']:>7.1f} MiB")
+
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        baseline = {'commit': git_commit(), 'engine': args.engine, 'python': platform.python_version(),
+                    'platform': platform.platform(), 'results': results}
+        path = BASELINE_DIR / f"{args.save}.json"
+        path.write_text(json.dumps(baseline, indent=2) + '\n', encoding='utf-8')
+        print(f"\nSaved baseline {path}")
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text(encoding='utf-8'))
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
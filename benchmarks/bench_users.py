@@ -0,0 +1,76 @@
+"""Compare one journal shared by all users with a storage shard per user.
+
+Usage: python benchmarks/bench_users.py [users] [writes per user]
+
+Every user already has EXISTING_ENTRIES entries and, on a thread of its
+own, inserts entries while reading its latest page after each write. With
+a shared journal (MULTI_USER off) all writes contend for one file lock and
+rewrite everyone's entries; with shards (MULTI_USER on) each user only
+locks and rewrites their own journal. The script reports total writes per
+second and the slowest user's time, which shows whether load is spread
+evenly.
+"""
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from flask import Flask, g
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage  # noqa: E402
+
+ENGINES = ['json', 'sqlite']
+EXISTING_ENTRIES = 500
+
+
+def make_entry(i):
+    return {'timestamp': f'2024-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}', 'rating': 3,
+            **{field: 'Jeg øvede tålmodighed i dag. ' * 4 for field in storage.ENTRY_FIELDS}}
+
+
+def run(engine, sharded, users, writes):
+    """(writes per second, slowest user's seconds) for one engine and layout."""
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config.update(STORAGE_DIR=Path(tmp), REFLECTIONS_FILE=Path(tmp) / 'reflections.json',
+                          STORAGE_ENGINE=engine, MULTI_USER=sharded)
+        existing = [make_entry(i) for i in range(EXISTING_ENTRIES)]
+        for user in range(users if sharded else 1):
+            with app.app_context():
+                g.user_id = f"user{user}"
+                storage.save_entries(existing * (1 if sharded else users))
+        durations = [0.0] * users
+
+        def worker(user):
+            with app.app_context():
+                g.user_id = f"user{user}"
+                started = time.perf_counter()
+                for i in range(writes):
+                    storage.insert_entry(make_entry(i))
+                    storage.get_page(limit=20)
+                durations[user] = time.perf_counter() - started
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in range(users)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    return users * writes / elapsed, max(durations)
+
+
+def main(users=16, writes=20):
+    print(f"{users} users with {EXISTING_ENTRIES} entries each, {writes} writes per user")
+    print(f"{'engine':>8} {'layout':>8} {'writes/s':>10} {'slowest user':>13}")
+    for engine in ENGINES:
+        for sharded in (False, True):
+            rate, slowest = run(engine, sharded, users, writes)
+            print(f"{engine:>8} {'sharded' if sharded else 'shared':>8} {rate:>10.0f} {slowest:>11.2f} s")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
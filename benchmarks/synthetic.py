@@ -0,0 +1,79 @@
+"""Synthetic journals with realistic Danish reflections, for benchmarks.
+
+Entries are written about once a day, newest first like storage keeps
+them, with skipped days and several entries on some days; journals too
+large for that are packed into the last SPAN_YEARS years. Each
+reflection field holds one to four Danish sentences (about 40 to 250
+characters, with æ, ø and å), and now and then a field is left empty,
+as in real journals. The same count and seed always give the same journal.
+"""
+import json
+import random
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage  # noqa: E402
+
+END = datetime(2025, 1, 1)
+SPAN_YEARS = 30
+MINUTES_PER_DAY = 24 * 60
+
+SUBJECTS = ['Jeg', 'Vi', 'Min kollega', 'Min søster', 'Familien', 'Chefen', 'Naboen', 'Ingen']
+VERBS = ['kan styre', 'mistede', 'øvede', 'lærte om', 'tænkte over', 'mødte', 'accepterede', 'glemte']
+OBJECTS = [
+    'min tålmodighed', 'morgenens stilhed', 'den svære samtale', 'mine forventninger', 'trafikken på vej hjem',
+    'vejret', 'andres meninger', 'min egen reaktion', 'et gammelt venskab', 'dagens opgaver', 'frygten for at fejle',
+    'glæden ved små ting', 'retfærdighed', 'mod og mådehold', 'visdom i hverdagen', 'tiden med børnene',
+]
+ENDINGS = [
+    'i dag.', 'uden at klage.', 'med ro i sindet.', 'bedre end i går.', 'og det føltes godt.',
+    'selvom det var svært.', 'som Epiktet ville have gjort.', 'før frokost.', 'på en ærlig måde.',
+]
+
+
+def sentence(rng):
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(ENDINGS)}"
+
+
+def reflection(rng):
+    if rng.random() < 0.08:
+        return ''
+    return ' '.join(sentence(rng) for _ in range(rng.choice((1, 1, 2, 2, 3, 4))))
+
+
+def iter_entries(count, seed=0):
+    """count synthetic entries, newest first."""
+    rng = random.Random(seed)
+    # Average minutes between entries: a bit over a day, unless that would not fit the span
+    gap = min(1.2 * MINUTES_PER_DAY, SPAN_YEARS * 365 * MINUTES_PER_DAY / max(count, 1))
+    moment = END
+    for _ in range(count):
+        moment -= timedelta(minutes=rng.uniform(0.1, 2 * gap))
+        timestamp = moment.strftime('%Y-%m-%d %H:%M:%S')
+        # Same layout as storage.new_entry_id(), with a seeded random part
+        entry_id = f"{storage.timestamp_seconds(timestamp):08x}{rng.randrange(1 << 24):06x}"
+        yield {'id': entry_id, 'timestamp': timestamp,
+               **{field: reflection(rng) for field in storage.ENTRY_FIELDS}, 'rating': rng.randint(1, 5)}
+
+
+def write_journal(path, count, seed=0):
+    """Write a synthetic JSON journal of count entries, streaming it so large journals fit in memory."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for i, entry in enumerate(iter_entries(count, seed)):
+            f.write((',\n' if i else '\n') + json.dumps(entry, ensure_ascii=False))
+        f.write('\n]')
+    return path
+
+
+def cached_journal(directory, count, seed=0):
+    """A synthetic journal under directory, generated on first use."""
+    path = Path(directory) / f"journal-{count}-{seed}.json"
+    if not path.exists():
+        tmp = path.with_suffix('.tmp')
+        write_journal(tmp, count, seed)
+        tmp.replace(path)
+    return path
@@ -0,0 +1,176 @@
+"""Change journal for delta sync.
+
+Every create, edit and delete made through storage.py is appended to a
+small sidecar file next to the storage file (``reflections.json.changes``)
+as ``{"at": <seconds>, "id": ..., "op": ...}``. The ``at`` values are
+taken under a lock and strictly increase, so they double as sync tokens:
+a client that synced up to token T only needs the entries whose latest
+change is after T, plus the IDs deleted since.
+
+The journal is compacted to the latest record per entry. Delete records
+(tombstones) older than ``SYNC_HISTORY_DAYS`` are dropped; the newest
+dropped time becomes the horizon, and older tokens need a full resync.
+"""
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from storage import (
+    StorageEngine, add_change_listener, add_close_listener, atomic_write, file_lock, file_signature, get_config_value,
+    get_engine
+)
+
+DEFAULT_SYNC_HISTORY_DAYS = 30
+# Compact once the journal holds this many records per entry it describes
+COMPACT_RATIO = 4
+COMPACT_MIN_RECORDS = 1000
+
+
+class SyncTokenExpired(Exception):
+    """The sync token is older than the retained change history."""
+
+
+class Changes(NamedTuple):
+    changed: List[str]
+    deleted: List[str]
+    token: float
+
+
+class ChangeLog:
+    """The change journal of one storage engine."""
+
+    def __init__(self, engine: StorageEngine):
+        self.path = Path(engine.path).with_name(Path(engine.path).name + '.changes')
+        self.lock_path = self.path.with_name(self.path.name + '.lock')
+        self.lock = threading.Lock()
+        self.signature = None
+        # entry id -> (time, op) of its latest change
+        self.latest: Dict[str, Tuple[float, str]] = {}
+        self.horizon = 0.0
+        self.last = 0.0
+
+    def record(self, op: str, entry_id: str) -> float:
+        """Append one change; returns its time."""
+        with file_lock(self.lock_path):
+            last = self._last_time()
+            at = max(round(time.time(), 6), round(last + 0.000001, 6))
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'at': at, 'id': entry_id, 'op': op}) + '\n')
+        return at
+
+    def changes_since(self, since: float) -> Changes:
+        """IDs changed and deleted after the token, and the token to sync from next.
+
+        Raises SyncTokenExpired if the history no longer reaches back to the token.
+        """
+        with self.lock:
+            self._load()
+            if since < self.horizon:
+                raise SyncTokenExpired(since)
+            changed = [entry_id for entry_id, (at, op) in self.latest.items() if at > since and op != 'delete']
+            deleted = [entry_id for entry_id, (at, op) in self.latest.items() if at > since and op == 'delete']
+            return Changes(changed, deleted, max(self.last, since))
+
+    def last_change(self, entry_id: Optional[str] = None) -> Optional[float]:
+        """Time of the latest change of one entry, or of any entry; None if unknown."""
+        with self.lock:
+            self._load()
+            if entry_id is None:
+                return self.last or None
+            return self.latest[entry_id][0] if entry_id in self.latest else None
+
+    def _last_time(self) -> float:
+        """Time of the last record in the file, read from its tail."""
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(max(0, f.seek(0, 2) - 4096))
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return 0.0
+        for line in reversed(lines):
+            try:
+                return json.loads(line)['at']
+            except (ValueError, KeyError):
+                # A torn or partial line
+                continue
+        return 0.0
+
+    def _load(self) -> None:
+        signature = file_signature(self.path)
+        if signature == self.signature:
+            return
+        latest: Dict[str, Tuple[float, str]] = {}
+        horizon, last, records = 0.0, 0.0, 0
+        if signature is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    records += 1
+                    if 'horizon' in record:
+                        horizon = record['horizon']
+                        continue
+                    latest[record['id']] = (record['at'], record['op'])
+                    last = max(last, record['at'])
+        self.latest, self.horizon, self.last, self.signature = latest, horizon, last, signature
+        if records > max(COMPACT_MIN_RECORDS, len(latest) * COMPACT_RATIO):
+            self._compact(signature)
+
+    def _compact(self, signature: Any) -> None:
+        """Rewrite the journal with the latest record per entry, dropping old tombstones."""
+        days = get_config_value('SYNC_HISTORY_DAYS', DEFAULT_SYNC_HISTORY_DAYS)
+        cutoff = time.time() - days * 86400
+        with file_lock(self.lock_path, timeout=0) as acquired:
+            # Skipped if a writer is busy or appended meanwhile; a later load retries
+            if not acquired or file_signature(self.path) != signature:
+                return
+            expired = [at for at, op in self.latest.values() if op == 'delete' and at < cutoff]
+            horizon = max(expired + [self.horizon])
+            kept = sorted((at, entry_id, op) for entry_id, (at, op) in self.latest.items()
+                          if not (op == 'delete' and at < cutoff))
+
+            def write(f):
+                f.write(json.dumps({'horizon': horizon}) + '\n')
+                for at, entry_id, op in kept:
+                    f.write(json.dumps({'at': at, 'id': entry_id, 'op': op}) + '\n')
+
+            atomic_write(self.path, write)
+        self.latest = {entry_id: (at, op) for at, entry_id, op in kept}
+        self.horizon = horizon
+        self.signature = file_signature(self.path)
+
+
+_logs: Dict[int, ChangeLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_change_log(engine: Optional[StorageEngine] = None) -> ChangeLog:
+    """The change journal of the given (default: current) storage engine."""
+    engine = engine or get_engine()
+    with _logs_lock:
+        if engine.closed:
+            # Closed while this request used it: not registered again, as nothing would drop it
+            return _logs.get(id(engine)) or ChangeLog(engine)
+        if id(engine) not in _logs:
+            _logs[id(engine)] = ChangeLog(engine)
+        return _logs[id(engine)]
+
+
+def _on_storage_change(engine: StorageEngine, previous_version: Any, op: str, entry_id: str,
+                       entry: Optional[Dict[str, Any]]) -> None:
+    get_change_log(engine).record(op, entry_id)
+
+
+add_change_listener(_on_storage_change)
+
+
+def _on_engine_close(engine: StorageEngine) -> None:
+    with _logs_lock:
+        _logs.pop(id(engine), None)
+
+
+add_close_listener(_on_engine_close)
@@ -0,0 +1,176 @@
+"""Background PDF export jobs with a content-addressed result cache.
+
+PDFs are rendered on a small worker pool instead of inside the request.
+Each result is stored under ``EXPORT_CACHE_DIR`` named after a hash of the
+storage version and the PDF layout version, so asking again for unchanged
+data returns the cached file straight away without reading the journal;
+the entries are only loaded by the worker that renders them. Job state
+lives next to the results as marker files, so every web worker sees the
+same status.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from metrics import counter, span
+from storage import DEFAULT_STORAGE_PATH, StorageEngine, file_signature, get_config_value, get_storage_path
+
+if TYPE_CHECKING:
+    from pdf_export import PdfSettings
+
+DEFAULT_EXPORT_CACHE_DIR = DEFAULT_STORAGE_PATH.parent / 'exports'
+DEFAULT_EXPORT_WORKERS = 2
+DEFAULT_EXPORT_CACHE_MAX_FILES = 20
+# A job marker older than this belongs to a worker that died mid-export
+DEFAULT_EXPORT_JOB_TIMEOUT = 300
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# 'cached' and 'running' requests are answered without rendering again
+EXPORT_REQUESTS = counter('stoic_pdf_export_requests_total', 'PDF export requests by outcome.', ['outcome'])
+
+
+def get_export_dir() -> Path:
+    """Directory holding finished exports and job markers."""
+    if get_config_value('MULTI_USER', False):
+        # Each user's exports stay in their shard, so one user's exports never evict another's
+        return Path(get_storage_path()).parent / 'exports'
+    return Path(get_config_value('EXPORT_CACHE_DIR', DEFAULT_EXPORT_CACHE_DIR))
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """The shared export worker pool, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = get_config_value('EXPORT_WORKERS', DEFAULT_EXPORT_WORKERS)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pdf-export')
+        return _executor
+
+
+def pdf_export_key(engine: StorageEngine, settings: 'PdfSettings') -> str:
+    """Hash identifying the PDF of the engine's current entries in the current layout and font.
+
+    Built from the storage version, which every write changes and a
+    recreated journal does not repeat, so looking up a cached PDF costs a
+    stat instead of reading and hashing the journal.
+    The font is identified by its path and file signature, so switching or
+    replacing the font renders the PDF again.
+    """
+    from pdf_export import PDF_LAYOUT_VERSION
+    font = settings.font_path
+    identity = [f"pdf-layout-{PDF_LAYOUT_VERSION}", engine.name, str(engine.path), engine.version(),
+                str(font) if font is not None else None, file_signature(font) if font is not None else None]
+    return hashlib.sha256(json.dumps(identity, default=str).encode('utf-8')).hexdigest()
+
+
+def is_valid_job_id(job_id: str) -> bool:
+    return bool(JOB_ID_PATTERN.match(job_id))
+
+
+def pdf_path(job_id: str, export_dir: Optional[Path] = None) -> Path:
+    """Location of the finished PDF for a job."""
+    return (export_dir or get_export_dir()) / f"{job_id}.pdf"
+
+
+def submit_pdf_export(engine: StorageEngine) -> str:
+    """Start rendering a PDF of the engine's entries unless it is cached or running; returns the job id."""
+    # pdf_export (and FPDF) are imported on first use rather than at startup
+    from pdf_export import pdf_settings
+    # Read here: the worker has no app context to read the config from
+    settings = pdf_settings()
+    with span('export.pdf_key'):
+        job_id = pdf_export_key(engine, settings)
+    export_dir = get_export_dir()
+    status = get_pdf_export_status(job_id)
+    if status == 'done':
+        # Mark the cached file as recently used so pruning keeps it
+        os.utime(pdf_path(job_id, export_dir))
+    if status in ('done', 'running'):
+        EXPORT_REQUESTS.inc('cached' if status == 'done' else 'running')
+        return job_id
+    EXPORT_REQUESTS.inc('rendered')
+    export_dir.mkdir(parents=True, exist_ok=True)
+    (export_dir / f"{job_id}.failed").unlink(missing_ok=True)
+    (export_dir / f"{job_id}.job").touch()
+    max_files = get_config_value('EXPORT_CACHE_MAX_FILES', DEFAULT_EXPORT_CACHE_MAX_FILES)
+    try:
+        from flask import current_app
+        app = current_app._get_current_object()
+    except (ImportError, RuntimeError):
+        app = None
+    get_executor().submit(_render, job_id, engine, settings, export_dir, max_files, app)
+    return job_id
+
+
+def get_pdf_export_status(job_id: str) -> Optional[str]:
+    """'done', 'running' or 'failed' for a known job, None for an unknown one."""
+    export_dir = get_export_dir()
+    if pdf_path(job_id, export_dir).exists():
+        return 'done'
+    try:
+        started = (export_dir / f"{job_id}.job").stat().st_mtime
+    except FileNotFoundError:
+        started = None
+    timeout = get_config_value('EXPORT_JOB_TIMEOUT', DEFAULT_EXPORT_JOB_TIMEOUT)
+    if started is not None and time.time() - started < timeout:
+        return 'running'
+    if started is not None or (export_dir / f"{job_id}.failed").exists():
+        return 'failed'
+    return None
+
+
+def get_pdf_export_error(job_id: str) -> Optional[str]:
+    """The error message of a failed job, if any."""
+    try:
+        return (get_export_dir() / f"{job_id}.failed").read_text(encoding='utf-8')
+    except FileNotFoundError:
+        return None
+
+
+def _render(job_id: str, engine: StorageEngine, settings: 'PdfSettings', export_dir: Path, max_files: int,
+            app=None) -> None:
+    """Worker: load the entries, render the PDF, publish it atomically and prune old results.
+
+    A write that lands after the request read the storage version is
+    included; its own request then renders the PDF again under the new key.
+    """
+    marker = export_dir / f"{job_id}.job"
+    target = pdf_path(job_id, export_dir)
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        from pdf_export import write_pdf_export
+        # The worker runs outside any request, so it pushes the app's context for the storage settings
+        with app.app_context() if app is not None else contextlib.nullcontext():
+            write_pdf_export(engine.load(), tmp_path, settings)
+        os.replace(tmp_path, target)
+    except Exception as exc:
+        tmp_path.unlink(missing_ok=True)
+        (export_dir / f"{job_id}.failed").write_text(f"{type(exc).__name__}: {exc}", encoding='utf-8')
+    finally:
+        marker.unlink(missing_ok=True)
+    _prune(export_dir, max_files)
+
+
+def _prune(export_dir: Path, max_files: int) -> None:
+    """Keep only the most recently used cached PDFs and failure markers."""
+    for pattern in ('*.pdf', '*.failed'):
+        files = []
+        for path in export_dir.glob(pattern):
+            try:
+                files.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        files.sort(reverse=True)
+        for _, path in files[max_files:]:
+            path.unlink(missing_ok=True)
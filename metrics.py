@@ -0,0 +1,284 @@
+"""In-process performance metrics in the Prometheus text format.
+
+Counters and histograms are registered at import time by the modules
+they describe and served together at ``/metrics``. Timing spans
+(``timed`` / ``span``) record how long each storage, search and export
+call takes; while a request is being handled, its spans are also summed
+per name so the response can carry them in a ``Server-Timing`` header.
+
+Values are kept per process: with several workers, every worker reports
+its own, and Prometheus adds them up across scrapes of each worker.
+"""
+import bisect
+import contextlib
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# Seconds; from a cached page view up to a large export
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes; 256 B to 64 MiB in steps of 4
+SIZE_BUCKETS = tuple(256 * 4 ** power for power in range(10))
+
+# Span durations (name -> [seconds, calls]) of the request being handled, if any
+_request_spans: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar('request_spans', default=None)
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.lock = threading.Lock()
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self.lock:
+            values = list(self.values.items())
+        for labels, value in values:
+            yield f"{self.name}{format_labels(self.labels, labels)} {value}"
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label combination."""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # labels -> [count per bucket (the last one is +Inf), sum]
+        self.values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        position = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                counts = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts[0][position] += 1
+            counts[1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self.lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self.values.items()]
+        names = self.labels + ('le',)
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{format_labels(names, labels + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, labels)} {total}"
+            yield f"{self.name}_count{format_labels(self.labels, labels)} {cumulative}"
+
+
+class Callback:
+    """A gauge or counter whose value is read from a function when metrics are collected."""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float], kind: str = 'gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+        self.kind = kind
+
+    def samples(self) -> Iterator[str]:
+        yield f"{self.name} {self.read()}"
+
+
+_metrics: Dict[str, Any] = {}
+_metrics_lock = threading.Lock()
+
+
+def register(metric: Any) -> Any:
+    """Add a metric to /metrics; registering the same name again returns the existing metric."""
+    with _metrics_lock:
+        return _metrics.setdefault(metric.name, metric)
+
+
+def counter(name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+    return register(Counter(name, documentation, labels))
+
+
+def histogram(name: str, documentation: str, labels: Sequence[str] = (),
+              buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return register(Histogram(name, documentation, labels, buckets))
+
+
+def callback(name: str, documentation: str, read: Callable[[], float], kind: str = 'gauge') -> Callback:
+    return register(Callback(name, documentation, read, kind))
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    with _metrics_lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: metric.name)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+SPAN_DURATION = histogram('stoic_span_duration_seconds', 'Duration of storage, search and export operations.',
+                          ['span'])
+
+
+def record_span(name: str, seconds: float) -> None:
+    SPAN_DURATION.observe(seconds, name)
+    spans = _request_spans.get()
+    if spans is not None:
+        totals = spans.get(name)
+        if totals is None:
+            spans[name] = [seconds, 1]
+        else:
+            totals[0] += seconds
+            totals[1] += 1
+
+
+@contextlib.contextmanager
+def span(name: str):
+    """Time the enclosed block as the named span."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - started)
+
+
+def timed(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorator timing every call of a function as the named span."""
+    def decorate(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_span(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+
+def start_request_spans() -> None:
+    """Start collecting the spans of the current request."""
+    _request_spans.set({})
+
+
+def end_request_spans() -> None:
+    # Worker threads are reused, so the next request on this thread starts clean
+    _request_spans.set(None)
+
+
+def request_spans() -> Dict[str, List[float]]:
+    """Summed seconds and call count per span name in the current request."""
+    return _request_spans.get() or {}
+
+
+def server_timing_header(spans: Dict[str, List[float]], total: float, total_name: str = 'total') -> str:
+    """A Server-Timing header value with the request's spans and total, in milliseconds."""
+    parts = []
+    for name, (seconds, calls) in spans.items():
+        part = f"{name};dur={seconds * 1000:.2f}"
+        parts.append(part if calls == 1 else f'{part};desc="{calls} calls"')
+    parts.append(f"{total_name};dur={total * 1000:.2f}")
+    return ', '.join(parts)
+
+
+def measure_stream(body: Iterable[Union[str, bytes]], finish: Callable[[int], None]) -> Iterator[bytes]:
+    """Pass on a streamed body, calling finish(bytes sent) once it is exhausted or closed."""
+    size = 0
+    try:
+        for chunk in body:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            size += len(chunk)
+            yield chunk
+    finally:
+        close = getattr(body, 'close', None)
+        if close is not None:
+            close()
+        finish(size)
+
+
+REQUEST_DURATION = histogram('stoic_request_duration_seconds', 'Time to handle a request, per route.',
+                             ['route', 'method', 'status'])
+REQUEST_SIZE = histogram('stoic_request_size_bytes', 'Request body sizes, per route.', ['route'], SIZE_BUCKETS)
+RESPONSE_SIZE = histogram('stoic_response_size_bytes', 'Response body sizes, per route.', ['route'], SIZE_BUCKETS)
+
+
+def init_app(app) -> None:
+    """Time every request of a Flask app, add Server-Timing if enabled, and serve /metrics."""
+    from flask import Response, before_render_template, g, request, template_rendered
+
+    def route() -> str:
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    @app.before_request
+    def start_timing():
+        g.metrics_started = time.perf_counter()
+        start_request_spans()
+
+    @app.after_request
+    def finish_timing(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        labels = (route(), request.method, str(response.status_code))
+        if request.content_length:
+            REQUEST_SIZE.observe(request.content_length, labels[0])
+        if response.is_streamed:
+            def finish(size):
+                # The body was rendered while it was sent, so the request ends with its last chunk
+                REQUEST_DURATION.observe(time.perf_counter() - started, *labels)
+                RESPONSE_SIZE.observe(size, labels[0])
+
+            response.response = measure_stream(response.response, finish)
+            if app.config.get('SERVER_TIMING'):
+                # Headers go out before the body is rendered, so they can only report the time until then
+                response.headers['Server-Timing'] = server_timing_header(request_spans(), elapsed, 'headers')
+            return response
+        REQUEST_DURATION.observe(elapsed, *labels)
+        RESPONSE_SIZE.observe(response.calculate_content_length() or 0, labels[0])
+        if app.config.get('SERVER_TIMING'):
+            response.headers['Server-Timing'] = server_timing_header(request_spans(), elapsed)
+        return response
+
+    @app.teardown_request
+    def stop_spans(exc):
+        end_request_spans()
+
+    def template_started(sender, template, context, **extra):
+        g.setdefault('metrics_templates', []).append(time.perf_counter())
+
+    def template_finished(sender, template, context, **extra):
+        starts = g.get('metrics_templates')
+        if starts:
+            record_span(f"template.{template.name}", time.perf_counter() - starts.pop())
+
+    before_render_template.connect(template_started, app, weak=False)
+    template_rendered.connect(template_finished, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,57 @@
+"""Split reflections.json into monthly partitions for the 'monthly' storage engine.
+
+Usage: python migrate_partitions.py [storage file ...] [--users] [--force]
+
+Without arguments the configured REFLECTIONS_FILE (FLASK_CONFIG picks the
+configuration) is split; ``--users`` also splits every user's shard under
+STORAGE_DIR/users/. Partitions are written next to each file, e.g.
+storage/reflections/2026-10.json plus storage/reflections/manifest.json,
+and the JSON file is kept as a backup. Set STORAGE_ENGINE=monthly afterwards.
+The engine also splits the file on first use; running this ahead of time
+keeps that work out of the first request. Files that are already split are
+skipped, since the backup lacks every entry written since; ``--force``
+splits them again from the backup, discarding those entries.
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from app_config import config
+from storage import StorageError, migrate_json_to_partitions
+
+
+def storage_files(paths, users):
+    settings = config[os.environ.get('FLASK_CONFIG') or 'default']
+    files = [Path(path) for path in paths] or [Path(settings.REFLECTIONS_FILE)]
+    if users:
+        name = Path(settings.REFLECTIONS_FILE).name
+        files.extend(sorted(Path(settings.STORAGE_DIR).glob(f"users/*/{name}")))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('paths', nargs='*', help='JSON storage files to split')
+    parser.add_argument('--users', action='store_true', help="also split every user's shard")
+    parser.add_argument('--force', action='store_true',
+                        help='replace existing partitions with the entries of the JSON file')
+    args = parser.parse_args()
+    status = 0
+    for path in storage_files(args.paths, args.users):
+        if not path.exists():
+            print(f"{path}: not found")
+            status = 1
+            continue
+        try:
+            counts = migrate_json_to_partitions(path, args.force)
+        except StorageError as e:
+            print(f"{path}: {e}, skipped (--force splits it again)")
+            status = 1
+            continue
+        print(f"{path}: {sum(counts.values())} entries in {len(counts)} partitions under {path.with_suffix('')}")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
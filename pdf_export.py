@@ -0,0 +1,191 @@
+"""PDF export assembled from cached per-entry fragments.
+
+Laying out an entry (measuring and wrapping its text) is the expensive part
+of building the PDF. Each entry's block is laid out once into a fragment,
+the list of lines it occupies, and cached by a hash of the entry content,
+so exporting again after adding one entry only lays out that entry. The
+document is then assembled from the fragments and written to a file or
+stream.
+
+Text is set in a Unicode TrueType font when one is available (``PDF_FONT_PATH``
+or one of the common system fonts below); otherwise the built-in Helvetica
+is used and characters outside latin-1 are replaced.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from fpdf import FPDF
+
+from metrics import counter, timed
+from storage import get_config_value
+
+# Bump whenever the PDF layout changes, so cached PDFs and fragments are rebuilt
+PDF_LAYOUT_VERSION = 2
+
+LINE_HEIGHT = 10
+ENTRY_GAP = 5
+FONT_SIZE = 12
+
+DEFAULT_PDF_FRAGMENT_CACHE_SIZE = 10000
+
+FONT_CANDIDATES = [
+    Path(__file__).parent / 'static' / 'fonts' / 'DejaVuSans.ttf',
+    Path('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'),
+    Path('/usr/share/fonts/TTF/DejaVuSans.ttf'),
+    Path('/Library/Fonts/Arial Unicode.ttf'),
+    Path('C:/Windows/Fonts/arial.ttf'),
+]
+
+Fragment = Tuple[str, ...]
+
+
+class CharacterSubset(list):
+    """Sorted, de-duplicated list of used characters with set-speed membership tests."""
+
+    def __init__(self, characters: Iterable[int]):
+        members = set(characters)
+        super().__init__(sorted(members))
+        self.members = members
+
+    def __contains__(self, character: object) -> bool:
+        return character in self.members
+
+
+class JournalPDF(FPDF):
+    """FPDF with a faster font subsetting step.
+
+    FPDF records every printed character of a Unicode font in a plain list
+    and scans that list once per glyph of the font when writing the
+    document, which takes seconds for large exports.
+    """
+
+    def _putfonts(self):
+        for font in self.fonts.values():
+            if font['type'] == 'TTF':
+                font['subset'] = CharacterSubset(font['subset'])
+        super()._putfonts()
+
+_fragments: 'OrderedDict[Tuple[str, str], Fragment]' = OrderedDict()
+_fragments_lock = threading.Lock()
+FRAGMENT_LOOKUPS = counter('stoic_pdf_fragment_cache_lookups_total', 'PDF entry fragment lookups by result.',
+                           ['result'])
+
+
+class PdfSettings(NamedTuple):
+    """Rendering settings, read from the app config in the request and handed to export workers."""
+    font_path: Optional[Path]
+    fragment_cache_size: int
+
+
+def pdf_settings() -> PdfSettings:
+    """The current app's PDF settings; export workers have no app context, so read them in the request."""
+    return PdfSettings(find_unicode_font(),
+                       get_config_value('PDF_FRAGMENT_CACHE_SIZE', DEFAULT_PDF_FRAGMENT_CACHE_SIZE))
+
+
+def find_unicode_font() -> Optional[Path]:
+    """The configured PDF_FONT_PATH, else the first installed candidate font."""
+    configured = get_config_value('PDF_FONT_PATH', None)
+    if configured:
+        return Path(configured)
+    for candidate in FONT_CANDIDATES:
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def entry_hash(entry: Dict[str, Any]) -> str:
+    """Hash of the entry content that appears in the PDF."""
+    return hashlib.sha256(json.dumps(dict(entry), sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def entry_text(entry: Dict[str, Any]) -> str:
+    return (f"Morgen\n- Kontrol: {entry['morning_control']}\n- Udfordringer: {entry['morning_challenges']}\n"
+            f"- Dyd: {entry['morning_virtue']}\nAften\n- Godt: {entry['evening_good']}\n"
+            f"- Bedre: {entry['evening_better']}\n- Læring: {entry['evening_learning']}")
+
+
+class PdfRenderer:
+    """Lays out entry fragments and assembles them into one document."""
+
+    def __init__(self, font_path: Optional[Path] = None,
+                 fragment_cache_size: int = DEFAULT_PDF_FRAGMENT_CACHE_SIZE):
+        self.font_path = font_path
+        self.fragment_cache_size = fragment_cache_size
+        self.font_key = f"{PDF_LAYOUT_VERSION}:{font_path or 'helvetica'}"
+        self.pdf = JournalPDF()
+        self.pdf.set_auto_page_break(auto=True, margin=15)
+        self.pdf.add_page()
+        if font_path is not None:
+            self.pdf.add_font('journal', '', str(font_path), uni=True)
+            self.pdf.set_font('journal', size=FONT_SIZE)
+        else:
+            self.pdf.set_font('helvetica', size=FONT_SIZE)
+
+    def text(self, value: str) -> str:
+        """Make text printable in the current font."""
+        if self.font_path is None:
+            return value.encode('latin-1', 'replace').decode('latin-1')
+        # FPDF fails on characters past the last one the font has a width for
+        widths = self.pdf.current_font['cw']
+        if any(ord(char) >= len(widths) for char in value):
+            return ''.join(char if ord(char) < len(widths) else '?' for char in value)
+        return value
+
+    def fragment(self, entry: Dict[str, Any]) -> Fragment:
+        """The lines of one entry's block, laid out once per entry content."""
+        key = (entry_hash(entry), self.font_key)
+        with _fragments_lock:
+            fragment = _fragments.get(key)
+            if fragment is not None:
+                _fragments.move_to_end(key)
+                FRAGMENT_LOOKUPS.inc('hit')
+                return fragment
+        FRAGMENT_LOOKUPS.inc('miss')
+        fragment = (self.text(f"Dato: {entry['timestamp']}"),
+                    self.text(f"Vurdering: {entry['rating']}/5"),
+                    *self.pdf.multi_cell(0, LINE_HEIGHT, self.text(entry_text(entry)), align='L', split_only=True))
+        with _fragments_lock:
+            _fragments[key] = fragment
+            while len(_fragments) > self.fragment_cache_size:
+                _fragments.popitem(last=False)
+        return fragment
+
+    def add(self, fragment: Fragment) -> None:
+        """Append a laid-out fragment to the document."""
+        for line in fragment:
+            self.pdf.cell(0, LINE_HEIGHT, line, ln=1)
+        self.pdf.ln(ENTRY_GAP)
+
+    def write(self, target: Union[str, Path, BinaryIO]) -> None:
+        """Finish the document and write it to a path or binary stream."""
+        if isinstance(target, (str, Path)):
+            self.pdf.output(str(target), 'F')
+            return
+        self.pdf.close()
+        # FPDF keeps the finished document as a latin-1 string of PDF bytes
+        target.write(self.pdf.buffer.encode('latin-1'))
+
+
+@timed('export.pdf_render')
+def write_pdf_export(entries: Iterable[Dict[str, Any]], target: Union[str, Path, BinaryIO],
+                     settings: Optional[PdfSettings] = None) -> None:
+    """Render entries into a PDF written to a path or binary stream (default settings: pdf_settings())."""
+    settings = settings or pdf_settings()
+    renderer = PdfRenderer(settings.font_path, settings.fragment_cache_size)
+    for entry in entries:
+        renderer.add(renderer.fragment(entry))
+    renderer.write(target)
+
+
+def generate_pdf_export(entries: List[Dict[str, Any]]) -> bytes:
+    """Generate PDF content from entries."""
+    output = BytesIO()
+    write_pdf_export(entries, output)
+    return output.getvalue()
+
@@ -0,0 +1,167 @@
+"""Cache of rendered HTML for the entry list pages.
+
+Two kinds of HTML share one LRU cache capped at ``RENDER_CACHE_MAX_BYTES``
+(counted in characters):
+
+- pages: a whole rendered list view (``/`` and ``/reflections``), keyed by
+  storage file, storage version and the request path with its arguments
+  (sort order, limit, cursors). A repeat view of an unchanged journal is
+  answered without reading storage or running Jinja.
+- fragments: the HTML of one entry, keyed by entry ID and content hash
+  (``entry_etag``). Templates wrap an entry's markup in
+  ``{% call entry_fragment(entry) %}...{% endcall %}``; after a write only
+  new and changed entries are rendered again. The wrapped markup must
+  depend on the entry alone, not on the page it appears on.
+
+Writes through storage.py drop the written storage's pages and the written
+entry's fragments. Stale keys could never be hit anyway, since they carry
+the old version or hash; dropping them frees the memory right away. Changes
+made by other processes show up as a new storage version.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from markupsafe import Markup
+
+from metrics import callback, counter
+from storage import StorageEngine, add_change_listener, entry_etag, get_config_value, get_engine
+
+DEFAULT_RENDER_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+_html: 'OrderedDict[Tuple[Any, ...], str]' = OrderedDict()
+# ('page', storage path) or ('fragment', entry ID) -> keys of the cached HTML, for invalidation
+_groups: Dict[Tuple[str, str], Set[Tuple[Any, ...]]] = {}
+_size = 0
+_lock = threading.Lock()
+RENDER_LOOKUPS = counter('stoic_render_cache_lookups_total', 'Rendered page and entry fragment lookups by result.',
+                         ['kind', 'result'])
+
+
+def _get(key: Tuple[Any, ...]) -> Optional[str]:
+    with _lock:
+        html = _html.get(key)
+        if html is not None:
+            _html.move_to_end(key)
+    RENDER_LOOKUPS.inc(key[0], 'hit' if html is not None else 'miss')
+    return html
+
+
+def _put(key: Tuple[Any, ...], html: str, max_bytes: Optional[int] = None) -> None:
+    global _size
+    if max_bytes is None:
+        max_bytes = get_config_value('RENDER_CACHE_MAX_BYTES', DEFAULT_RENDER_CACHE_MAX_BYTES)
+    if len(html) > max_bytes:
+        return
+    with _lock:
+        if key in _html:
+            return
+        _html[key] = html
+        _groups.setdefault(key[:2], set()).add(key)
+        _size += len(html)
+        while _size > max_bytes:
+            _remove(next(iter(_html)))
+
+
+def _remove(key: Tuple[Any, ...]) -> None:
+    """Drop one cached HTML; needs the lock."""
+    global _size
+    _size -= len(_html.pop(key))
+    group = _groups[key[:2]]
+    group.discard(key)
+    if not group:
+        del _groups[key[:2]]
+
+
+def _discard_group(group: Tuple[str, str]) -> None:
+    with _lock:
+        for key in list(_groups.get(group, ())):
+            _remove(key)
+
+
+def _page_key() -> Tuple[Any, ...]:
+    from flask import request
+    engine = get_engine()
+    # The version is read before rendering, so a page that raced a write is cached under the older version
+    return 'page', str(engine.path), engine.version(), request.full_path
+
+
+def cached_page(render: Callable[[], str]) -> str:
+    """HTML of the current list view, rendered by render() unless cached for this storage version."""
+    key = _page_key()
+    html = _get(key)
+    if html is None:
+        html = render()
+        _put(key, html)
+    return html
+
+
+def cached_page_stream(render: Callable[[], Iterator[str]]) -> Union[str, Iterator[str]]:
+    """Like cached_page(), for a render() that yields the page in pieces.
+
+    On a miss the pieces are passed on as they are rendered, and the whole
+    page is cached once the stream has finished; a stream the client
+    abandons is not cached.
+    """
+    key = _page_key()
+    html = _get(key)
+    if html is not None:
+        return html
+    # Read now: the stream is consumed after the request context is gone
+    max_bytes = get_config_value('RENDER_CACHE_MAX_BYTES', DEFAULT_RENDER_CACHE_MAX_BYTES)
+    return _tee(render(), key, max_bytes)
+
+
+def _tee(pieces: Iterator[str], key: Tuple[Any, ...], max_bytes: int) -> Iterator[str]:
+    kept: Optional[List[str]] = []
+    size = 0
+    for piece in pieces:
+        if kept is not None:
+            kept.append(piece)
+            size += len(piece)
+            if size > max_bytes:
+                # Too large to cache; stop holding on to it
+                kept = None
+        yield piece
+    if kept is not None:
+        _put(key, ''.join(kept), max_bytes)
+
+
+def entry_fragment(entry: Dict[str, Any], caller: Callable[[], str]) -> str:
+    """Template helper: the markup of caller() for one entry, rendered once per entry version."""
+    key = ('fragment', entry['id'], entry_etag(entry))
+    html = _get(key)
+    if html is None:
+        html = str(caller())
+        _put(key, html)
+    return Markup(html)
+
+
+def clear() -> None:
+    global _size
+    with _lock:
+        _html.clear()
+        _groups.clear()
+        _size = 0
+
+
+def cache_size() -> int:
+    """Characters of HTML currently cached."""
+    return _size
+
+
+callback('stoic_render_cache_size', 'Characters of rendered HTML held in the render cache.', cache_size)
+
+
+def init_app(app) -> None:
+    """Make entry_fragment() available to the app's templates."""
+    app.jinja_env.globals['entry_fragment'] = entry_fragment
+
+
+def _on_storage_change(engine: StorageEngine, previous_version: Any, op: str, entry_id: str,
+                       entry: Optional[Dict[str, Any]]) -> None:
+    _discard_group(('page', str(engine.path)))
+    _discard_group(('fragment', entry_id))
+
+
+add_change_listener(_on_storage_change)
@@ -0,0 +1,213 @@
+"""Server-side full-text search over the reflection fields.
+
+An inverted index maps each token to the entries containing it. It is built
+from storage on the first search and then kept up to date from the storage
+write path, so a search never has to scan the journal. Changes made by
+another process are noticed through the storage version and trigger a
+rebuild on the next search.
+
+Documents are keyed by the stable entry ID, so inserts, edits and deletes
+are all applied in place.
+"""
+import bisect
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from metrics import span, timed
+from storage import ENTRY_FIELDS, StorageEngine, add_change_listener, add_close_listener, get_engine
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Common Danish words that carry no meaning on their own
+DANISH_STOPWORDS = frozenset('''
+    ad af alle alt anden at blev blive bliver da de dem den denne der deres det dette dig din dog du
+    efter eller en end er et for fra ham han hans har havde have hende hendes her hos hun hvad hvis
+    hvor i ikke ind jeg jer jo kunne man mange med meget men mig min mine mit mod ned noget nogle nu
+    når og også om op os over på selv sig sin sine sit skal skulle som sådan thi til ud under var
+    vi vil ville vor være været
+'''.split())
+
+# BM25 ranking parameters
+K1 = 1.2
+B = 0.75
+
+SNIPPET_LENGTH = 160
+
+
+def normalize(text: str) -> str:
+    """Lowercase and normalize text; the old spelling 'aa' is folded into 'å'."""
+    return unicodedata.normalize('NFKC', text).lower().replace('aa', 'å')
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into searchable tokens, dropping stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(normalize(text)) if token not in DANISH_STOPWORDS]
+
+
+def entry_tokens(entry: Dict[str, Any]) -> Counter:
+    return Counter(token for field in ENTRY_FIELDS for token in tokenize(entry.get(field, '')))
+
+
+class SearchHit(NamedTuple):
+    score: float
+    entry_id: str
+    entry: Dict[str, Any]
+
+
+class SearchIndex:
+    """Inverted index with BM25 ranking and prefix matching for one storage engine."""
+
+    def __init__(self, engine: StorageEngine):
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.version = None
+        self.stale = True
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.vocabulary: List[str] = []
+        # entry id -> (token counts, token total, entry)
+        self.documents: Dict[str, Tuple[Counter, int, Dict[str, Any]]] = {}
+        self.total_length = 0
+
+    def rebuild(self) -> None:
+        self.version = self.engine.version()
+        entries = self.engine.load()
+        self.postings, self.vocabulary, self.documents, self.total_length = {}, [], {}, 0
+        for entry in entries:
+            self._add(entry['id'], entry)
+        self.stale = False
+
+    def apply(self, previous_version: Any, op: str, entry_id: str, entry: Optional[Dict[str, Any]]) -> None:
+        """Apply one storage change, or mark the index stale if it cannot follow."""
+        with self.lock:
+            if self.stale or previous_version != self.version:
+                self.stale = True
+                return
+            if entry_id in self.documents:
+                self._remove(entry_id)
+            if op != 'delete':
+                self._add(entry_id, entry)
+            self.version = self.engine.version()
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Tuple[int, List[SearchHit]]:
+        """Ranked hits for the query; returns (total hits, requested page of hits).
+
+        Every query term must match, either exactly or as the prefix of a
+        longer word, so 'tålmod' also finds 'tålmodighed'.
+        """
+        terms = tokenize(query)
+        with self.lock:
+            if self.stale or self.version != self.engine.version():
+                with span('search.rebuild'):
+                    self.rebuild()
+            if not terms or not self.documents:
+                return 0, []
+            average_length = self.total_length / len(self.documents)
+            scores: Optional[Dict[str, float]] = None
+            for term in terms:
+                term_scores: Dict[str, float] = {}
+                for token in self._expand(term):
+                    postings = self.postings[token]
+                    idf = math.log(1 + (len(self.documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for entry_id, frequency in postings.items():
+                        length = self.documents[entry_id][1]
+                        score = idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length / average_length))
+                        term_scores[entry_id] = term_scores.get(entry_id, 0.0) + score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {entry_id: score + term_scores[entry_id]
+                              for entry_id, score in scores.items() if entry_id in term_scores}
+            # Equal scores rank newer entries first; IDs start with their creation time
+            ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+            hits = [SearchHit(score, entry_id, self.documents[entry_id][2])
+                    for entry_id, score in ranked[offset:offset + limit]]
+            return len(ranked), hits
+
+    def _expand(self, term: str) -> List[str]:
+        """Indexed tokens equal to or starting with the term."""
+        start = bisect.bisect_left(self.vocabulary, term)
+        end = start
+        while end < len(self.vocabulary) and self.vocabulary[end].startswith(term):
+            end += 1
+        return self.vocabulary[start:end]
+
+    def _add(self, entry_id: str, entry: Dict[str, Any]) -> None:
+        tokens = entry_tokens(entry)
+        length = sum(tokens.values())
+        self.documents[entry_id] = (tokens, length, entry)
+        self.total_length += length
+        for token, frequency in tokens.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = {}
+                bisect.insort(self.vocabulary, token)
+            postings[entry_id] = frequency
+
+    def _remove(self, entry_id: str) -> None:
+        tokens, length, _ = self.documents.pop(entry_id)
+        self.total_length -= length
+        for token in tokens:
+            postings = self.postings[token]
+            del postings[entry_id]
+            if not postings:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+
+_indexes: Dict[int, SearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(engine: Optional[StorageEngine] = None) -> SearchIndex:
+    """The search index of the given (default: current) storage engine."""
+    engine = engine or get_engine()
+    with _indexes_lock:
+        if engine.closed:
+            # Closed while this request used it: not registered again, as nothing would drop it
+            return _indexes.get(id(engine)) or SearchIndex(engine)
+        if id(engine) not in _indexes:
+            _indexes[id(engine)] = SearchIndex(engine)
+        return _indexes[id(engine)]
+
+
+@timed('search.query')
+def search_entries(query: str, limit: int = 20, offset: int = 0) -> Tuple[int, List[SearchHit]]:
+    """Ranked full-text search over the reflection fields of the current journal."""
+    return get_search_index().search(query, limit, offset)
+
+
+def snippet(entry: Dict[str, Any], query: str, length: int = SNIPPET_LENGTH) -> str:
+    """A short excerpt of the first field that mentions one of the query terms."""
+    terms = tokenize(query)
+    for field in ENTRY_FIELDS:
+        text = entry.get(field, '')
+        folded = normalize(text)
+        positions = [folded.find(term) for term in terms if term in folded]
+        if positions:
+            # normalize() can shorten text ('aa' -> 'å'), so the position is approximate
+            start = max(0, min(positions) - length // 4)
+            excerpt = text[start:start + length].strip()
+            return ('…' if start > 0 else '') + excerpt + ('…' if start + length < len(text) else '')
+    return ''
+
+
+def _on_storage_change(engine: StorageEngine, previous_version: Any, op: str, entry_id: str,
+                       entry: Optional[Dict[str, Any]]) -> None:
+    index_for_engine = _indexes.get(id(engine))
+    if index_for_engine is not None:
+        index_for_engine.apply(previous_version, op, entry_id, entry)
+
+
+add_change_listener(_on_storage_change)
+
+
+def _on_engine_close(engine: StorageEngine) -> None:
+    with _indexes_lock:
+        _indexes.pop(id(engine), None)
+
+
+add_close_listener(_on_engine_close)
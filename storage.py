@@ -1,52 +1,298 @@
+import base64
+import bisect
+import contextlib
+import hashlib
+import heapq
+import itertools
 import json
+import mmap
+import operator
 import os
-import csv
-from datetime import datetime
-from io import StringIO
-from fpdf import FPDF
-from typing import List, Dict, Any, Tuple
+import re
+import secrets
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 from pathlib import Path
 
+from metrics import callback, span, timed
+
 # Default storage path - can be overridden by configuration
 DEFAULT_STORAGE_PATH = Path(__file__).parent / 'storage' / 'reflections.json'
 
+# Storage engine used when the configuration does not choose one
+DEFAULT_STORAGE_ENGINE = 'json'
+
+# The append-only log is compacted once it holds this many records per live entry
+DEFAULT_LOG_COMPACT_RATIO = 4
+DEFAULT_LOG_COMPACT_MIN_RECORDS = 1000
+
+# SQLite's synchronous setting; FULL syncs the WAL on every commit, as the other engines fsync theirs
+DEFAULT_SQLITE_SYNCHRONOUS = 'FULL'
+SQLITE_SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+# Entry caches estimated to take more memory than this are dropped; every load then reads from disk
+DEFAULT_ENTRY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+# Entries whose size is measured to estimate the memory of a whole cache
+CACHE_SIZE_SAMPLE = 1000
+# Memory per cached entry besides the entry itself: its slot in the cache dict and its sorted index key
+CACHE_ENTRY_OVERHEAD = 160
+
+# Entries per page for paginated list views
+DEFAULT_PAGE_SIZE = 50
+
+# Approximate number of characters per chunk of a streamed CSV export
+DEFAULT_CSV_CHUNK_SIZE = 64 * 1024
+
+# Seconds a write waits for the inter-process storage lock before giving up
+DEFAULT_STORAGE_LOCK_TIMEOUT = 10.0
+
+# Seconds the group-commit writer collects writes before committing them together; 0 disables it
+DEFAULT_GROUP_COMMIT_WINDOW = 0.0
+
+# Storage engines (user shards) kept open; the least recently used one is closed beyond this
+DEFAULT_MAX_OPEN_ENGINES = 64
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class StorageError(Exception):
+    """Stored entries cannot be read or written."""
+
+class ConflictError(StorageError):
+    """An entry was changed by someone else since the caller read it."""
+
 # Field names for consistent access
 ENTRY_FIELDS = [
     'morning_control', 'morning_challenges', 'morning_virtue',
     'evening_good', 'evening_better', 'evening_learning'
 ]
 
+# Timestamps are naive local times; they are converted to seconds as if they were UTC
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+# User IDs name shard directories, so they are limited to characters safe in a path
+USER_ID_PATTERN = re.compile(r'^[A-Za-z0-9_@-][A-Za-z0-9_@.-]{0,127}$')
+
+def is_valid_user_id(user_id: str) -> bool:
+    return bool(USER_ID_PATTERN.match(user_id))
+
+def user_storage_path(user_id: str, storage_dir: Path, file_name: str) -> Path:
+    """Storage file of one user's shard: <storage_dir>/users/<user_id>/<file_name>."""
+    if not is_valid_user_id(user_id):
+        raise ValueError(f"Invalid user ID: {user_id!r}")
+    return Path(storage_dir) / 'users' / user_id / file_name
+
+def current_user_id() -> Optional[str]:
+    """The user of the current request in multi-user mode, set by users.init_app()."""
+    try:
+        from flask import g
+        return g.get('user_id')
+    except (ImportError, RuntimeError):
+        return None
+
 def get_storage_path() -> Path:
-    """Get the storage path, allowing for configuration override."""
+    """Get the storage path, allowing for configuration override.
+
+    With MULTI_USER set, every user has a shard of their own under
+    STORAGE_DIR/users/, named like REFLECTIONS_FILE.
+    """
     try:
         from flask import current_app
-        return current_app.config.get('REFLECTIONS_FILE', DEFAULT_STORAGE_PATH)
+        config = current_app.config
     except (ImportError, RuntimeError):
         # Fallback when not in Flask context
         return DEFAULT_STORAGE_PATH
+    path = Path(config.get('REFLECTIONS_FILE', DEFAULT_STORAGE_PATH))
+    if not config.get('MULTI_USER'):
+        return path
+    user_id = current_user_id()
+    if user_id is None:
+        raise StorageError("Multi-user mode needs a user for every storage access")
+    return user_storage_path(user_id, config.get('STORAGE_DIR', DEFAULT_STORAGE_PATH.parent), path.name)
 
-def ensure_rating(entry: Dict[str, Any]) -> Dict[str, Any]:
-    """Ensure entry has a rating field with default value."""
-    if 'rating' not in entry:
-        entry['rating'] = 0
-    return entry
+def get_config_value(key: str, default: Any) -> Any:
+    """Get a configuration value, falling back to the default outside Flask context."""
+    try:
+        from flask import current_app
+        return current_app.config.get(key, default)
+    except (ImportError, RuntimeError):
+        return default
+
+def timestamp_seconds(timestamp: str) -> int:
+    """Seconds since the epoch for a 'YYYY-MM-DD HH:MM:SS' timestamp, read as UTC."""
+    return parse_timestamp(timestamp)[0]
+
+def format_timestamp(seconds: int) -> str:
+    """The 'YYYY-MM-DD HH:MM:SS' timestamp of a timestamp_seconds() value."""
+    return str(EPOCH + timedelta(seconds=seconds))
+
+def parse_timestamp(timestamp: str) -> Tuple[int, bool]:
+    """Epoch seconds of a timestamp, and whether format_timestamp() reproduces it exactly."""
+    try:
+        parsed = datetime.fromisoformat(timestamp)
+        seconds = (parsed - EPOCH) // ONE_SECOND
+    except (TypeError, ValueError):
+        return 0, False
+    return seconds, len(timestamp) == 19 and timestamp[10] == ' '
+
+def check_timestamp(entry: Dict[str, Any]) -> None:
+    """Raise ValueError unless the entry's timestamp is an ASCII date and time without a time zone."""
+    timestamp = entry.get('timestamp')
+    try:
+        valid = timestamp.isascii() and datetime.fromisoformat(timestamp).tzinfo is None
+    except (AttributeError, ValueError):
+        valid = False
+    if not valid:
+        raise ValueError(f"Entry {entry.get('id')} has an invalid timestamp: {timestamp!r}")
+
+def new_entry_id(timestamp: Optional[str] = None) -> str:
+    """Create a compact, stable entry ID.
+
+    The ID is the creation time in hex seconds followed by 24 random bits,
+    e.g. '6712a9f0c41b7e', so IDs of entries created in the same month
+    share a prefix.
+    """
+    seconds = timestamp_seconds(timestamp) if timestamp else int(time.time())
+    return f"{seconds:08x}{secrets.randbits(24):06x}"
+
+def entry_etag(entry: Dict[str, Any]) -> str:
+    """Version tag of an entry's content, used to detect conflicting edits."""
+    content = json.dumps(dict(entry), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
 
+class Entry(Mapping):
+    """A journal entry.
+
+    Entries keep their values in slots instead of a per-entry dict: the
+    timestamp is held as integer seconds (``epoch``), which is what sorting
+    and date filtering compare, and the rating as an int. For templates and
+    older code an Entry still reads like the entry dict it replaces:
+    ``entry['timestamp']``, ``entry.get(field, '')``, ``dict(entry)`` and
+    item assignment all work. Only the id, timestamp, rating and the six
+    reflection fields are kept.
+    """
+    __slots__ = ('id', 'epoch', 'rating', '_timestamp', *ENTRY_FIELDS)
+
+    KEYS = ('id', 'timestamp', *ENTRY_FIELDS, 'rating')
+    _KEY_SET = frozenset(KEYS)
+
+    def __init__(self, id: str, timestamp: str, morning_control: str = '', morning_challenges: str = '',
+                 morning_virtue: str = '', evening_good: str = '', evening_better: str = '',
+                 evening_learning: str = '', rating: int = 0):
+        self.id = id
+        self.timestamp = timestamp
+        self.morning_control = morning_control
+        self.morning_challenges = morning_challenges
+        self.morning_virtue = morning_virtue
+        self.evening_good = evening_good
+        self.evening_better = evening_better
+        self.evening_learning = evening_learning
+        self.rating = int(rating)
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'Entry':
+        """Build an entry from its JSON form, filling in a missing id and rating."""
+        timestamp = data.get('timestamp', '')
+        return cls(data.get('id') or new_entry_id(timestamp), timestamp,
+                   data.get('morning_control', ''), data.get('morning_challenges', ''),
+                   data.get('morning_virtue', ''), data.get('evening_good', ''),
+                   data.get('evening_better', ''), data.get('evening_learning', ''),
+                   data.get('rating', 0))
+
+    def to_json(self) -> Dict[str, Any]:
+        """The entry as the dict stored in JSON files."""
+        return {
+            'id': self.id,
+            'timestamp': self.timestamp,
+            'morning_control': self.morning_control,
+            'morning_challenges': self.morning_challenges,
+            'morning_virtue': self.morning_virtue,
+            'evening_good': self.evening_good,
+            'evening_better': self.evening_better,
+            'evening_learning': self.evening_learning,
+            'rating': self.rating,
+        }
+
+    @property
+    def timestamp(self) -> str:
+        return self._timestamp if self._timestamp is not None else format_timestamp(self.epoch)
+
+    @timestamp.setter
+    def timestamp(self, timestamp: str) -> None:
+        self.epoch, canonical = parse_timestamp(timestamp)
+        # Timestamps that do not round-trip through epoch seconds are kept verbatim
+        self._timestamp = None if canonical else timestamp
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._KEY_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self._KEY_SET:
+            raise KeyError(key)
+        setattr(self, key, int(value) if key == 'rating' else value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._KEY_SET else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._KEY_SET
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def copy(self) -> 'Entry':
+        return Entry(**self.to_json())
+
+    # Attributes holding objects of their own, counted by memory_size()
+    _SIZED = ('id', '_timestamp', *ENTRY_FIELDS)
+
+    def memory_size(self) -> int:
+        """Approximate bytes the entry takes in memory, including its strings."""
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, name)) for name in self._SIZED)
+
+    def __repr__(self) -> str:
+        return f"Entry({self.to_json()!r})"
+
+def as_entry(entry: Dict[str, Any]) -> Entry:
+    """The entry as an Entry, converting entry dicts."""
+    return entry if isinstance(entry, Entry) else Entry.from_json(entry)
+
+@timed('storage.sort_entries_with_index')
 def sort_entries_with_index(entries: List[Dict[str, Any]], sort_order: str = 'desc') -> List[Tuple[int, Dict[str, Any]]]:
     """Sort entries with their original indices for consistent handling."""
-    return sorted(enumerate(entries), key=lambda x: x[1]['timestamp'], reverse=(sort_order != 'asc'))
+    return sorted(enumerate(entries), key=lambda x: as_entry(x[1]).epoch, reverse=(sort_order != 'asc'))
 
-def create_entry_from_form(form_data: Dict[str, str]) -> Dict[str, Any]:
+def create_entry_from_form(form_data: Dict[str, str]) -> Entry:
     """Create a new entry from form data with consistent structure."""
-    return {
-        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'morning_control': form_data.get('morning_control', ''),
-        'morning_challenges': form_data.get('morning_challenges', ''),
-        'morning_virtue': form_data.get('morning_virtue', ''),
-        'evening_good': form_data.get('evening_good', ''),
-        'evening_better': form_data.get('evening_better', ''),
-        'evening_learning': form_data.get('evening_learning', ''),
-        'rating': int(form_data.get('rating', 3)),
-    }
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return Entry(
+        id=new_entry_id(timestamp),
+        timestamp=timestamp,
+        morning_control=form_data.get('morning_control', ''),
+        morning_challenges=form_data.get('morning_challenges', ''),
+        morning_virtue=form_data.get('morning_virtue', ''),
+        evening_good=form_data.get('evening_good', ''),
+        evening_better=form_data.get('evening_better', ''),
+        evening_learning=form_data.get('evening_learning', ''),
+        rating=int(form_data.get('rating', 3)),
+    )
 
 def update_entry_from_form(entry: Dict[str, Any], form_data: Dict[str, str]) -> Dict[str, Any]:
     """Update an existing entry from form data."""
@@ -59,16 +305,111 @@ def update_entry_from_form(entry: Dict[str, Any], form_data: Dict[str, str]) ->
     entry['rating'] = int(form_data.get('rating', 3))
     return entry
 
+def period_bounds(prefix: str) -> Tuple[int, int]:
+    """First and last second of the period a date prefix names.
+
+    The prefix can be a year ('2024'), a month ('2024-05'), a day
+    ('2024-05-31') or a longer part of a timestamp. Raises ValueError for
+    anything else.
+    """
+    parts = [int(part) for part in re.findall(r'\d+', prefix)][:6]
+    if not parts:
+        raise ValueError(f"Not a date: {prefix!r}")
+    start = datetime(*(parts + [None, 1, 1, 0, 0, 0][len(parts):]))
+    if len(parts) == 1:
+        end = start.replace(year=start.year + 1)
+    elif len(parts) == 2:
+        end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    else:
+        end = start + [timedelta(days=1), timedelta(hours=1), timedelta(minutes=1), timedelta(seconds=1)][len(parts) - 3]
+    return (start - EPOCH) // ONE_SECOND, (end - EPOCH) // ONE_SECOND - 1
+
+def date_bounds(date_from: Optional[str] = None, date_to: Optional[str] = None) -> Tuple[Optional[int], Optional[int]]:
+    """Turn inclusive date prefixes (e.g. '2024-05' or '2024-05-31') into inclusive epoch-second bounds."""
+    return (period_bounds(date_from)[0] if date_from else None,
+            period_bounds(date_to)[1] if date_to else None)
+
+def entry_matches(entry: Entry, min_rating: Optional[int] = None,
+                  low: Optional[int] = None, high: Optional[int] = None) -> bool:
+    """Check an entry against the optional rating filter and date_bounds()."""
+    if min_rating is not None and entry.rating < min_rating:
+        return False
+    if low is not None and entry.epoch < low:
+        return False
+    if high is not None and entry.epoch > high:
+        return False
+    return True
+
+class Page(NamedTuple):
+    """One page of (id, entry) pairs plus cursors for the neighbouring pages."""
+    entries: List[Tuple[str, Dict[str, Any]]]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+def encode_cursor(key: Tuple[int, str]) -> str:
+    """Encode an (epoch, id) sort key as an opaque, URL-safe cursor."""
+    epoch, entry_id = key
+    return base64.urlsafe_b64encode(f"{epoch}|{entry_id}".encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[int, str]]:
+    """Decode a cursor made by encode_cursor; invalid cursors decode to None."""
+    if not cursor:
+        return None
+    try:
+        epoch, entry_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').rsplit('|', 1)
+        return int(epoch), entry_id
+    except (ValueError, UnicodeError):
+        return None
+
+def sort_key(entry: Entry) -> Tuple[int, str]:
+    """The (epoch, id) key entries are ordered and paginated by."""
+    return entry.epoch, entry.id
+
+def select_page(entries: Iterable[Dict[str, Any]], sort_order: str = 'desc',
+                limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None, before: Optional[str] = None) -> Page:
+    """Pick one page of entries without sorting all of them.
+
+    Pages are addressed by keyset cursors: ``after`` continues past the last
+    entry of the previous page and ``before`` goes back from the first entry
+    of the next page.
+    """
+    forward = before is None
+    bound = decode_cursor(after if forward else before)
+    # Walking backwards from a 'before' cursor scans in the opposite order
+    scan_desc = (sort_order != 'asc') == forward
+    if bound is not None:
+        entries = (entry for entry in entries if (sort_key(entry) < bound if scan_desc else sort_key(entry) > bound))
+    pick = heapq.nlargest if scan_desc else heapq.nsmallest
+    picked = pick(limit + 1, entries, key=sort_key)
+    has_more = len(picked) > limit
+    picked = picked[:limit]
+    if not forward:
+        picked.reverse()
+    pairs = [(entry['id'], entry) for entry in picked]
+    if not picked:
+        return Page(pairs)
+    if forward:
+        return Page(pairs,
+                    next_cursor=encode_cursor(sort_key(picked[-1])) if has_more else None,
+                    prev_cursor=encode_cursor(sort_key(picked[0])) if bound is not None else None)
+    return Page(pairs,
+                next_cursor=encode_cursor(sort_key(picked[-1])),
+                prev_cursor=encode_cursor(sort_key(picked[0])) if has_more else None)
+
 def validate_index(index: int, entries: List[Dict[str, Any]]) -> bool:
     """Validate that an index is within bounds for the entries list."""
     return 0 <= index < len(entries)
 
-def generate_csv_export(entries: List[Dict[str, Any]]) -> str:
-    """Generate CSV content from entries."""
+CSV_HEADER = ['Timestamp', 'Morning Control', 'Morning Challenges', 'Morning Virtue',
+              'Evening Good', 'Evening Better', 'Evening Learning', 'Rating']
+
+def iter_csv_export(entries: Iterable[Dict[str, Any]], chunk_size: int = DEFAULT_CSV_CHUNK_SIZE) -> Iterator[str]:
+    """Generate CSV content from entries in chunks of roughly chunk_size characters."""
+    import csv
+    from io import StringIO
     si = StringIO()
     cw = csv.writer(si)
-    cw.writerow(['Timestamp', 'Morning Control', 'Morning Challenges', 'Morning Virtue', 
-                'Evening Good', 'Evening Better', 'Evening Learning', 'Rating'])
+    cw.writerow(CSV_HEADER)
     for entry in entries:
         cw.writerow([
             entry['timestamp'],
@@ -80,39 +421,1555 @@ def generate_csv_export(entries: List[Dict[str, Any]]) -> str:
             entry['evening_learning'],
             entry['rating']
         ])
-    return si.getvalue()
+        if si.tell() >= chunk_size:
+            yield si.getvalue()
+            si.seek(0)
+            si.truncate()
+    yield si.getvalue()
+
+@timed('storage.generate_csv_export')
+def generate_csv_export(entries: List[Dict[str, Any]]) -> str:
+    """Generate CSV content from entries."""
+    return ''.join(iter_csv_export(entries))
 
+@timed('storage.generate_pdf_export')
 def generate_pdf_export(entries: List[Dict[str, Any]]) -> bytes:
     """Generate PDF content from entries."""
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.add_page()
-    pdf.set_font("helvetica", size=12)
-    for entry in entries:
-        pdf.cell(200, 10, txt=f"Dato: {entry['timestamp']}", ln=True)
-        pdf.cell(200, 10, txt=f"Vurdering: {entry['rating']}/5", ln=True)
-        pdf.multi_cell(0, 10, txt=f"Morgen\n- Kontrol: {entry['morning_control']}\n- Udfordringer: {entry['morning_challenges']}\n- Dyd: {entry['morning_virtue']}\nAften\n- Godt: {entry['evening_good']}\n- Bedre: {entry['evening_better']}\n- Læring: {entry['evening_learning']}\n", border=0)
-        pdf.ln(5)
-    return pdf.output(dest='S').encode('latin1')
+    from pdf_export import generate_pdf_export as render_pdf
+    return render_pdf(entries)
 
-def load_entries() -> List[Dict[str, Any]]:
-    """Load all journal entries from the JSON file."""
-    storage_path = get_storage_path()
-    if not storage_path.exists():
-        return []
-    with open(storage_path, 'r', encoding='utf-8') as f:
+def atomic_write(path: Path, write: Callable[[Any], Any], binary: bool = False) -> None:
+    """Write a file through a temporary file and an atomic rename.
+
+    Readers see either the old or the new file, never a partly written one,
+    and the data is flushed to disk before it replaces the old file.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with (open(tmp_path, 'wb') if binary else open(tmp_path, 'w', encoding='utf-8')) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+    if hasattr(os, 'O_DIRECTORY'):
+        # Make the rename itself durable
+        fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+@contextlib.contextmanager
+def file_lock(path: Path, timeout: Optional[float] = None):
+    """Hold an exclusive inter-process lock on a lock file.
+
+    Yields True once the lock is held. With ``timeout=0`` the lock is only
+    tried once and False is yielded if another process holds it; otherwise
+    StorageError is raised when the lock cannot be taken within the timeout.
+    Only writers take the lock, so readers never wait for it.
+    """
+    if timeout is None:
+        timeout = get_config_value('STORAGE_LOCK_TIMEOUT', DEFAULT_STORAGE_LOCK_TIMEOUT)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    with open(path, 'a+b') as f:
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    if timeout == 0:
+                        yield False
+                        return
+                    raise StorageError(f"Timed out waiting for the storage lock {path}")
+                time.sleep(0.01)
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class WriteOp(NamedTuple):
+    """One create ('insert'), edit ('update') or 'delete' of an entry."""
+    op: str
+    entry_id: str
+    entry: Optional[Dict[str, Any]] = None
+    expected_etag: Optional[str] = None
+
+def check_entry(entry_id: str, current: Optional[Dict[str, Any]], expected_etag: Optional[str]) -> None:
+    """Raise KeyError or ConflictError unless the entry exists in the expected version."""
+    if current is None:
+        raise KeyError(entry_id)
+    if expected_etag is not None and entry_etag(current) != expected_etag:
+        raise ConflictError(f"Entry {entry_id} was changed by someone else")
+
+def validate_ops(ops: List[WriteOp], lookup: Callable[[str], Optional[Dict[str, Any]]],
+                 check: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Optional[Exception]]:
+    """Check a batch of writes in order; returns the error of each op, or None if it applies.
+
+    Later ops see the effect of earlier ops in the same batch, so an entry
+    created and then edited within one batch is valid. check(entry), if
+    given, may reject the entry an insert or update writes with ValueError.
+    """
+    pending: Dict[str, Optional[Dict[str, Any]]] = {}
+    errors: List[Optional[Exception]] = []
+    for op in ops:
+        if check is not None and op.op != 'delete':
+            try:
+                check(op.entry)
+            except ValueError as e:
+                errors.append(e)
+                continue
+        if op.op != 'insert':
+            current = pending[op.entry_id] if op.entry_id in pending else lookup(op.entry_id)
+            try:
+                check_entry(op.entry_id, current, op.expected_etag)
+            except (KeyError, ConflictError) as e:
+                errors.append(e)
+                continue
+        pending[op.entry_id] = op.entry
+        errors.append(None)
+    return errors
+
+def apply_ops(cache: 'EntryCache', ops: Iterable[WriteOp]) -> None:
+    """Apply validated writes to the cached entries."""
+    for op in ops:
+        if op.op == 'delete':
+            cache.delete(op.entry_id)
+        else:
+            cache.put(op.entry)
+
+class EntryCache:
+    """Parsed entries of one storage file, kept in memory between requests.
+
+    The cache is tied to the file signature (mtime, size, inode), so a
+    change made by another process is picked up on the next load. Entries
+    are held in a dict keyed by ID in creation order (oldest first), which
+    makes lookups, edits and deletes O(1). Next to it the cache keeps a
+    sorted index of (epoch, id) keys that is updated in place on every
+    write. ``size`` estimates the memory the cached entries take; a cache
+    that grows beyond ``ENTRY_CACHE_MAX_BYTES`` is dropped.
+
+    Writers patch the entries and the index in place, so both are only
+    swapped, patched or walked while holding ``lock``.
+    """
+
+    def __init__(self):
+        self.entries = None
+        self.signature = None
+        self.keys = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.RLock()
+
+    def get(self, signature: Any):
+        """Return the cached entries if they match the signature, else None."""
+        with self.lock:
+            if self.entries is not None and signature == self.signature:
+                self.hits += 1
+                return self.entries
+            self.misses += 1
+            return None
+
+    def store(self, entries: Dict[str, Dict[str, Any]], signature: Any) -> None:
+        max_bytes = get_config_value('ENTRY_CACHE_MAX_BYTES', DEFAULT_ENTRY_CACHE_MAX_BYTES)
+        with self.lock:
+            if entries is not self.entries:
+                self.keys = None
+                self.size = estimate_cache_size(entries)
+            if self.size > max_bytes:
+                # Too large to keep around; every load reads from disk
+                self.clear()
+                return
+            self.entries = entries
+            self.signature = signature
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries = None
+            self.signature = None
+            self.keys = None
+            self.size = 0
+
+    def sorted_keys(self) -> List[Tuple[str, str]]:
+        """The sorted (epoch, id) index, built on first use; needs the lock."""
+        if self.keys is None:
+            entries = self.entries.values()
+            # attrgetter keeps the key extraction in C, which matters for large journals
+            self.keys = sorted(zip(map(operator.attrgetter('epoch'), entries), map(operator.attrgetter('id'), entries)))
+        return self.keys
+
+    def put(self, entry: Dict[str, Any]) -> None:
+        """Add a new entry or replace the stored entry with the same ID; needs the lock."""
+        old = self.entries.get(entry['id'])
+        self.entries[entry['id']] = entry
+        self.size += entry_size(entry) - (entry_size(old) if old is not None else 0)
+        if self.keys is None:
+            return
+        if old is not None:
+            if old.epoch == entry.epoch:
+                return
+            self._remove_key(sort_key(old))
+        key = sort_key(entry)
+        position = bisect.bisect_left(self.keys, key)
+        if position == len(self.keys) or self.keys[position] != key:
+            self.keys.insert(position, key)
+
+    def delete(self, entry_id: str) -> None:
+        """Remove an entry if it is cached; needs the lock."""
+        old = self.entries.pop(entry_id, None)
+        if old is None:
+            return
+        self.size -= entry_size(old)
+        if self.keys is not None:
+            self._remove_key(sort_key(old))
+
+    def _remove_key(self, key: Tuple[int, str]) -> None:
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            del self.keys[position]
+
+def entry_size(entry: Entry) -> int:
+    """Approximate memory one cached entry takes."""
+    return entry.memory_size() + CACHE_ENTRY_OVERHEAD
+
+def estimate_cache_size(entries: Dict[str, Dict[str, Any]]) -> int:
+    """Approximate memory of cached entries, extrapolated from an evenly spread sample."""
+    if not entries:
+        return 0
+    sample = list(itertools.islice(entries.values(), 0, None, max(1, len(entries) // CACHE_SIZE_SAMPLE)))
+    return sum(map(entry_size, sample)) * len(entries) // len(sample)
+
+def file_signature(path: Path):
+    """Identify the current version of a file by its mtime, size and inode."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def entries_by_id(entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Index a stored (newest first) entry list by ID, oldest first."""
+    return {entry['id']: entry for entry in reversed(entries)}
+
+class StorageEngine:
+    """Base class for storage engines.
+
+    Entries are addressed by their stable ID. ``load`` and ``save`` work on
+    the whole journal as a list with the most recently created entry first;
+    the default mutation helpers fall back to rewriting that list.
+
+    Parsed entries are cached in memory and only re-read when the storage
+    file changes. Callers share the entry dicts with the cache, so entries
+    must be copied before they are modified.
+
+    Writes hold an inter-process lock (``<storage file>.lock``) for the
+    whole read-modify-write and replace files atomically, so several
+    worker processes can share one journal. Reads never take the lock.
+    """
+    name = ''
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock_path = path.with_name(path.name + '.lock')
+        self.cache = EntryCache()
+        # Append-only engines: (file signature, records, live entries) as of the last read or write
+        self.counts = None
+        self._held = threading.local()
+        # Threads of this process queue here, so only one of them polls the file lock
+        self._thread_lock = threading.Lock()
+        # Set once get_engine() has let go of the engine; requests still using it keep working
+        self.closed = False
+
+    def close(self) -> None:
+        """Release the cached entries; the engine reopens its files if used again."""
+        self.closed = True
+        self.cache.clear()
+        self.counts = None
+
+    def load(self) -> List[Dict[str, Any]]:
+        entries = self._cached()
+        # The lock keeps writers from patching the cached entries while they are copied
+        with self.cache.lock:
+            return list(reversed(entries.values()))
+
+    def save(self, entries: List[Dict[str, Any]]) -> None:
+        entries = [as_entry(entry) for entry in entries]
+        with self.locked():
+            self._write(entries)
+            self.cache.store(entries_by_id(entries), file_signature(self.path))
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        """The entry with the given ID, or None."""
+        return self._cached().get(entry_id)
+
+    def insert(self, entry: Dict[str, Any]) -> None:
+        """Store a new entry."""
+        self._apply_one(WriteOp('insert', entry['id'], entry))
+
+    def update(self, entry_id: str, entry: Dict[str, Any], expected_etag: Optional[str] = None) -> None:
+        """Replace the entry with the given ID.
+
+        Raises KeyError if it does not exist and ConflictError if
+        expected_etag is given and the stored entry no longer matches it.
+        """
+        self._apply_one(WriteOp('update', entry_id, entry, expected_etag))
+
+    def delete(self, entry_id: str, expected_etag: Optional[str] = None) -> None:
+        """Remove the entry with the given ID; raises like update()."""
+        self._apply_one(WriteOp('delete', entry_id, None, expected_etag))
+
+    def apply_batch(self, ops: List[WriteOp]) -> List[Optional[Exception]]:
+        """Apply several writes with a single persist; returns the error of each op, or None.
+
+        Ops that fail their check are skipped without affecting the others.
+        """
+        with self.locked():
+            entries = self._cached()
+            errors = validate_ops(ops, entries.get)
+            applied = [op for op, error in zip(ops, errors) if error is None]
+            if applied:
+                working = dict(entries)
+                for op in applied:
+                    if op.op == 'delete':
+                        del working[op.entry_id]
+                    else:
+                        working[op.entry_id] = op.entry
+                self._commit(lambda: self._write(list(reversed(working.values()))),
+                             lambda cache: apply_ops(cache, applied))
+        return errors
+
+    def _apply_one(self, op: WriteOp) -> None:
+        error = self.apply_batch([op])[0]
+        if error is not None:
+            raise error
+
+    @contextlib.contextmanager
+    def locked(self, timeout: Optional[float] = None):
+        """Hold the engine's inter-process write lock; re-entrant within a thread."""
+        if getattr(self._held, 'depth', 0):
+            self._held.depth += 1
+            try:
+                yield True
+            finally:
+                self._held.depth -= 1
+            return
+        if timeout is None:
+            timeout = get_config_value('STORAGE_LOCK_TIMEOUT', DEFAULT_STORAGE_LOCK_TIMEOUT)
+        if timeout > 0:
+            acquired = self._thread_lock.acquire(timeout=timeout)
+        else:
+            acquired = self._thread_lock.acquire(blocking=False)
+        if not acquired:
+            if timeout == 0:
+                yield False
+                return
+            raise StorageError(f"Timed out waiting for the storage lock {self.lock_path}")
+        try:
+            with file_lock(self.lock_path, timeout) as acquired:
+                self._held.depth = 1 if acquired else 0
+                try:
+                    yield acquired
+                finally:
+                    self._held.depth = 0
+        finally:
+            self._thread_lock.release()
+
+    def page(self, sort_order: str = 'desc', limit: int = DEFAULT_PAGE_SIZE,
+             after: Optional[str] = None, before: Optional[str] = None) -> Page:
+        """One page of entries in timestamp order, addressed by keyset cursors."""
+        entries = self._cached()
+        forward = before is None
+        bound = decode_cursor(after if forward else before)
+        with self.cache.lock:
+            if entries is not self.cache.entries:
+                # Not cached (or replaced meanwhile), so there is no index to walk
+                rows = entries.values()
+            else:
+                keys = self.cache.sorted_keys()
+                if (sort_order != 'asc') == forward:
+                    start = bisect.bisect_left(keys, bound) if bound is not None else len(keys)
+                    positions = range(start - 1, -1, -1)
+                else:
+                    start = bisect.bisect_right(keys, bound) if bound is not None else 0
+                    positions = range(start, len(keys))
+                # Only the rows of this page (plus one to detect a following page) are touched,
+                # and taken before the lock is released
+                rows = [entries[keys[position][1]] for position in itertools.islice(positions, limit + 1)]
+        return select_page(rows, sort_order, limit, after, before)
+
+    def iterate(self, sort_order: str = 'desc', date_from: Optional[str] = None,
+                date_to: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Entries in timestamp order within the optional date range."""
+        entries = self._cached()
+        low, high = date_bounds(date_from, date_to)
+        with self.cache.lock:
+            if entries is not self.cache.entries:
+                matching = [entry for entry in entries.values() if entry_matches(entry, None, low, high)]
+                return iter(sorted(matching, key=sort_key, reverse=(sort_order != 'asc')))
+            keys = self.cache.sorted_keys()
+            start = bisect.bisect_left(keys, (low,)) if low is not None else 0
+            stop = bisect.bisect_left(keys, (high + 1,)) if high is not None else len(keys)
+            # Take the matching entries now, so later writes do not change them mid-iteration
+            selected = [entries[entry_id] for _, entry_id in keys[start:stop]]
+        if sort_order != 'asc':
+            selected.reverse()
+        return iter(selected)
+
+    def version(self) -> Any:
+        """Token that changes whenever the stored entries change, in any process."""
+        return file_signature(self.path)
+
+    def _cached(self) -> Dict[str, Dict[str, Any]]:
+        """The current entries by ID, shared with the cache when caching is possible."""
+        signature = file_signature(self.path)
+        entries = self.cache.get(signature)
+        if entries is None:
+            with span(f"storage.read.{self.name}"):
+                entries = self._read()
+            self.cache.store(entries, signature)
+        return entries
+
+    def _cache_signature(self) -> Any:
+        """The signature the cached entries are stored under."""
+        return file_signature(self.path)
+
+    def _commit(self, persist: Callable[[], Any], apply: Callable[[EntryCache], Any]) -> None:
+        """Persist one change and apply it to the cache if the cache is current.
+
+        Readers do not take the write lock, so one may reload the cache
+        between persist() and apply(), possibly already with the change. The
+        change is only applied to the very cache that was current before
+        persist(); anything else is dropped and read again.
+        """
+        with self.cache.lock:
+            entries, signature = self.cache.entries, self.cache.signature
+        current = entries is not None and signature == self._cache_signature()
+        persist()
+        new_signature = self._cache_signature()
+        with self.cache.lock:
+            if current and self.cache.entries is entries and self.cache.signature == signature:
+                apply(self.cache)
+                self.cache.store(entries, new_signature)
+            else:
+                self.cache.clear()
+
+    def _count_appended(self, before: Any, ops: List[WriteOp]) -> None:
+        """Count records just appended and compact the file once too many are superseded; needs the lock.
+
+        Append-only engines call this after every write; before is the file
+        signature from before the append. If another process appended since
+        the last read, the counts are unknown until the next read.
+        """
+        if self.counts is None or self.counts[0] != before:
+            self.counts = None
+            return
+        _, records, live = self.counts
+        records += len(ops)
+        live += sum(1 if op.op == 'insert' else -1 if op.op == 'delete' else 0 for op in ops)
+        self.counts = (file_signature(self.path), records, live)
+        compact_ratio = get_config_value('LOG_COMPACT_RATIO', DEFAULT_LOG_COMPACT_RATIO)
+        compact_min = get_config_value('LOG_COMPACT_MIN_RECORDS', DEFAULT_LOG_COMPACT_MIN_RECORDS)
+        if records > max(compact_min, live * compact_ratio):
+            with span(f"storage.compact.{self.name}"):
+                entries = self._cached()
+                self._write(list(reversed(entries.values())))
+            self.counts = (file_signature(self.path), len(entries), len(entries))
+            self._compacted(entries)
+
+    def _compacted(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Keep the cached entries current across a compaction, which leaves their content unchanged."""
+        if self.cache.entries is entries:
+            self.cache.store(entries, file_signature(self.path))
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+def read_json_entries(path: Path) -> List[Dict[str, Any]]:
+    """Read a JSON entry list (newest first), filling in missing ratings and IDs.
+
+    A file that is not valid JSON raises StorageError rather than reading
+    as an empty journal, which the next write would then make permanent.
+    """
+    return read_json_file(path)[0]
+
+def read_json_file(path: Path) -> Tuple[List[Dict[str, Any]], bool]:
+    """Like read_json_entries(); also tells whether every stored entry had an ID."""
+    if not path.exists():
+        return [], True
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if not content.strip():
+        return [], True
+    try:
+        entries = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise StorageError(f"Cannot read {path}: {e}") from e
+    # Entries without a rating or id get them filled in
+    return [Entry.from_json(entry) for entry in entries], all('id' in entry for entry in entries)
+
+class JsonFileEngine(StorageEngine):
+    """Keeps all entries in a single JSON list, rewritten on every change."""
+    name = 'json'
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            return {}
+        entries, has_ids = read_json_file(self.path)
+        if not has_ids:
+            # Entries from before stable IDs get them assigned once
+            with self.locked():
+                entries, has_ids = read_json_file(self.path)
+                if not has_ids:
+                    self._write(entries)
+        return entries_by_id(entries)
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        atomic_write(self.path, lambda f: json.dump([entry.to_json() for entry in entries], f,
+                                                    ensure_ascii=False, indent=2))
+
+class LogFileEngine(StorageEngine):
+    """Append-only journal log with one JSON record per line.
+
+    Creates and edits are appended as ``put`` records holding the whole
+    entry and deletes as ``delete`` records holding its ID, so a write costs
+    the same no matter how large the journal is. Loading replays the log;
+    a write that leaves it holding too many superseded records (more than
+    ``LOG_COMPACT_RATIO`` per live entry) compacts it. The log
+    lives next to the JSON file (``reflections.jsonl``) and is seeded from
+    the JSON file the first time it is opened.
+    """
+    name = 'log'
+
+    def __init__(self, path: Path):
+        super().__init__(path.with_suffix('.jsonl'))
+        self.json_path = path
+
+    def apply_batch(self, ops: List[WriteOp]) -> List[Optional[Exception]]:
+        """Append the records of all valid ops with one write and one fsync."""
+        with self.locked():
+            self._migrate()
+            errors = validate_ops(ops, self._cached().get)
+            applied = [op for op, error in zip(ops, errors) if error is None]
+            if applied:
+                records = ''.join(json.dumps(log_record(op), ensure_ascii=False) + '\n' for op in applied)
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+
+                def persist():
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(records)
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                before = file_signature(self.path)
+                self._commit(persist, lambda cache: apply_ops(cache, applied))
+                self._count_appended(before, applied)
+        return errors
+
+    def _migrate(self) -> None:
+        """Seed the log from the JSON file if there is no log yet."""
+        if not self.path.exists() and self.json_path.exists():
+            with self.locked():
+                if not self.path.exists():
+                    migrate_json_to_log(self.json_path, self.path)
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            if not self.json_path.exists():
+                self.counts = (None, 0, 0)
+                return {}
+            self._migrate()
+        signature = file_signature(self.path)
+        entries, records = self._replay()
+        self.counts = (signature, records, len(entries))
+        return entries
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        write_log(self.path, entries)
+
+    def _replay(self) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """Rebuild the entries from the log; returns (entries by ID, record count)."""
+        items: Dict[str, Dict[str, Any]] = {}
+        records = 0
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn trailing line from an interrupted write
+                    continue
+                records += 1
+                op = record.get('op')
+                if op == 'put':
+                    entry = Entry.from_json(record['entry'])
+                    items[entry['id']] = entry
+                elif op == 'delete':
+                    items.pop(record['id'], None)
+        return items, records
+
+def log_record(op: WriteOp) -> Dict[str, Any]:
+    """The log record of one write."""
+    if op.op == 'delete':
+        return {'op': 'delete', 'id': op.entry_id}
+    return {'op': 'put', 'entry': op.entry.to_json()}
+
+def write_log(log_path: Path, entries: List[Dict[str, Any]]) -> None:
+    """Write a compacted log holding exactly the given (newest first) entries."""
+    def write(f):
+        for entry in reversed(entries):
+            f.write(json.dumps({'op': 'put', 'entry': as_entry(entry).to_json()}, ensure_ascii=False) + '\n')
+
+    atomic_write(log_path, write)
+
+def migrate_json_to_log(json_path: Path, log_path: Path) -> int:
+    """One-shot migration of a JSON entry list into the log format.
+
+    The JSON file is left in place as a backup. Returns the number of
+    migrated entries.
+    """
+    entries = read_json_entries(json_path)
+    write_log(log_path, entries)
+    return len(entries)
+
+class SqliteEngine(StorageEngine):
+    """Stores entries as rows of a SQLite database (``reflections.db``).
+
+    Each create, edit and delete touches a single row, found through the
+    unique index on the entry ID, and filtering and sorting run in the
+    database using the timestamp and rating indexes. The database runs in
+    WAL mode so readers are not blocked by a writer, and SQLite's own
+    locking serializes writers across processes. On first use an existing
+    JSON file is imported.
+    """
+    name = 'sqlite'
+
+    # Entry fields stored as columns; the entry ID lives in the 'uid' column
+    COLUMNS = ['timestamp'] + ENTRY_FIELDS + ['rating']
+    SELECT = f"SELECT uid, {', '.join(COLUMNS)} FROM entries"
+
+    def __init__(self, path: Path):
+        super().__init__(path.with_suffix('.db'))
+        self.json_path = path
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """A connection for the current thread, creating the schema on first use."""
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            timeout = get_config_value('STORAGE_LOCK_TIMEOUT', DEFAULT_STORAGE_LOCK_TIMEOUT)
+            synchronous = str(get_config_value('SQLITE_SYNCHRONOUS', DEFAULT_SQLITE_SYNCHRONOUS)).upper()
+            if synchronous not in SQLITE_SYNCHRONOUS_MODES:
+                raise ValueError(f"Unknown SQLITE_SYNCHRONOUS {synchronous!r}")
+            # Only one process creates the database and imports the JSON file
+            with self.locked():
+                is_new = not self.path.exists()
+                conn = sqlite3.connect(str(self.path), timeout=timeout)
+                conn.row_factory = sqlite3.Row
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute(f'PRAGMA synchronous={synchronous}')
+                self._create_schema(conn)
+                self._local.connection = conn
+                if is_new and self.json_path.exists():
+                    self._write(read_json_entries(self.json_path))
+        return conn
+
+    def close(self) -> None:
+        super().close()
+        conn = getattr(self._local, 'connection', None)
+        if conn is not None:
+            conn.close()
+        # Other threads' connections are closed as their last reference goes with the old local
+        self._local = threading.local()
+
+    def load(self) -> List[Dict[str, Any]]:
+        return [self._entry(row) for row in self.connection.execute(f"{self.SELECT} ORDER BY id DESC")]
+
+    def save(self, entries: List[Dict[str, Any]]) -> None:
+        self._write([as_entry(entry) for entry in entries])
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute(f"{self.SELECT} WHERE uid = ?", (entry_id,)).fetchone()
+        return self._entry(row) if row is not None else None
+
+    def apply_batch(self, ops: List[WriteOp]) -> List[Optional[Exception]]:
+        """Apply all valid ops in one transaction."""
+        assignments = ', '.join(f"{column} = ?" for column in self.COLUMNS)
+        with self.connection as conn:
+            # BEGIN IMMEDIATE takes the write lock first, so rows cannot change between check and write
+            conn.execute("BEGIN IMMEDIATE")
+            errors = validate_ops(ops, self.get)
+            for op, error in zip(ops, errors):
+                if error is not None:
+                    continue
+                if op.op == 'insert':
+                    self._insert_rows(conn, [op.entry])
+                elif op.op == 'update':
+                    conn.execute(f"UPDATE entries SET {assignments} WHERE uid = ?",
+                                 [op.entry.get(column, '') for column in self.COLUMNS] + [op.entry_id])
+                else:
+                    conn.execute("DELETE FROM entries WHERE uid = ?", (op.entry_id,))
+        return errors
+
+    def iterate(self, sort_order: str = 'desc', date_from: Optional[str] = None,
+                date_to: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        where, params = self._filters(date_from, date_to)
+        direction = 'ASC' if sort_order == 'asc' else 'DESC'
+        cursor = self.connection.execute(f"{self.SELECT} {where} ORDER BY timestamp {direction}, uid {direction}",
+                                         params)
+        return self._iter_rows(cursor)
+
+    def _iter_rows(self, cursor: sqlite3.Cursor) -> Iterator[Entry]:
+        while True:
+            rows = cursor.fetchmany(500)
+            if not rows:
+                break
+            for row in rows:
+                yield self._entry(row)
+
+    def page(self, sort_order: str = 'desc', limit: int = DEFAULT_PAGE_SIZE,
+             after: Optional[str] = None, before: Optional[str] = None) -> Page:
+        forward = before is None
+        bound = decode_cursor(after if forward else before)
+        scan_desc = (sort_order != 'asc') == forward
+        direction = 'DESC' if scan_desc else 'ASC'
+        where, params = '', []
+        if bound is not None:
+            where = f"WHERE (timestamp, uid) {'<' if scan_desc else '>'} (?, ?)"
+            params = [format_timestamp(bound[0]), bound[1]]
+        rows = self.connection.execute(
+            f"{self.SELECT} {where} ORDER BY timestamp {direction}, uid {direction} LIMIT ?",
+            params + [limit + 1]).fetchall()
+        # The rows are already in page order, so select_page only slices them
+        return select_page((self._entry(row) for row in rows), sort_order, limit, after, before)
+
+    def version(self) -> Any:
+        # The database's random ID tells a recreated database, whose counter starts over, from the old one
+        rows = self.connection.execute(
+            "SELECT value FROM storage_meta WHERE key IN ('database', 'version') ORDER BY key").fetchall()
+        return tuple(row[0] for row in rows)
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        with self.connection as conn:
+            conn.execute("DELETE FROM entries")
+            self._insert_rows(conn, reversed(entries))
+
+    def _insert_rows(self, conn: sqlite3.Connection, entries) -> None:
+        placeholders = ', '.join('?' for _ in range(len(self.COLUMNS) + 1))
+        conn.executemany(f"INSERT INTO entries (uid, {', '.join(self.COLUMNS)}) VALUES ({placeholders})",
+                         ([entry['id']] + [entry.get(column, '') for column in self.COLUMNS] for entry in entries))
+
+    def _entry(self, row: sqlite3.Row) -> Entry:
+        return Entry(row['uid'], *(row[column] for column in self.COLUMNS))
+
+    @staticmethod
+    def _filters(date_from: Optional[str], date_to: Optional[str]) -> Tuple[str, List[Any]]:
+        """WHERE clause and parameters for the optional date range."""
+        low, high = date_bounds(date_from, date_to)
+        low = format_timestamp(low) if low is not None else None
+        high = format_timestamp(high) if high is not None else None
+        conditions, params = [], []
+        for condition, value in (('timestamp >= ?', low), ('timestamp <= ?', high)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ''), params
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection) -> None:
+        text_columns = ', '.join(f"{field} TEXT NOT NULL DEFAULT ''" for field in ENTRY_FIELDS)
+        with conn:
+            conn.execute(f"""CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                uid TEXT,
+                timestamp TEXT NOT NULL,
+                {text_columns},
+                rating INTEGER NOT NULL DEFAULT 0)""")
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_entries_uid ON entries (uid)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries (timestamp, uid)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_rating ON entries (rating)")
+            # A counter bumped by every change and a random ID of the database back version()
+            conn.execute("CREATE TABLE IF NOT EXISTS storage_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO storage_meta (key, value) VALUES ('version', 0)")
+            conn.execute("INSERT OR IGNORE INTO storage_meta (key, value) VALUES ('database', ?)",
+                         (secrets.randbits(63),))
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(f"""CREATE TRIGGER IF NOT EXISTS entries_version_{event.lower()} AFTER {event} ON entries
+                    BEGIN UPDATE storage_meta SET value = value + 1 WHERE key = 'version'; END""")
+
+class LazyEntry(Entry):
+    """Entry read from the binary format whose text fields are decoded on access.
+
+    The id, epoch and rating come from the entry's fixed-width header; each
+    reflection field is decoded from the memory-mapped text blob whenever
+    it is read, so entries that are only listed or sorted never decode
+    their text. Lazy entries are read-only; copy() or dict() them to edit.
+    """
+    __slots__ = ('_blob', '_offset', '_lengths')
+
+    # The text stays in the shared blob
+    _SIZED = ('id', '_timestamp', '_lengths')
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        # Lazy entries are shared with the cache and their text lives in the blob
+        raise TypeError(f"Entry {self.id} is read-only; copy() it to edit")
+
+def _lazy_field(position: int) -> property:
+    def decode(self: LazyEntry) -> str:
+        start = self._offset + sum(self._lengths[:position])
+        return str(self._blob[start:start + self._lengths[position]], 'utf-8')
+    return property(decode)
+
+for _position, _field in enumerate(ENTRY_FIELDS):
+    setattr(LazyEntry, _field, _lazy_field(_position))
+
+class BinaryFileEngine(StorageEngine):
+    """Compact binary format: fixed-width entry headers plus a text blob.
+
+    ``reflections.idx`` starts with a magic number and the blob generation,
+    followed by one fixed-width record per write: entry ID, timestamp,
+    rating, a deleted flag, and the offset and byte lengths of the entry's
+    six text fields in ``reflections.<generation>.blob``. Both files are
+    memory-mapped; loading only unpacks the headers, and text is decoded
+    when a field is read (see LazyEntry).
+
+    Like the log engine, writes are appended (blob text first, then the
+    headers, each with one fsync) and a later record for the same ID
+    supersedes earlier ones. Compaction writes a new blob generation and
+    then atomically replaces the index, so readers never pair an index
+    with the wrong blob. The index is seeded from ``reflections.json`` on
+    first use.
+    """
+    name = 'binary'
+
+    MAGIC = b'STOICIX1'
+    HEADER = struct.Struct('<8sI')
+    # id, timestamp, rating, flags, text offset, text byte lengths
+    RECORD = struct.Struct(f"<16s19shBQ{len(ENTRY_FIELDS)}I")
+    DELETED = 1
+
+    def __init__(self, path: Path):
+        super().__init__(path.with_suffix('.idx'))
+        self.json_path = path
+
+    def blob_path(self, generation: int) -> Path:
+        return self.path.with_name(f"{self.path.stem}.{generation}.blob")
+
+    def apply_batch(self, ops: List[WriteOp]) -> List[Optional[Exception]]:
+        """Append the text and headers of all valid ops, with one fsync per file."""
+        with self.locked():
+            self._migrate()
+            # Timestamps are stored as 19 ASCII bytes
+            errors = validate_ops(ops, self._cached().get, self._check)
+            applied = [op for op, error in zip(ops, errors) if error is None]
+            if applied:
+                before = file_signature(self.path)
+                self._commit(lambda: self._append(applied), lambda cache: apply_ops(cache, applied))
+                self._count_appended(before, applied)
+        return errors
+
+    def _append(self, ops: List[WriteOp]) -> None:
+        if not self.path.exists():
+            self._write([])
+        with open(self.path, 'rb') as f:
+            _, generation = self.HEADER.unpack(f.read(self.HEADER.size))
+        with open(self.blob_path(generation), 'ab') as blob:
+            offset = blob.seek(0, os.SEEK_END)
+            texts, records = [], []
+            for op in ops:
+                if op.op == 'delete':
+                    records.append(self._record({'id': op.entry_id}, 0, [0] * len(ENTRY_FIELDS), self.DELETED))
+                    continue
+                encoded = [str(op.entry.get(field, '')).encode('utf-8') for field in ENTRY_FIELDS]
+                records.append(self._record(op.entry, offset, [len(text) for text in encoded]))
+                texts.extend(encoded)
+                offset += sum(len(text) for text in encoded)
+            # Text goes to disk before the headers that point at it
+            blob.write(b''.join(texts))
+            blob.flush()
+            os.fsync(blob.fileno())
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _check(self, entry: Dict[str, Any]) -> None:
+        """Raise ValueError unless the entry has a valid timestamp and fits an index record."""
+        check_timestamp(entry)
+        try:
+            self._record(entry, 0, [0] * len(ENTRY_FIELDS))
+        except (StorageError, struct.error, TypeError, ValueError) as e:
+            raise ValueError(f"Entry {entry.get('id')} does not fit the binary format: {e}") from e
+
+    def _record(self, entry: Dict[str, Any], offset: int, lengths: List[int], flags: int = 0) -> bytes:
+        entry_id, timestamp = entry['id'], entry.get('timestamp', '')
+        if not (entry_id.isascii() and timestamp.isascii()) or len(entry_id) > 16 or len(timestamp) > 19:
+            raise StorageError(f"Entry {entry['id']} does not fit the binary format")
+        return self.RECORD.pack(entry_id.encode('ascii'), timestamp.encode('ascii'), int(entry.get('rating', 0)), flags, offset, *lengths)
+
+    def _migrate(self) -> None:
+        """Seed the index from the JSON file if there is no index yet."""
+        if not self.path.exists() and self.json_path.exists():
+            with self.locked():
+                if not self.path.exists():
+                    self._write(read_json_entries(self.json_path))
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        if not self.path.exists():
+            if not self.json_path.exists():
+                self.counts = (None, 0, 0)
+                return {}
+            self._migrate()
+        signature = file_signature(self.path)
+        for _ in range(3):
+            try:
+                entries, records = self._scan()
+                break
+            except FileNotFoundError:
+                # The blob was compacted away between opening the index and the blob
+                signature = file_signature(self.path)
+        else:
+            raise StorageError(f"Cannot read {self.path}: its text blob is missing")
+        self.counts = (signature, records, len(entries))
+        return entries
+
+    def _compacted(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        # The cached entries map the old blob generation; reading the new one lets that go
+        self.cache.clear()
+
+    def _scan(self) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """Unpack the index into LazyEntries by ID; returns (entries, record count)."""
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+            magic, generation = self.HEADER.unpack_from(index)
+            if magic != self.MAGIC:
+                raise StorageError(f"Cannot read {self.path}: not a binary journal index")
+            with open(self.blob_path(generation), 'rb') as blob_file:
+                size = os.fstat(blob_file.fileno()).st_size
+                blob = mmap.mmap(blob_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            # A torn record at the end from an interrupted append is ignored
+            end = len(index) - (len(index) - self.HEADER.size) % self.RECORD.size
+            entries: Dict[str, Dict[str, Any]] = {}
+            records = 0
+            with memoryview(index) as view, view[self.HEADER.size:end] as body:
+                for raw_id, raw_timestamp, rating, flags, offset, *lengths in self.RECORD.iter_unpack(body):
+                    records += 1
+                    entry_id = raw_id.rstrip(b'\0').decode('ascii')
+                    if flags & self.DELETED:
+                        entries.pop(entry_id, None)
+                        continue
+                    entry = LazyEntry.__new__(LazyEntry)
+                    entry.id = entry_id
+                    timestamp = raw_timestamp.rstrip(b'\0').decode('ascii')
+                    entry.epoch, canonical = parse_timestamp(timestamp)
+                    entry._timestamp = None if canonical else timestamp
+                    entry.rating = rating
+                    entry._blob = blob
+                    entry._offset = offset
+                    entry._lengths = tuple(lengths)
+                    # A later record for an ID replaces the entry in place, keeping creation order
+                    entries[entry_id] = entry
+        return entries, records
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        """Write a compacted index and a new blob generation holding exactly these entries."""
+        generation = 1
+        if self.path.exists():
+            with open(self.path, 'rb') as f:
+                _, generation = self.HEADER.unpack(f.read(self.HEADER.size))
+            generation += 1
+        texts, records, offset = [], [self.HEADER.pack(self.MAGIC, generation)], 0
+        for entry in reversed(entries):
+            entry = as_entry(entry)
+            encoded = [str(entry.get(field, '')).encode('utf-8') for field in ENTRY_FIELDS]
+            records.append(self._record(entry, offset, [len(text) for text in encoded]))
+            texts.extend(encoded)
+            offset += sum(len(text) for text in encoded)
+        atomic_write(self.blob_path(generation), lambda f: f.write(b''.join(texts)), binary=True)
+        atomic_write(self.path, lambda f: f.write(b''.join(records)), binary=True)
+        for old in self.path.parent.glob(f"{self.path.stem}.*.blob"):
+            if old != self.blob_path(generation):
+                # Readers that still map the old blob keep it alive on POSIX; Windows refuses
+                with contextlib.suppress(OSError):
+                    old.unlink()
+
+# Partition files of the monthly engine are named after the month of their entries' timestamps
+PARTITION_PATTERN = re.compile(r'^(\d{4}-\d{2})\.json$')
+
+def partition_month(entry: Entry) -> str:
+    """The 'YYYY-MM' partition an entry belongs to, from its timestamp."""
+    return format_timestamp(entry.epoch)[:7]
+
+def id_month(entry_id: str) -> Optional[str]:
+    """The month an entry ID was created in, which is usually its partition."""
+    try:
+        return format_timestamp(int(entry_id[:8], 16))[:7]
+    except (ValueError, OverflowError):
+        return None
+
+def partition_stats(entries: Dict[str, Dict[str, Any]], signature: Any) -> Dict[str, Any]:
+    """Manifest record of one partition: entry count, first and last timestamp, file signature."""
+    epochs = [entry.epoch for entry in entries.values()]
+    return {'count': len(epochs), 'first': format_timestamp(min(epochs)), 'last': format_timestamp(max(epochs)),
+            'signature': list(signature)}
+
+class MonthlyPartitionEngine(StorageEngine):
+    """Splits the journal into one JSON file per month of entry timestamps.
+
+    ``reflections/2026-10.json`` holds the entries whose timestamp falls in
+    October 2026, newest first, in the same format as reflections.json, and
+    ``reflections/manifest.json`` records each partition's entry count,
+    first and last timestamp and file signature. A write rewrites only the
+    partitions it touches, then the manifest. Date-range reads and exports
+    open only the partitions whose timestamps overlap the range, and a page
+    of entries reads partitions in order until the page is full. Partitions
+    are cached one by one; loading the whole journal (statistics, search,
+    PDF exports) builds the usual entry cache, which later reads then use.
+
+    Partitions whose signature no longer matches the manifest (after a crash
+    between the two writes, or a manual edit) are re-summarized before the
+    next write. An existing reflections.json is split on first use and kept
+    as a backup; migrate_partitions.py does the same ahead of time.
+    """
+    name = 'monthly'
+
+    def __init__(self, path: Path):
+        self.directory = path.with_suffix('')
+        super().__init__(self.directory / 'manifest.json')
+        self.json_path = path
+        # month -> (file signature, entries by ID oldest first)
+        self.parts: Dict[str, Tuple[Any, Dict[str, Dict[str, Any]]]] = {}
+        # (manifest signature, month -> stats, oldest month first)
+        self._manifest: Tuple[Any, Dict[str, Dict[str, Any]]] = (None, {})
+
+    def partition_path(self, month: str) -> Path:
+        return self.directory / f"{month}.json"
+
+    def manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Stats of every partition by month, oldest first."""
+        self._migrate()
+        signature = file_signature(self.path)
+        if signature != self._manifest[0]:
+            partitions = self._read_manifest()
+            if partitions is None:
+                # The manifest only summarizes the partitions, so it can be rebuilt from them
+                with self.locked():
+                    return self._verified_manifest()
+            self._manifest = (signature, partitions)
+        return self._manifest[1]
+
+    def _read_manifest(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Partition stats from the manifest file, oldest month first; None if it is unreadable."""
         try:
-            entries = json.load(f)
-            # Ensure all entries have rating field
-            return [ensure_rating(entry) for entry in entries]
-        except json.JSONDecodeError:
-            return []
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return dict(sorted(json.load(f)['partitions'].items()))
+        except FileNotFoundError:
+            return {}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def save(self, entries: List[Dict[str, Any]]) -> None:
+        with self.locked():
+            self._write([as_entry(entry) for entry in entries])
+            self.cache.clear()
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        entries = self.cache.get(self._cache_signature())
+        if entries is not None:
+            return entries.get(entry_id)
+        month = self._locate(entry_id)
+        return self._partition(month)[entry_id] if month is not None else None
+
+    def apply_batch(self, ops: List[WriteOp]) -> List[Optional[Exception]]:
+        """Rewrite only the partitions the valid ops touch, then the manifest."""
+        with self.locked():
+            manifest = self._verified_manifest()
+            # An entry is filed under the month of its timestamp, which must parse
+            errors = validate_ops(ops, self.get, check_timestamp)
+            applied = [op for op, error in zip(ops, errors) if error is None]
+            if not applied:
+                return errors
+            changed: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            # Partition of each entry written earlier in this batch
+            located: Dict[str, str] = {}
+
+            def partition(month: str) -> Dict[str, Dict[str, Any]]:
+                if month not in changed:
+                    changed[month] = dict(self._partition(month)) if month in manifest else {}
+                return changed[month]
+
+            for op in applied:
+                if op.op != 'insert':
+                    month = located[op.entry_id] if op.entry_id in located else self._locate(op.entry_id)
+                    del partition(month)[op.entry_id]
+                if op.op != 'delete':
+                    month = located[op.entry_id] = partition_month(op.entry)
+                    partition(month)[op.entry_id] = op.entry
+            manifest = dict(manifest)
+
+            def persist():
+                for month, entries in changed.items():
+                    self._write_partition(month, entries, manifest)
+                self._write_manifest(manifest)
+
+            self._commit(persist, lambda cache: apply_ops(cache, applied))
+        return errors
+
+    def page(self, sort_order: str = 'desc', limit: int = DEFAULT_PAGE_SIZE,
+             after: Optional[str] = None, before: Optional[str] = None) -> Page:
+        if self._cache_current():
+            return super().page(sort_order, limit, after, before)
+        forward = before is None
+        bound = decode_cursor(after if forward else before)
+        scan_desc = (sort_order != 'asc') == forward
+        manifest = self.manifest()
+        rows: List[Dict[str, Any]] = []
+        for month in (reversed(manifest) if scan_desc else manifest):
+            if bound is not None:
+                stats = manifest[month]
+                if scan_desc and timestamp_seconds(stats['first']) > bound[0]:
+                    continue
+                if not scan_desc and timestamp_seconds(stats['last']) < bound[0]:
+                    continue
+            entries = self._partition(month).values()
+            if bound is not None:
+                entries = [entry for entry in entries if (sort_key(entry) < bound if scan_desc else sort_key(entry) > bound)]
+            rows.extend(entries)
+            # Later partitions only hold entries further along, so the page is complete
+            if len(rows) > limit:
+                break
+        return select_page(rows, sort_order, limit, after, before)
+
+    def iterate(self, sort_order: str = 'desc', date_from: Optional[str] = None,
+                date_to: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        if self._cache_current():
+            return super().iterate(sort_order, date_from, date_to)
+        low, high = date_bounds(date_from, date_to)
+        months = self._overlapping(low, high)
+        return self._iter_partitions(reversed(months) if sort_order != 'asc' else months, sort_order, low, high)
+
+    def _iter_partitions(self, months: Iterable[str], sort_order: str, low: Optional[int],
+                         high: Optional[int]) -> Iterator[Dict[str, Any]]:
+        # Each partition is read when the iteration reaches it
+        for month in months:
+            matching = [entry for entry in self._partition(month).values() if entry_matches(entry, None, low, high)]
+            yield from sorted(matching, key=sort_key, reverse=(sort_order != 'asc'))
+
+    def _overlapping(self, low: Optional[int], high: Optional[int]) -> List[str]:
+        """Months (oldest first) whose partitions may hold entries within the epoch bounds."""
+        return [month for month, stats in self.manifest().items()
+                if (low is None or timestamp_seconds(stats['last']) >= low)
+                and (high is None or timestamp_seconds(stats['first']) <= high)]
+
+    def _locate(self, entry_id: str) -> Optional[str]:
+        """Month of the partition holding an entry, or None."""
+        manifest = self.manifest()
+        hint = id_month(entry_id)
+        if hint in manifest and entry_id in self._partition(hint):
+            return hint
+        # Edited timestamps or imported IDs can put an entry elsewhere
+        for month in reversed(manifest):
+            if month != hint and entry_id in self._partition(month):
+                return month
+        return None
+
+    def _partition(self, month: str) -> Dict[str, Dict[str, Any]]:
+        """Entries of one partition by ID, read from disk when its file changed."""
+        path = self.partition_path(month)
+        signature = file_signature(path)
+        cached = self.parts.get(month)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        with span(f"storage.read.{self.name}"):
+            entries = entries_by_id(read_json_entries(path))
+        self._keep_partition(month, signature, entries)
+        return entries
+
+    def _keep_partition(self, month: str, signature: Any, entries: Dict[str, Dict[str, Any]]) -> None:
+        max_bytes = get_config_value('ENTRY_CACHE_MAX_BYTES', DEFAULT_ENTRY_CACHE_MAX_BYTES)
+        if signature is None or estimate_cache_size(entries) > max_bytes:
+            self.parts.pop(month, None)
+        else:
+            self.parts[month] = (signature, entries)
+
+    def _signature(self, manifest: Dict[str, Dict[str, Any]]) -> Any:
+        # The whole-journal cache follows the manifest and the sizes of all partitions
+        return file_signature(self.path), sum(stats['signature'][1] for stats in manifest.values())
+
+    def _cache_signature(self) -> Any:
+        return self._signature(self.manifest())
+
+    def _cache_current(self) -> bool:
+        signature = self._cache_signature()
+        with self.cache.lock:
+            return self.cache.entries is not None and self.cache.signature == signature
+
+    def _cached(self) -> Dict[str, Dict[str, Any]]:
+        manifest = self.manifest()
+        signature = self._signature(manifest)
+        entries = self.cache.get(signature)
+        if entries is None:
+            entries = {}
+            for month in manifest:
+                entries.update(self._partition(month))
+            self.cache.store(entries, signature)
+        return entries
+
+    def _verified_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """The manifest, re-summarizing partitions that changed behind its back; needs the lock."""
+        if file_signature(self.path) == self._manifest[0]:
+            manifest = dict(self._manifest[1])
+        else:
+            manifest = self._read_manifest() or {}
+        on_disk = {match.group(1) for match in map(PARTITION_PATTERN.match, os.listdir(self.directory)) if match} \
+            if self.directory.exists() else set()
+        stale = False
+        for month in sorted(set(manifest) | on_disk):
+            signature = file_signature(self.partition_path(month))
+            if signature is None:
+                manifest.pop(month, None)
+                stale = True
+            elif month not in manifest or tuple(manifest[month]['signature']) != signature:
+                entries = self._partition(month)
+                if entries:
+                    manifest[month] = partition_stats(entries, signature)
+                else:
+                    manifest.pop(month, None)
+                stale = True
+        if stale:
+            self._write_manifest(manifest)
+        else:
+            self._manifest = (file_signature(self.path), manifest)
+        return self._manifest[1]
+
+    def _write_partition(self, month: str, entries: Dict[str, Dict[str, Any]],
+                         manifest: Dict[str, Dict[str, Any]]) -> None:
+        """Write or remove one partition and update its record in manifest."""
+        path = self.partition_path(month)
+        if not entries:
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
+            self.parts.pop(month, None)
+            manifest.pop(month, None)
+            return
+        atomic_write(path, lambda f: json.dump([entry.to_json() for entry in reversed(entries.values())], f,
+                                               ensure_ascii=False, indent=2))
+        signature = file_signature(path)
+        self._keep_partition(month, signature, entries)
+        manifest[month] = partition_stats(entries, signature)
+
+    def _write_manifest(self, manifest: Dict[str, Dict[str, Any]]) -> None:
+        manifest = dict(sorted(manifest.items()))
+        atomic_write(self.path, lambda f: json.dump({'partitions': manifest}, f))
+        self._manifest = (file_signature(self.path), manifest)
+
+    def _migrate(self) -> None:
+        """Split the JSON file into partitions if there are none yet."""
+        if not self.path.exists() and self.json_path.exists():
+            with self.locked():
+                if not self.path.exists():
+                    self._write(read_json_entries(self.json_path))
+
+    def _write(self, entries: List[Dict[str, Any]]) -> None:
+        months: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for entry in reversed(entries):
+            months.setdefault(partition_month(entry), {})[entry['id']] = entry
+        manifest: Dict[str, Dict[str, Any]] = {}
+        for month, month_entries in months.items():
+            self._write_partition(month, month_entries, manifest)
+        if self.directory.exists():
+            # Partitions of months that no longer have entries
+            for name in os.listdir(self.directory):
+                match = PARTITION_PATTERN.match(name)
+                if match and match.group(1) not in manifest:
+                    self._write_partition(match.group(1), {}, manifest)
+        self._write_manifest(manifest)
+
+def migrate_json_to_partitions(json_path: Path, force: bool = False) -> Dict[str, int]:
+    """Split a JSON entry list into monthly partitions next to it.
+
+    The partitions go to a directory named like the file without its
+    extension (reflections.json -> reflections/); the JSON file is left in
+    place as a backup. Once partitions exist they, not the backup, hold the
+    journal, so a second run raises StorageError unless ``force`` is set, in
+    which case the partitions are replaced by the JSON file's entries.
+    Returns the number of entries per month.
+    """
+    engine = MonthlyPartitionEngine(Path(json_path))
+    with engine.locked():
+        if not force and (engine.path.exists() or any(
+                PARTITION_PATTERN.match(name) for name in os.listdir(engine.directory))):
+            raise StorageError(f"{engine.directory} already holds partitions")
+        engine._write(read_json_entries(engine.json_path))
+    return {month: stats['count'] for month, stats in engine.manifest().items()}
+
+# Available storage engines, selected with the STORAGE_ENGINE config value
+STORAGE_ENGINES = {
+    JsonFileEngine.name: JsonFileEngine,
+    LogFileEngine.name: LogFileEngine,
+    SqliteEngine.name: SqliteEngine,
+    BinaryFileEngine.name: BinaryFileEngine,
+    MonthlyPartitionEngine.name: MonthlyPartitionEngine,
+}
+
+# One engine per storage file (and so per user shard), each with its own cache and locks,
+# in least to most recently used order
+_engines: 'OrderedDict[Tuple[str, Path], StorageEngine]' = OrderedDict()
+_engines_lock = threading.Lock()
+
+def get_engine() -> StorageEngine:
+    """Get the configured storage engine for the current storage path."""
+    name = get_config_value('STORAGE_ENGINE', DEFAULT_STORAGE_ENGINE)
+    if name not in STORAGE_ENGINES:
+        raise ValueError(f"Unknown storage engine: {name}")
+    key = (name, Path(get_storage_path()))
+    evicted = []
+    # Two requests of a new user must not open its shard twice
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = STORAGE_ENGINES[name](key[1])
+            max_open = get_config_value('MAX_OPEN_ENGINES', DEFAULT_MAX_OPEN_ENGINES)
+            while len(_engines) > max(1, max_open):
+                evicted.append(_engines.popitem(last=False)[1])
+        else:
+            _engines.move_to_end(key)
+    for old in evicted:
+        close_engine(old)
+    return engine
+
+def close_engine(engine: StorageEngine) -> None:
+    """Stop the engine's group-commit writer, close the engine and notify the close listeners.
 
+    Writes already queued are still committed. The listeners drop whatever
+    they keep per engine (search index, statistics, change journal).
+    """
+    with _group_writers_lock:
+        writer = _group_writers.pop(id(engine), None)
+    if writer is not None:
+        writer.stop()
+    engine.close()
+    for listener in _close_listeners:
+        listener(engine)
+
+@timed('storage.load_entries')
+def load_entries() -> List[Dict[str, Any]]:
+    """Load all journal entries from storage, newest first."""
+    return get_engine().load()
+
+@timed('storage.save_entries')
 def save_entries(entries: List[Dict[str, Any]]) -> None:
-    """Save all journal entries to the JSON file."""
-    storage_path = get_storage_path()
-    storage_path.parent.mkdir(parents=True, exist_ok=True)
-    # Ensure all entries have rating field before saving
-    entries_with_rating = [ensure_rating(entry) for entry in entries]
-    with open(storage_path, 'w', encoding='utf-8') as f:
-        json.dump(entries_with_rating, f, ensure_ascii=False, indent=2)
+    """Save all journal entries to storage, replacing what is stored."""
+    get_engine().save(entries)
+
+@timed('storage.get_entry')
+def get_entry(entry_id: str) -> Optional[Dict[str, Any]]:
+    """Look up one entry by its ID; returns None if there is no such entry."""
+    return get_engine().get(entry_id)
+
+@timed('storage.get_page')
+def get_page(sort_order: str = 'desc', limit: int = DEFAULT_PAGE_SIZE,
+             after: Optional[str] = None, before: Optional[str] = None) -> Page:
+    """One page of entries in timestamp order, addressed by keyset cursors."""
+    return get_engine().page(sort_order, limit, after, before)
+
+def iter_entries(sort_order: str = 'desc', date_from: Optional[str] = None,
+                 date_to: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Entries in timestamp order within an optional inclusive date range, read incrementally."""
+    return get_engine().iterate(sort_order, date_from, date_to)
+
+def cache_stats() -> Dict[str, int]:
+    """Hit and miss counters of the entry caches of all open engines."""
+    engines = list(_engines.values())
+    return {
+        'hits': sum(engine.cache.hits for engine in engines),
+        'misses': sum(engine.cache.misses for engine in engines),
+        'cached_entries': sum(len(engine.cache.entries or ()) for engine in engines),
+    }
+
+def _cache_hit_ratio() -> float:
+    stats = cache_stats()
+    lookups = stats['hits'] + stats['misses']
+    return stats['hits'] / lookups if lookups else 0.0
+
+callback('stoic_entry_cache_hits_total', 'Entry cache lookups served from memory.',
+         lambda: cache_stats()['hits'], 'counter')
+callback('stoic_entry_cache_misses_total', 'Entry cache lookups that read the storage file.',
+         lambda: cache_stats()['misses'], 'counter')
+callback('stoic_entry_cache_hit_ratio', 'Share of entry cache lookups served from memory.', _cache_hit_ratio)
+callback('stoic_entry_cache_entries', 'Entries held in the entry caches.', lambda: cache_stats()['cached_entries'])
+
+# Callbacks notified after each insert, update and delete made through this module
+_change_listeners: List[Callable[..., Any]] = []
+
+def add_change_listener(listener: Callable[..., Any]) -> None:
+    """Register listener(engine, previous_version, op, entry_id, entry), called after every write.
+
+    op is 'insert', 'update' or 'delete'; entry is None for deletes.
+    previous_version is the storage version before the write, so listeners
+    can tell whether they were in sync with storage when the change happened.
+    """
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+# Callbacks notified when get_engine() closes an engine it no longer keeps open
+_close_listeners: List[Callable[..., Any]] = []
+
+def add_close_listener(listener: Callable[..., Any]) -> None:
+    """Register listener(engine), called after an engine is closed."""
+    if listener not in _close_listeners:
+        _close_listeners.append(listener)
+
+def _notify(engine: StorageEngine, previous_version: Any, op: str, entry_id: str,
+            entry: Optional[Dict[str, Any]]) -> None:
+    for listener in _change_listeners:
+        listener(engine, previous_version, op, entry_id, entry)
+
+def commit_batch(engine: StorageEngine, ops: List[WriteOp]) -> List[Optional[Exception]]:
+    """Apply a batch of writes to the engine and notify the change listeners of each applied op."""
+    previous_version = engine.version()
+    with span(f"storage.commit.{engine.name}"):
+        errors = engine.apply_batch(ops)
+    for op, error in zip(ops, errors):
+        if error is None:
+            _notify(engine, previous_version, op.op, op.entry_id, op.entry)
+            # Listeners that followed the previous op are in sync with the batch's result
+            previous_version = engine.version()
+    return errors
+
+class GroupCommitWriter:
+    """Coalesces writes that arrive within a short window into one commit.
+
+    Each write is queued with a Future. A background thread waits
+    ``window`` seconds after the first queued write, applies everything
+    queued by then as a single batch (one file write and fsync, or one
+    SQLite transaction), and only then resolves the futures, so a caller
+    is acknowledged once its write is durable. Invalid writes fail on their
+    own; if the batch as a whole raises, its writes are committed again one
+    by one, so only the caller of the failing write gets the exception.
+    """
+
+    def __init__(self, engine: StorageEngine, window: float, app=None):
+        self.engine = engine
+        self.window = window
+        # The writer thread runs outside any request, so it pushes this app's context
+        self.app = app
+        self.queue: List[Tuple[WriteOp, Future]] = []
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopping = False
+
+    def submit(self, op: WriteOp) -> Future:
+        future = Future()
+        with self.condition:
+            self.queue.append((op, future))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f"group-commit-{self.engine.name}", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+        return future
+
+    def stop(self) -> None:
+        """Let the thread commit what is queued and exit."""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.queue:
+                    if self.stopping:
+                        self.thread = None
+                        return
+                    self.condition.wait()
+            # Give concurrent requests the window to join this batch
+            time.sleep(self.window)
+            with self.condition:
+                batch, self.queue = self.queue, []
+            self._commit(batch)
+
+    def _commit(self, batch: List[Tuple[WriteOp, Future]]) -> None:
+        try:
+            with self.app.app_context() if self.app is not None else contextlib.nullcontext():
+                errors = commit_batch(self.engine, [op for op, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+            else:
+                for item in batch:
+                    self._commit([item])
+            return
+        for (_, future), error in zip(batch, errors):
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+_group_writers: Dict[int, GroupCommitWriter] = {}
+_group_writers_lock = threading.Lock()
+
+def get_group_commit_writer(engine: StorageEngine, window: float) -> GroupCommitWriter:
+    """The group-commit writer of an engine, created on first use."""
+    with _group_writers_lock:
+        writer = _group_writers.get(id(engine))
+        if writer is None:
+            try:
+                from flask import current_app
+                app = current_app._get_current_object()
+            except (ImportError, RuntimeError):
+                app = None
+            writer = _group_writers[id(engine)] = GroupCommitWriter(engine, window, app)
+        writer.window = window
+        return writer
+
+def submit_write(op: WriteOp) -> None:
+    """Apply one write, through the group-commit writer when GROUP_COMMIT_WINDOW is set."""
+    engine = get_engine()
+    window = get_config_value('GROUP_COMMIT_WINDOW', DEFAULT_GROUP_COMMIT_WINDOW)
+    # A request that got the engine just before it was closed commits directly
+    if window > 0 and not engine.closed:
+        get_group_commit_writer(engine, window).submit(op).result()
+        return
+    error = commit_batch(engine, [op])[0]
+    if error is not None:
+        raise error
+
+@timed('storage.insert_entry')
+def insert_entry(entry: Dict[str, Any]) -> str:
+    """Store a new entry; returns its ID."""
+    entry = as_entry(entry)
+    submit_write(WriteOp('insert', entry['id'], entry))
+    return entry['id']
+
+@timed('storage.replace_entry')
+def replace_entry(entry_id: str, entry: Dict[str, Any], expected_etag: Optional[str] = None) -> None:
+    """Replace the entry with the given ID.
+
+    Raises KeyError if it does not exist, and ConflictError if expected_etag
+    (from entry_etag() of the entry as the caller read it) no longer matches.
+    """
+    entry = Entry.from_json(dict(entry, id=entry_id))
+    submit_write(WriteOp('update', entry_id, entry, expected_etag))
+
+@timed('storage.remove_entry')
+def remove_entry(entry_id: str, expected_etag: Optional[str] = None) -> None:
+    """Remove the entry with the given ID; raises like replace_entry()."""
+    submit_write(WriteOp('delete', entry_id, None, expected_etag))
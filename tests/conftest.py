@@ -0,0 +1,37 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('FLASK_CONFIG', 'testing')
+
+import storage  # noqa: E402
+from storage import Entry, new_entry_id  # noqa: E402
+
+
+@pytest.fixture(params=sorted(storage.STORAGE_ENGINES))
+def engine(request, tmp_path):
+    """A fresh engine of each kind on a journal in a temporary directory."""
+    return storage.STORAGE_ENGINES[request.param](tmp_path / 'reflections.json')
+
+
+@pytest.fixture
+def make_entry():
+    """Build an entry with a fresh ID for a 'YYYY-MM-DD HH:MM:SS' timestamp."""
+    def make(timestamp, rating=3, **fields):
+        return Entry(new_entry_id(timestamp), timestamp, rating=rating, **fields)
+    return make
+
+
+@pytest.fixture
+def app(tmp_path):
+    """The Flask app on a journal in a temporary directory, with writes committed one by one."""
+    from app import app
+    saved = dict(app.config)
+    app.config.update(STORAGE_DIR=tmp_path, REFLECTIONS_FILE=tmp_path / 'reflections.json',
+                      EXPORT_CACHE_DIR=tmp_path / 'exports', STORAGE_ENGINE='json', GROUP_COMMIT_WINDOW=0)
+    yield app
+    app.config.clear()
+    app.config.update(saved)
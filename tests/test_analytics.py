@@ -0,0 +1,90 @@
+import json
+from datetime import date
+
+import pytest
+
+import storage
+from analytics import PERIODS, Statistics, get_statistics
+
+
+@pytest.fixture
+def journal(app, make_entry):
+    """Store entries through storage.py in an app context; returns a function that adds one."""
+    def add(timestamp, rating=3):
+        entry = make_entry(timestamp, rating)
+        storage.insert_entry(entry)
+        return entry
+    with app.app_context():
+        yield add
+
+
+def summary(period='month', today=date(2024, 1, 6)):
+    return get_statistics().summary(period, 50, today)
+
+
+def test_streaks(journal):
+    for day in (1, 2, 3, 5, 6):
+        journal(f"2024-01-{day:02d} 20:00:00")
+    journal('2024-01-02 07:00:00')
+    stats = summary()
+    assert (stats['current_streak'], stats['longest_streak']) == (2, 3)
+    # A streak still counts until the end of the day after its last entry
+    assert summary(today=date(2024, 1, 7))['current_streak'] == 2
+    assert summary(today=date(2024, 1, 8))['current_streak'] == 0
+
+    journal('2024-01-04 12:00:00')
+    assert (summary()['current_streak'], summary()['longest_streak']) == (6, 6)
+
+
+def test_buckets(journal):
+    journal('2023-12-31 22:00:00', 2)
+    journal('2024-01-01 08:00:00', 4)
+    journal('2024-01-01 21:00:00', 5)
+    journal('2024-01-09 21:00:00', 0)
+
+    stats = summary('day')
+    assert stats['total'] == {'count': 4, 'rating_sum': 11, 'average': 3.67,
+                              'ratings': {'0': 1, '2': 1, '4': 1, '5': 1}}
+    assert [(bucket['period'], bucket['count'], bucket['average']) for bucket in stats['buckets']] == [
+        ('2023-12-31', 1, 2.0), ('2024-01-01', 2, 4.5), ('2024-01-09', 1, None)]
+    assert [(bucket['period'], bucket['count']) for bucket in summary('week')['buckets']] == [
+        ('2023-W52', 1), ('2024-W01', 2), ('2024-W02', 1)]
+    assert [(bucket['period'], bucket['rating_sum']) for bucket in summary('month')['buckets']] == [
+        ('2023-12', 2), ('2024-01', 9)]
+    assert [bucket['period'] for bucket in get_statistics().summary('day', 2)['buckets']] == [
+        '2024-01-01', '2024-01-09']
+
+
+def test_edits_and_deletes_update_the_aggregates(journal, monkeypatch):
+    entries = [journal(f"2024-01-{day:02d} 20:00:00", day % 6) for day in range(1, 7)]
+    summary()
+    statistics = get_statistics()
+
+    def no_rebuild(version):
+        raise AssertionError('the statistics should be updated in place')
+
+    monkeypatch.setattr(statistics, '_rebuild', no_rebuild)
+    moved = dict(entries[0].to_json(), timestamp='2024-02-01 09:00:00', rating=5)
+    storage.replace_entry(moved['id'], moved)
+    storage.replace_entry(entries[1]['id'], dict(entries[1].to_json(), rating=1))
+    storage.remove_entry(entries[3]['id'])
+
+    stats = summary()
+    assert (stats['current_streak'], stats['longest_streak']) == (2, 2)
+    assert [(bucket['period'], bucket['count'], bucket['rating_sum']) for bucket in stats['buckets']] == [
+        ('2024-01', 4, 1 + 3 + 5 + 0), ('2024-02', 1, 5)]
+    # The same as counted from scratch
+    for period in PERIODS:
+        assert Statistics(storage.get_engine()).summary(period, 50, date(2024, 1, 6)) == summary(period)
+
+
+def test_stats_endpoint(app, journal):
+    journal('2024-01-01 20:00:00', 4)
+    client = app.test_client()
+    body = json.loads(client.get('/stats?period=week').data)
+    assert body['period'] == 'week'
+    assert [bucket['period'] for bucket in body['buckets']] == ['2024-W01']
+    assert json.loads(client.get('/stats').data)['period'] == 'month'
+    assert json.loads(client.get('/stats?period=day&limit=0').data)['buckets'] == []
+    assert client.get('/stats?period=year').status_code == 400
+    assert client.get('/stats?period=').status_code == 400
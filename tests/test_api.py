@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import storage
+
+ENGINES = sorted(storage.STORAGE_ENGINES)
+
+
+@pytest.fixture(params=ENGINES)
+def client(request, app):
+    """An API test client on each storage engine."""
+    app.config['STORAGE_ENGINE'] = request.param
+    return app.test_client()
+
+
+def create(client, **fields):
+    response = client.post('/api/v1/entries', json=fields)
+    assert response.status_code == 201
+    return response.headers['Location'], response.headers['ETag'], json.loads(response.data)['id']
+
+
+def test_conditional_get(client):
+    url, etag, _ = create(client, rating=2)
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    listed = client.get('/api/v1/entries')
+    list_etag = listed.headers['ETag']
+    not_modified = client.get('/api/v1/entries', headers={'If-None-Match': list_etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+    # Another query is another representation
+    assert client.get('/api/v1/entries?limit=1', headers={'If-None-Match': list_etag}).status_code == 200
+
+    client.patch(url, json={'rating': 3})
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 200
+    assert client.get('/api/v1/entries', headers={'If-None-Match': list_etag}).status_code == 200
+
+
+def test_if_match(client):
+    url, etag, _ = create(client, rating=2)
+    updated = client.put(url, json={'rating': 3}, headers={'If-Match': etag})
+    assert updated.status_code == 200
+    assert client.patch(url, json={'rating': 4}, headers={'If-Match': etag}).status_code == 412
+    assert client.delete(url, headers={'If-Match': etag}).status_code == 412
+    assert json.loads(client.get(url).data)['rating'] == 3
+    assert client.delete(url, headers={'If-Match': updated.headers['ETag']}).status_code == 204
+
+
+def test_delta_sync(client):
+    kept_url, _, kept = create(client, rating=1)
+    _, _, unchanged = create(client, rating=1)
+    deleted_url, _, deleted = create(client, rating=1)
+    token = json.loads(client.get('/api/v1/entries').data)['sync_token']
+
+    client.patch(kept_url, json={'evening_good': 'En god samtale'})
+    client.delete(deleted_url)
+    _, _, added = create(client, rating=5)
+
+    delta = json.loads(client.get(f'/api/v1/entries?since={token}').data)
+    assert sorted(entry['id'] for entry in delta['entries']) == sorted([kept, added])
+    assert unchanged not in [entry['id'] for entry in delta['entries']]
+    assert delta['deleted'] == [deleted]
+    assert delta['sync_token'] > token
+
+    empty = json.loads(client.get(f"/api/v1/entries?since={delta['sync_token']}").data)
+    assert empty == {'entries': [], 'deleted': [], 'sync_token': delta['sync_token']}
+
+
+def test_invalid_and_expired_sync_tokens(client, app):
+    create(client, rating=1)
+    for token in ('abc', 'nan', 'inf'):
+        assert client.get(f'/api/v1/entries?since={token}').status_code == 400
+
+    # Compaction dropped the tombstones up to the horizon
+    with app.app_context():
+        changes_path = storage.get_engine().path.with_name(storage.get_engine().path.name + '.changes')
+    with open(changes_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'horizon': 1000.0}) + '\n')
+    assert client.get('/api/v1/entries?since=999').status_code == 410
+    assert client.get('/api/v1/entries?since=1000').status_code == 200
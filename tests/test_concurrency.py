@@ -0,0 +1,188 @@
+import sys
+import threading
+
+import pytest
+
+import storage
+from storage import ConflictError, StorageError, atomic_write, entry_etag, file_lock
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = tmp_path / 'reflections.json'
+    path.write_text('old', encoding='utf-8')
+    atomic_write(path, lambda f: f.write('new'))
+    assert path.read_text(encoding='utf-8') == 'new'
+    assert [p.name for p in tmp_path.iterdir()] == ['reflections.json']
+
+
+def test_atomic_write_keeps_the_old_file_on_failure(tmp_path):
+    path = tmp_path / 'reflections.json'
+    path.write_text('old', encoding='utf-8')
+
+    def crash(f):
+        f.write('half of the new')
+        raise OSError('disk full')
+
+    with pytest.raises(OSError):
+        atomic_write(path, crash)
+    assert path.read_text(encoding='utf-8') == 'old'
+    assert [p.name for p in tmp_path.iterdir()] == ['reflections.json']
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    lock_path = tmp_path / 'reflections.json.lock'
+    with file_lock(lock_path, 1) as held:
+        assert held
+        with file_lock(lock_path, 0) as other:
+            assert other is False
+        with pytest.raises(StorageError):
+            with file_lock(lock_path, 0.05):
+                pass
+    with file_lock(lock_path, 0) as held:
+        assert held
+
+
+def test_stale_etag_is_a_conflict(engine, make_entry):
+    entry = make_entry('2024-05-01 10:00:00', 3)
+    engine.insert(entry)
+    seen = entry_etag(entry)
+    theirs = entry.copy()
+    theirs['rating'] = 5
+    engine.update(entry['id'], theirs, seen)
+
+    mine = entry.copy()
+    mine['rating'] = 1
+    with pytest.raises(ConflictError):
+        engine.update(entry['id'], mine, seen)
+    with pytest.raises(ConflictError):
+        engine.delete(entry['id'], seen)
+    assert engine.get(entry['id'])['rating'] == 5
+    engine.delete(entry['id'], entry_etag(theirs))
+    assert engine.get(entry['id']) is None
+
+
+def test_concurrent_writers_lose_nothing(engine, make_entry, tmp_path):
+    # Separate engines share only the files and the lock, like separate worker processes
+    engines = [engine] + [type(engine)(tmp_path / 'reflections.json') for _ in range(3)]
+    engine.load()
+
+    def write(worker):
+        for i in range(20):
+            worker.insert(make_entry(f"2024-06-{i % 28 + 1:02d} 10:00:00"))
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in engines]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(type(engine)(tmp_path / 'reflections.json').load()) == 80
+
+
+def test_unreadable_journal_is_an_error(tmp_path):
+    path = tmp_path / 'reflections.json'
+    path.write_text('[{"timestamp": "2024-01-01', encoding='utf-8')
+    with pytest.raises(StorageError):
+        storage.JsonFileEngine(path).load()
+
+
+def test_conflicting_edit_returns_409(app, make_entry):
+    entry = make_entry('2024-05-01 10:00:00')
+    with app.app_context():
+        storage.insert_entry(entry)
+    client = app.test_client()
+    stale = entry_etag(entry)
+    form = {'rating': '4', 'etag': stale}
+    assert client.post(f"/entries/{entry['id']}/edit", data=form).status_code == 302
+    assert client.post(f"/entries/{entry['id']}/edit", data=form).status_code == 409
+    assert client.get(f"/entries/{entry['id']}/delete?etag={stale}").status_code == 409
+
+
+def test_cache_reloaded_during_a_write(engine, make_entry, monkeypatch):
+    entry = make_entry('2024-05-01 10:00:00')
+    engine.insert(entry)
+    engine.load()
+    commit = engine._commit
+
+    def reload_after_persist(persist, apply):
+        def persist_then_read():
+            persist()
+            # A reader reloads the cache, change included, before the writer patches it
+            engine.load()
+        commit(persist_then_read, apply)
+
+    monkeypatch.setattr(engine, '_commit', reload_after_persist)
+    added = make_entry('2024-05-02 10:00:00')
+    engine.insert(added)
+    engine.delete(entry['id'])
+    assert [current['id'] for current in engine.load()] == [added['id']]
+    assert [entry_id for entry_id, _ in engine.page('desc', 10).entries] == [added['id']]
+
+
+def test_reads_while_writing(engine, make_entry):
+    for day in range(1, 29):
+        engine.insert(make_entry(f"2024-08-{day:02d} 10:00:00"))
+    engine.load()
+    errors = []
+    done = threading.Event()
+
+    def write():
+        try:
+            for i in range(60):
+                entry = make_entry(f"2024-08-{i % 28 + 1:02d} 12:00:00")
+                engine.insert(entry)
+                engine.delete(entry['id'])
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    def read():
+        try:
+            while not done.is_set():
+                page = engine.page('desc', 10)
+                ids = [entry_id for entry_id, _ in page.entries]
+                assert len(ids) == len(set(ids)) == 10
+                ids = [entry['id'] for entry in engine.iterate('asc', '2024-08-01', '2024-08-31')]
+                assert len(ids) == len(set(ids)) >= 28
+                assert len(engine.load()) >= 28
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write)] + [threading.Thread(target=read) for _ in range(3)]
+    # Switch threads often, so reads interleave with the writes to the cache
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == []
+    assert len(engine.load()) == 28
+
+
+def test_group_commit_fails_only_the_bad_write(tmp_path, make_entry, monkeypatch):
+    engine = storage.BinaryFileEngine(tmp_path / 'reflections.json')
+    good, bad = make_entry('2024-09-01 10:00:00'), make_entry('2024-09-02 10:00:00', 10 ** 6)
+    writer = storage.GroupCommitWriter(engine, 0.05)
+    futures = [writer.submit(storage.WriteOp('insert', entry['id'], entry)) for entry in (good, bad)]
+    assert futures[0].result() is None
+    assert isinstance(futures[1].exception(), ValueError)
+
+    # A batch that raises as a whole is committed again write by write
+    apply_batch = engine.apply_batch
+
+    def fail_with(ops):
+        if any(op.entry['rating'] == 5 for op in ops):
+            raise RuntimeError('cannot store')
+        return apply_batch(ops)
+
+    monkeypatch.setattr(engine, 'apply_batch', fail_with)
+    good, bad = make_entry('2024-09-03 10:00:00'), make_entry('2024-09-04 10:00:00', 5)
+    futures = [writer.submit(storage.WriteOp('insert', entry['id'], entry)) for entry in (good, bad)]
+    assert futures[0].result() is None
+    assert isinstance(futures[1].exception(), RuntimeError)
+    writer.stop()
+    assert len(engine.load()) == 2
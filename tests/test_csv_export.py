@@ -0,0 +1,41 @@
+import csv
+import io
+
+import pytest
+
+import storage
+
+
+@pytest.fixture(params=sorted(storage.STORAGE_ENGINES))
+def client(request, app, make_entry):
+    """A test client on each storage engine, with entries from late April to early June 2024."""
+    app.config['STORAGE_ENGINE'] = request.param
+    with app.app_context():
+        for timestamp in ('2024-04-30 23:59:59', '2024-05-01 00:00:00', '2024-05-15 12:00:00',
+                          '2024-05-31 23:59:59', '2024-06-01 00:00:00'):
+            storage.insert_entry(make_entry(timestamp))
+    return app.test_client()
+
+
+def exported(client, query=''):
+    response = client.get(f'/export/csv{query}')
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == storage.CSV_HEADER
+    return [row[0] for row in rows[1:]]
+
+
+def test_date_range_is_inclusive(client):
+    assert exported(client, '?from=2024-05&to=2024-05') == [
+        '2024-05-31 23:59:59', '2024-05-15 12:00:00', '2024-05-01 00:00:00']
+    assert exported(client, '?from=2024-05-31') == ['2024-06-01 00:00:00', '2024-05-31 23:59:59']
+    assert exported(client, '?to=2024-04-30') == ['2024-04-30 23:59:59']
+    assert exported(client, '?from=2024-05-15&to=2024-05-15') == ['2024-05-15 12:00:00']
+    assert exported(client, '?from=2024') == exported(client)
+    assert len(exported(client)) == 5
+    assert exported(client, '?from=2024-07') == []
+
+
+@pytest.mark.parametrize('query', ['?from=maj', '?to=2024-13', '?from=2024-02-30', '?from=2024-05&to=x'])
+def test_malformed_bound_is_rejected(client, query):
+    assert client.get(f'/export/csv{query}').status_code == 400
@@ -0,0 +1,62 @@
+import json
+import re
+
+import pytest
+
+import storage
+from storage import new_entry_id, timestamp_seconds
+
+
+def test_new_entry_id_starts_with_creation_time():
+    entry_id = new_entry_id('2024-05-31 12:00:00')
+    assert re.fullmatch(r'[0-9a-f]{14}', entry_id)
+    assert int(entry_id[:8], 16) == timestamp_seconds('2024-05-31 12:00:00')
+    assert len({new_entry_id('2024-05-31 12:00:00') for _ in range(100)}) == 100
+
+
+def test_legacy_entries_keep_the_ids_they_get(engine, tmp_path):
+    json_path = tmp_path / 'reflections.json'
+    json_path.write_text(json.dumps([
+        {'timestamp': '2024-01-02 10:00:00', 'morning_control': 'Vejret'},
+        {'timestamp': '2024-01-01 10:00:00', 'rating': 4},
+    ]), encoding='utf-8')
+    ids = [entry['id'] for entry in engine.load()]
+    assert all(ids)
+    assert [entry['id'] for entry in type(engine)(json_path).load()] == ids
+    assert engine.get(ids[1])['rating'] == 4
+
+
+def test_entries_without_ids_after_entries_with_ids(engine, tmp_path, make_entry):
+    json_path = tmp_path / 'reflections.json'
+    # Enough text in the entries with IDs that the ones without come well into the file
+    newer = [make_entry(f"2024-02-{day:02d} 10:00:00", evening_good='Tålmodighed. ' * 200) for day in (3, 2)]
+    json_path.write_text(json.dumps([entry.to_json() for entry in newer] + [
+        {'timestamp': '2024-01-01 10:00:00', 'rating': 4},
+    ]), encoding='utf-8')
+    ids = [entry['id'] for entry in engine.load()]
+    assert ids[:2] == [entry['id'] for entry in newer]
+    assert [entry['id'] for entry in type(engine)(json_path).load()] == ids
+    assert engine.get(ids[2])['rating'] == 4
+
+
+def test_missing_ids_raise_key_error(engine, make_entry):
+    entry = make_entry('2024-02-01 10:00:00')
+    with pytest.raises(KeyError):
+        engine.update(entry['id'], entry)
+    with pytest.raises(KeyError):
+        engine.delete(entry['id'])
+    assert engine.get(entry['id']) is None
+
+
+def test_positional_urls_redirect_to_ids(app, make_entry):
+    with app.app_context():
+        older = storage.insert_entry(make_entry('2024-03-01 10:00:00'))
+        newer = storage.insert_entry(make_entry('2024-03-02 10:00:00'))
+    client = app.test_client()
+
+    response = client.get('/edit/0')
+    assert response.status_code == 308
+    assert response.headers['Location'].endswith(f'/entries/{newer}/edit')
+    response = client.get('/delete/1')
+    assert response.headers['Location'].endswith(f'/entries/{older}/delete')
+    assert client.get('/edit/5').headers['Location'].endswith('/reflections')
@@ -0,0 +1,30 @@
+import time
+
+from flask import Flask, Response
+
+import metrics
+
+
+def test_streamed_response_is_measured_when_sent():
+    app = Flask(__name__)
+    app.config['SERVER_TIMING'] = True
+    metrics.init_app(app)
+
+    @app.route('/slow-stream')
+    def slow_stream():
+        def body():
+            yield 'a' * 100
+            time.sleep(0.05)
+            yield 'ø' * 100
+        return Response(body(), mimetype='text/html')
+
+    response = app.test_client().get('/slow-stream', buffered=False)
+    assert 'headers;dur=' in response.headers['Server-Timing']
+    assert metrics.RESPONSE_SIZE.values.get(('/slow-stream',)) is None
+    assert len(response.get_data()) == 300
+    response.close()
+
+    counts, seconds = metrics.REQUEST_DURATION.values[('/slow-stream', 'GET', '200')]
+    assert sum(counts) == 1 and seconds >= 0.05
+    counts, size = metrics.RESPONSE_SIZE.values[('/slow-stream',)]
+    assert sum(counts) == 1 and size == 300
@@ -0,0 +1,107 @@
+import json
+import sys
+
+import pytest
+
+import migrate_partitions
+from storage import (
+    BinaryFileEngine, JsonFileEngine, MonthlyPartitionEngine, StorageError, file_signature,
+    migrate_json_to_partitions, read_json_entries
+)
+
+
+@pytest.fixture
+def journal(tmp_path, make_entry):
+    """A reflections.json with entries in three months, newest first."""
+    timestamps = ['2024-03-02 09:00:00', '2024-03-01 21:00:00', '2024-02-29 08:00:00',
+                  '2024-01-31 23:59:59', '2024-01-01 00:00:00']
+    entries = [make_entry(timestamp, i % 6, evening_good=f"Dag {i}") for i, timestamp in enumerate(timestamps)]
+    path = tmp_path / 'reflections.json'
+    path.write_text(json.dumps([entry.to_json() for entry in entries], ensure_ascii=False), encoding='utf-8')
+    return path, [entry.to_json() for entry in entries]
+
+
+def test_migration_to_months_and_back(journal, tmp_path):
+    path, entries = journal
+    assert migrate_json_to_partitions(path) == {'2024-01': 2, '2024-02': 1, '2024-03': 2}
+    assert sorted(p.name for p in (tmp_path / 'reflections').iterdir()) == [
+        '2024-01.json', '2024-02.json', '2024-03.json', 'manifest.json', 'manifest.json.lock']
+    # The JSON file stays as a backup
+    assert [entry.to_json() for entry in read_json_entries(path)] == entries
+
+    monthly = MonthlyPartitionEngine(path)
+    assert [dict(entry) for entry in monthly.load()] == entries
+    manifest = monthly.manifest()
+    assert manifest['2024-01']['first'] == '2024-01-01 00:00:00'
+    assert manifest['2024-01']['last'] == '2024-01-31 23:59:59'
+
+    back = tmp_path / 'joined.json'
+    JsonFileEngine(back).save(monthly.load())
+    assert [entry.to_json() for entry in read_json_entries(back)] == entries
+
+
+def test_migration_tool(journal, tmp_path, monkeypatch, capsys):
+    path, _ = journal
+    monkeypatch.setattr(sys, 'argv', ['migrate_partitions.py', str(path), str(tmp_path / 'missing.json')])
+    assert migrate_partitions.main() == 1
+    output = capsys.readouterr().out
+    assert f"{path}: 5 entries in 3 partitions" in output
+    assert 'missing.json: not found' in output
+
+
+def test_migration_does_not_overwrite_partitions(journal, tmp_path, make_entry, monkeypatch, capsys):
+    path, entries = journal
+    migrate_json_to_partitions(path)
+    added = make_entry('2024-03-05 10:00:00')
+    MonthlyPartitionEngine(path).insert(added)
+
+    with pytest.raises(StorageError):
+        migrate_json_to_partitions(path)
+    monkeypatch.setattr(sys, 'argv', ['migrate_partitions.py', str(path)])
+    assert migrate_partitions.main() == 1
+    assert 'skipped' in capsys.readouterr().out
+    assert [entry['id'] for entry in MonthlyPartitionEngine(path).load()] == [added['id']] + [
+        entry['id'] for entry in entries]
+
+    # Forced, the partitions are split again from the backup
+    assert migrate_json_to_partitions(path, force=True) == {'2024-01': 2, '2024-02': 1, '2024-03': 2}
+    assert MonthlyPartitionEngine(path).get(added['id']) is None
+
+
+def test_write_touches_one_partition(journal, make_entry):
+    path, entries = journal
+    migrate_json_to_partitions(path)
+    engine = MonthlyPartitionEngine(path)
+    untouched = {month: file_signature(engine.partition_path(month)) for month in ('2024-01', '2024-03')}
+
+    engine.insert(make_entry('2024-02-10 12:00:00'))
+    edited = engine.get(entries[2]['id']).copy()
+    edited['rating'] = 5
+    engine.update(edited['id'], edited)
+
+    assert {month: file_signature(engine.partition_path(month)) for month in untouched} == untouched
+    assert engine.manifest()['2024-02']['count'] == 2
+    assert MonthlyPartitionEngine(path).get(edited['id'])['rating'] == 5
+
+
+def test_edit_moves_entry_between_partitions(journal):
+    path, entries = journal
+    engine = MonthlyPartitionEngine(path)
+    moved = engine.get(entries[0]['id']).copy()
+    moved.timestamp = '2024-02-15 10:00:00'
+    engine.update(moved['id'], moved)
+    assert engine.manifest()['2024-03']['count'] == 1
+    assert engine.manifest()['2024-02']['count'] == 2
+    assert [entry['id'] for entry in MonthlyPartitionEngine(path).iterate('asc', '2024-02', '2024-02')] == [
+        moved['id'], entries[2]['id']]
+
+
+@pytest.mark.parametrize('engine_class', [MonthlyPartitionEngine, BinaryFileEngine])
+@pytest.mark.parametrize('timestamp', ['２０２４-01-05 10:00:00', '2024-01-05 10:00:0é', 'yesterday', ''])
+def test_invalid_timestamps_are_rejected(engine_class, timestamp, tmp_path, make_entry):
+    engine = engine_class(tmp_path / 'reflections.json')
+    entry = make_entry('2024-01-05 10:00:00')
+    entry.timestamp = timestamp
+    with pytest.raises(ValueError):
+        engine.insert(entry)
+    assert engine.load() == []
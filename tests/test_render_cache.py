@@ -0,0 +1,45 @@
+import pytest
+
+import render_cache
+import storage
+
+ROWS = ('<ul>{% for entry in entries %}{% call entry_fragment(entry) %}'
+        '<li>{{ render_row(entry) }}</li>{% endcall %}{% endfor %}</ul>')
+
+
+@pytest.fixture
+def rendered(app):
+    """Render ROWS for the stored entries, recording which entries were rendered."""
+    render_cache.clear()
+    calls = []
+
+    def render_row(entry):
+        calls.append(entry['id'])
+        return entry['rating']
+
+    template = app.jinja_env.from_string(ROWS)
+
+    def render():
+        calls.clear()
+        with app.app_context():
+            return template.render(entries=storage.get_engine().load(), render_row=render_row)
+
+    yield render, calls
+    render_cache.clear()
+
+
+def test_edit_renders_only_the_changed_entry(app, rendered, make_entry):
+    render, calls = rendered
+    entries = [make_entry(f"2024-05-0{day} 10:00:00", 1) for day in (1, 2, 3)]
+    with app.app_context():
+        for entry in entries:
+            storage.insert_entry(entry)
+    assert render() == '<ul><li>1</li><li>1</li><li>1</li></ul>'
+    assert len(calls) == 3
+    assert render() == '<ul><li>1</li><li>1</li><li>1</li></ul>'
+    assert calls == []
+
+    with app.app_context():
+        storage.replace_entry(entries[1]['id'], dict(entries[1].to_json(), rating=4))
+    assert render() == '<ul><li>1</li><li>4</li><li>1</li></ul>'
+    assert calls == [entries[1]['id']]
@@ -0,0 +1,87 @@
+import pytest
+
+import storage
+from search import get_search_index, search_entries, snippet, tokenize
+
+
+@pytest.fixture
+def journal(app, make_entry):
+    """Store entries through storage.py in an app context; returns a function that adds one."""
+    def add(timestamp, **fields):
+        entry = make_entry(timestamp, **fields)
+        storage.insert_entry(entry)
+        return entry
+    with app.app_context():
+        yield add
+
+
+def ids(hits):
+    return [hit.entry_id for hit in hits]
+
+
+def test_bm25_ranking(journal):
+    once = journal('2024-01-01 10:00:00', evening_learning='Vrede ' + 'kommer og går, ' * 20)
+    often = journal('2024-01-02 10:00:00', evening_learning='Vrede, vrede og atter vrede')
+    short = journal('2024-01-03 10:00:00', morning_challenges='Vrede')
+    journal('2024-01-04 10:00:00', evening_good='En rolig dag')
+
+    total, hits = search_entries('vrede')
+    assert total == 3
+    # More occurrences rank higher, and a mention in a long text ranks below one in a short text
+    assert ids(hits) == [often['id'], short['id'], once['id']]
+    assert hits[0].score > hits[1].score > hits[2].score
+    assert ids(search_entries('vrede', limit=1, offset=1)[1]) == [short['id']]
+    # Every term must match
+    assert ids(search_entries('vrede atter')[1]) == [often['id']]
+
+
+def test_equal_scores_rank_newer_first(journal):
+    older = journal('2024-01-01 10:00:00', evening_good='Gåtur')
+    newer = journal('2024-02-01 10:00:00', evening_good='Gåtur')
+    assert ids(search_entries('gåtur')[1]) == [newer['id'], older['id']]
+
+
+def test_danish_stopwords(journal):
+    assert tokenize('Jeg er ikke bange for det') == ['bange']
+    journal('2024-01-01 10:00:00', morning_control='Det er min egen dom')
+    assert search_entries('det er')[0] == 0
+    assert search_entries('det er dom')[0] == 1
+
+
+def test_aa_is_folded_into_å(journal):
+    old_spelling = journal('2024-01-01 10:00:00', evening_learning='Taalmodighed paa arbejdet')
+    new_spelling = journal('2024-01-02 10:00:00', evening_learning='Tålmodighed på arbejdet')
+    assert tokenize('Taalmodighed') == ['tålmodighed']
+    for query in ('tålmodighed', 'Taalmodighed', 'tålmod', 'TAALMOD'):
+        assert sorted(ids(search_entries(query)[1])) == sorted([old_spelling['id'], new_spelling['id']])
+
+
+def test_snippet():
+    text = 'Om morgenen ' + 'gik jeg en lang tur langs vandet, ' * 10 + 'og om aftenen mødte jeg modgang med ro.'
+    entry = {'morning_control': 'Vejret', 'evening_learning': text}
+    excerpt = snippet(entry, 'modgang', length=60)
+    assert excerpt.startswith('…') and 'modgang' in excerpt
+    assert len(excerpt) <= 62
+    assert snippet(entry, 'vejret') == 'Vejret'
+    assert snippet(entry, 'solskin') == ''
+
+
+def test_index_follows_edits_and_deletes(journal, monkeypatch):
+    entry = journal('2024-01-01 10:00:00', evening_good='En lang samtale')
+    other = journal('2024-01-02 10:00:00', evening_good='En samtale med en ven')
+    assert search_entries('samtale')[0] == 2
+    index = get_search_index()
+
+    def no_rebuild():
+        raise AssertionError('the index should be updated in place')
+
+    monkeypatch.setattr(index, 'rebuild', no_rebuild)
+    storage.replace_entry(entry['id'], dict(entry.to_json(), evening_good='En lang gåtur'))
+    assert ids(search_entries('samtale')[1]) == [other['id']]
+    assert ids(search_entries('gåtur')[1]) == [entry['id']]
+
+    storage.remove_entry(other['id'])
+    assert search_entries('samtale')[0] == 0
+    assert 'samtale' not in index.postings and 'samtale' not in index.vocabulary
+    added = journal('2024-01-03 10:00:00', evening_good='Endnu en samtale')
+    assert ids(search_entries('samtale')[1]) == [added['id']]
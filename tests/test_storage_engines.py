@@ -0,0 +1,114 @@
+import json
+
+import pytest
+
+import storage
+from storage import LogFileEngine, WriteOp, entry_etag, migrate_json_to_log
+
+
+def test_round_trip(engine, make_entry, tmp_path):
+    first = make_entry('2024-05-01 08:00:00', 4, morning_control='Mine egne domme')
+    second = make_entry('2024-05-02 21:30:00', 2, evening_learning='Tålmodighed ✓')
+    third = make_entry('2024-05-03 07:15:00', 5)
+    for entry in (first, second, third):
+        engine.insert(entry)
+
+    edited = second.copy()
+    edited['rating'] = 1
+    edited['evening_good'] = 'En lang gåtur'
+    engine.update(second['id'], edited)
+    engine.delete(third['id'])
+
+    # A new engine on the same files reads what the first one wrote
+    reopened = type(engine)(tmp_path / 'reflections.json')
+    for current in (engine, reopened):
+        assert [entry['id'] for entry in current.load()] == [second['id'], first['id']]
+        assert dict(current.get(first['id'])) == dict(first)
+        assert dict(current.get(second['id'])) == dict(edited)
+        assert current.get(third['id']) is None
+
+
+def test_save_replaces_journal(engine, make_entry):
+    engine.insert(make_entry('2024-01-01 10:00:00'))
+    entries = [make_entry(f"2024-02-{day:02d} 10:00:00") for day in (3, 2, 1)]
+    engine.save(entries)
+    assert [entry['id'] for entry in engine.load()] == [entry['id'] for entry in entries]
+
+
+def test_page_and_iterate(engine, make_entry):
+    entries = [make_entry(f"2024-03-{day:02d} 12:00:00", day % 6) for day in range(1, 21)]
+    for entry in entries:
+        engine.insert(entry)
+
+    page = engine.page('desc', 8)
+    assert [entry_id for entry_id, _ in page.entries] == [entry['id'] for entry in entries[::-1][:8]]
+    following = engine.page('desc', 8, after=page.next_cursor)
+    assert [entry_id for entry_id, _ in following.entries] == [entry['id'] for entry in entries[::-1][8:16]]
+    previous = engine.page('desc', 8, before=following.prev_cursor)
+    assert previous.entries == page.entries
+
+    in_range = list(engine.iterate('asc', '2024-03-05', '2024-03-07'))
+    assert [entry['id'] for entry in in_range] == [entry['id'] for entry in entries[4:7]]
+
+
+def test_apply_batch_skips_failed_ops(engine, make_entry):
+    entry = make_entry('2024-04-01 09:00:00')
+    missing = make_entry('2024-04-02 09:00:00')
+    edited = entry.copy()
+    edited['rating'] = 5
+    errors = engine.apply_batch([
+        WriteOp('insert', entry['id'], entry),
+        WriteOp('delete', missing['id']),
+        WriteOp('update', entry['id'], edited, entry_etag(entry)),
+    ])
+    assert errors[0] is None and isinstance(errors[1], KeyError) and errors[2] is None
+    assert engine.get(entry['id'])['rating'] == 5
+
+
+def test_migrate_json_to_log(tmp_path, make_entry):
+    entries = [make_entry(f"2024-06-{day:02d} 10:00:00") for day in (3, 2, 1)]
+    json_path = tmp_path / 'reflections.json'
+    json_path.write_text(json.dumps([entry.to_json() for entry in entries]), encoding='utf-8')
+
+    assert migrate_json_to_log(json_path, tmp_path / 'reflections.jsonl') == 3
+    assert [dict(entry) for entry in LogFileEngine(json_path).load()] == [entry.to_json() for entry in entries]
+    assert json_path.exists()
+
+
+def test_log_compacts_on_write(app, make_entry):
+    app.config.update(STORAGE_ENGINE='log', LOG_COMPACT_MIN_RECORDS=10, LOG_COMPACT_RATIO=2)
+    with app.app_context():
+        entry = make_entry('2024-07-01 10:00:00')
+        storage.insert_entry(entry)
+        for rating in range(200):
+            storage.replace_entry(entry['id'], dict(entry.to_json(), rating=rating % 6))
+        engine = storage.get_engine()
+        with open(engine.path, encoding='utf-8') as f:
+            records = sum(1 for _ in f)
+    assert records <= 10
+    assert engine.get(entry['id'])['rating'] == 199 % 6
+
+
+def test_sqlite_syncs_every_commit(app):
+    app.config['STORAGE_ENGINE'] = 'sqlite'
+    with app.app_context():
+        connection = storage.get_engine().connection
+        # 2 is FULL
+        assert connection.execute('PRAGMA synchronous').fetchone()[0] == 2
+
+
+def test_recreated_sqlite_database_has_a_new_version(tmp_path, make_entry):
+    engine = storage.SqliteEngine(tmp_path / 'reflections.json')
+    engine.insert(make_entry('2024-08-01 10:00:00'))
+    version = engine.version()
+    engine.close()
+    (tmp_path / 'reflections.db').unlink()
+    engine = storage.SqliteEngine(tmp_path / 'reflections.json')
+    engine.insert(make_entry('2024-08-01 10:00:00'))
+    assert engine.version() != version
+
+
+def test_unknown_engine(app):
+    app.config['STORAGE_ENGINE'] = 'tape'
+    with app.app_context(), pytest.raises(ValueError):
+        storage.get_engine()
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import analytics
+import changes
+import search
+import storage
+
+
+@pytest.fixture
+def client(app):
+    """A test client in multi-user mode."""
+    app.config.update(MULTI_USER=True, USER_HEADER='X-Forwarded-User')
+    return app.test_client()
+
+
+def as_user(user_id):
+    return {'X-Forwarded-User': user_id}
+
+
+def create(client, user_id, **fields):
+    response = client.post('/api/v1/entries', json=fields, headers=as_user(user_id))
+    assert response.status_code == 201
+    return response.headers['Location']
+
+
+def listed(client, user_id):
+    return [entry['id'] for entry in json.loads(client.get('/api/v1/entries', headers=as_user(user_id)).data)['entries']]
+
+
+def test_users_have_separate_journals(client, tmp_path):
+    alice_url = create(client, 'alice', evening_good='Alice skrev dette')
+    create(client, 'alice', rating=2)
+    create(client, 'bob', evening_good='Bob skrev dette')
+
+    assert len(listed(client, 'alice')) == 2
+    assert len(listed(client, 'bob')) == 1
+    assert set(listed(client, 'alice')).isdisjoint(listed(client, 'bob'))
+    assert client.get(alice_url, headers=as_user('bob')).status_code == 404
+    assert client.delete(alice_url, headers=as_user('bob')).status_code == 404
+    search_results = json.loads(client.get('/search?q=skrev', headers=as_user('bob')).data)['results']
+    assert [result['snippet'] for result in search_results] == ['Bob skrev dette']
+
+    assert (tmp_path / 'users' / 'alice' / 'reflections.json').exists()
+    assert not (tmp_path / 'reflections.json').exists()
+    assert client.get('/api/v1/entries').status_code == 401
+    assert client.get('/api/v1/entries', headers=as_user('../alice')).status_code == 400
+
+
+def test_least_recently_used_shard_is_closed(client, app):
+    app.config.update(MAX_OPEN_ENGINES=2, GROUP_COMMIT_WINDOW=0.001)
+    create(client, 'alice', evening_good='Stille morgen')
+    assert client.get('/search?q=stille', headers=as_user('alice')).status_code == 200
+    assert client.get('/stats', headers=as_user('alice')).status_code == 200
+    alice = next(engine for engine in storage._engines.values() if 'alice' in engine.path.parts)
+    writer_thread = storage._group_writers[id(alice)].thread
+    assert writer_thread.is_alive()
+    assert id(alice) in search._indexes and id(alice) in analytics._statistics and id(alice) in changes._logs
+
+    create(client, 'bob', rating=4)
+    listed(client, 'alice')
+    assert not alice.closed
+    # Opening a third shard closes the least recently used one: bob's
+    create(client, 'carol', rating=5)
+    assert not alice.closed
+    listed(client, 'bob')
+    assert alice.closed
+    assert alice.cache.entries is None
+    assert id(alice) not in search._indexes
+    assert id(alice) not in analytics._statistics and id(alice) not in changes._logs
+    assert id(alice) not in storage._group_writers
+    writer_thread.join(5)
+    assert not writer_thread.is_alive()
+
+    # Reopened on the next request, with nothing lost
+    assert len(listed(client, 'alice')) == 1
+    assert len(storage._engines) == 2
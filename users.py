@@ -0,0 +1,31 @@
+"""Per-request user selection for multi-user mode.
+
+The app does not log users in itself: it runs behind a reverse proxy (or
+SSO gateway) that authenticates each request and passes the user's ID in
+the ``USER_HEADER`` header. With ``MULTI_USER`` set, every request must
+carry a valid ID, and storage.py then reads and writes that user's shard
+under ``STORAGE_DIR/users/<user id>/``. The proxy must strip the header
+from incoming requests, or clients could pick any user.
+"""
+from storage import is_valid_user_id
+
+DEFAULT_USER_HEADER = 'X-Forwarded-User'
+# Endpoints that do not belong to a user
+PUBLIC_ENDPOINTS = {'metrics', 'static', 'asset'}
+
+
+def init_app(app) -> None:
+    """Select the request's user shard from the USER_HEADER header when MULTI_USER is set."""
+    from flask import abort, g, request
+
+    @app.before_request
+    def select_user():
+        if not app.config.get('MULTI_USER') or request.endpoint in PUBLIC_ENDPOINTS:
+            return None
+        user_id = request.headers.get(app.config.get('USER_HEADER', DEFAULT_USER_HEADER), '').strip()
+        if not user_id:
+            abort(401)
+        if not is_valid_user_id(user_id):
+            abort(400, 'Invalid user ID')
+        g.user_id = user_id
+        return None